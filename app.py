@@ -1,19 +1,158 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from database.models import init_db, create_lead, get_all_leads, update_lead, delete_lead, get_lead_by_id, test_connection
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, g, session, make_response
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import is_resource_modified
+from database.models import init_db, create_lead, update_lead, delete_lead, get_lead_by_id
+from database.models import get_leads_page, parse_fields, iter_leads, import_leads, create_leads_batch, get_cache_stats, get_lead_stats, LEAD_COLUMNS
+from database.models import search_leads
+from database.models import parse_batch_selection, parse_batch_changes, batch_update_leads, batch_delete_leads
+from database.models import get_pool_stats, get_breaker_stats, ping_db
+from database.models import get_replica_stats, begin_request_routing, end_request_routing
+from database.models import get_leads_version, lead_events, get_event_stats, get_email_filter_stats
+from database.models import get_leads_report, get_leads_summary, backfill_rollups, REPORT_PERIODS
+from database.models import archive_leads, get_archived_lead, find_leads_by_email, get_archive_stats
+from database.models import parse_lead
+from database import async_models as async_db
+from database.records import Record
+from database.ingest import IngestQueue, IngestQueueFull
+from database.health import HealthMonitor
+from database.feed import FeedServer
+from serializers import FORMATS, DATE_FORMATS, JSON, columnar, encode
 from config import config
+from datetime import date, datetime, timezone
+import asyncio
+import click
+import csv
+import gzip
+import io
+import json
 import os
+import time
+import zlib
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    # Opcional: sin el paquete brotli se comprime solo con gzip
+    brotli = None
+
+class LeadJSONProvider(DefaultJSONProvider):
+    """jsonify() de los registros de leads como objetos JSON"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o._asdict()
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = LeadJSONProvider(app)
 app.config.from_object(config['default'])
 
-# Inicializar la base de datos al iniciar la aplicación
-print("🚀 Iniciando aplicación LeadTracker...")
-print(f"📊 Usando: {config['default'].DB_ENGINE.upper()}")
-if init_db():
-    print("✅ Base de datos inicializada correctamente")
-else:
-    print("❌ Error inicializando base de datos")
+logger = metrics.configure_logging(app.config['LOG_LEVEL'], app.config['LOG_SAMPLE_RATE'])
+
+# La base de datos se conecta de forma perezosa en la primera petición; el
+# esquema se crea/actualiza una vez por despliegue con `flask --app app migrate`
+logger.info("Iniciando aplicación LeadTracker con %s", config['default'].DB_ENGINE.upper())
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Aplica las migraciones pendientes del esquema"""
+    if not init_db():
+        raise SystemExit(1)
+
+@app.cli.command('rollup-backfill')
+@click.option('--desde', type=click.DateTime(['%Y-%m-%d']), help='Primer día a recalcular')
+@click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), help='Último día a recalcular')
+def rollup_backfill_command(desde, hasta):
+    """Reconstruye lead_rollups (informes) desde la tabla leads y el archivo frío"""
+    rows = backfill_rollups(desde.date() if desde else None, hasta.date() if hasta else None)
+    if rows is None:
+        raise SystemExit(1)
+    click.echo(f"lead_rollups: {rows} filas recalculadas")
+
+@app.cli.command('archive')
+@click.option('--antes-de', type=click.DateTime(['%Y-%m-%d']),
+              help='Archiva los leads anteriores a este día (por defecto, hace ARCHIVE_AFTER_DAYS días)')
+@click.option('--chunk-size', type=click.IntRange(min=1), help='Leads por transacción')
+@click.option('--dry-run', is_flag=True, help='Solo cuenta los leads que se archivarían')
+def archive_command(antes_de, chunk_size, dry_run):
+    """Mueve los leads antiguos de la tabla al archivo frío (ARCHIVE_DIR)"""
+    result = archive_leads(antes_de.date() if antes_de else None, dry_run=dry_run, chunk_size=chunk_size)
+    if result is None:
+        raise SystemExit(1)
+    if dry_run:
+        click.echo(f"Se archivarían {result['matched']} leads anteriores a {result['antes_de']}")
+        for service, count in result['por_servicio'].items():
+            click.echo(f"  {service}: {count}")
+        return
+    click.echo(f"Archivados {result['affected']} leads anteriores a {result['antes_de']} en {result['chunks']} trozos")
+    if "error" in result:
+        click.echo(f"Error: {result['error']}", err=True)
+        raise SystemExit(1)
+
+# Heartbeat de la base de datos para /health y /health/ready
+health_monitor = HealthMonitor(
+    ping_db,
+    interval=app.config['HEALTH_INTERVAL'],
+    max_age=app.config['HEALTH_MAX_AGE']
+)
+
+# Cola de escritura diferida para /add_lead (opcional)
+ingest_queue = None
+if app.config['INGEST_MODE'] == 'buffered':
+    ingest_queue = IngestQueue(
+        create_leads_batch,
+        max_size=app.config['INGEST_QUEUE_SIZE'],
+        batch_size=app.config['INGEST_BATCH_SIZE'],
+        flush_ms=app.config['INGEST_FLUSH_MS']
+    )
+    logger.info("Ingesta diferida activada (lotes de %d)", app.config['INGEST_BATCH_SIZE'])
+
+# Servidor asíncrono del feed de cambios; lo arranca cada worker de gunicorn
+# (post_fork). Con el servidor de desarrollo /api/leads/stream se sirve por WSGI
+feed_server = None
+
+def start_feed_server():
+    global feed_server
+    if feed_server is None and app.config['SSE_BIND']:
+        feed_server = FeedServer(lead_events, app.config['SSE_BIND'], heartbeat=app.config['SSE_HEARTBEAT']).start()
+        logger.info("Feed de cambios en %s", app.config['SSE_BIND'])
+    return feed_server
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def _route_reads():
+    # Con réplicas, quien acaba de escribir lee del primario durante
+    # DB_READ_YOUR_WRITES segundos (p. ej. la redirección tras editar)
+    wrote_at = session.get('db_write_at', 0) if app.config['DB_REPLICAS'] else 0
+    g.db_route = begin_request_routing(primary=time.time() - wrote_at < app.config['DB_READ_YOUR_WRITES'])
+
+@app.after_request
+def _remember_writes(response):
+    token = g.pop('db_route', None)
+    if token is not None and end_request_routing(token) and app.config['DB_REPLICAS']:
+        session['db_write_at'] = time.time()
+    return response
+
+@app.teardown_request
+def _end_routing(exc):
+    token = g.pop('db_route', None)
+    if token is not None:
+        end_request_routing(token)
+
+@app.after_request
+def _record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'not_found'
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, request.method)
+        metrics.HTTP_REQUESTS.inc(endpoint, request.method, response.status_code)
+    return response
 
 @app.route('/')
 def index():
@@ -28,11 +167,93 @@ def index():
     ]
     return render_template('index.html', servicios=servicios)
 
+def _archived_arg():
+    """?archived=true: incluir los leads del archivo frío"""
+    return request.args.get('archived', '').lower() in ('1', 'true')
+
+def _page_args():
+    """Lee limit, next y fields de la query string"""
+    limit = request.args.get('limit', app.config['LEADS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['LEADS_MAX_PAGE_SIZE']))
+    cursor = request.args.get('next') or None
+    fields = parse_fields(request.args.get('fields'))
+    return limit, cursor, fields
+
+# Peticiones condicionales: el ETag es la versión de los datos, que cada
+# escritura incrementa, así que un sondeo sin cambios se responde con 304
+# tras una lectura por clave primaria, sin consultar ni serializar leads.
+# El ETag de /leads incluye la fecha de las plantillas para que un
+# despliegue con HTML nuevo no se quede en la caché del navegador.
+_TEMPLATES_MTIME = int(max(
+    os.path.getmtime(os.path.join(app.root_path, 'templates', name))
+    for name in ('base.html', 'leads.html')
+))
+
+def _leads_validators(prefix):
+    """(etag, last_modified, versión) de los leads o (None, None, None).
+
+    La versión se pasa a get_leads_page/get_lead_stats para que el cuerpo
+    salga de la caché de esa misma versión y no de una anterior.
+    """
+    version = get_leads_version()
+    if version is None:
+        return None, None, None
+    number, changed_at = version
+    return f"{prefix}-{number}", datetime.fromtimestamp(changed_at, timezone.utc), number
+
+def _with_validators(response, etag, last_modified):
+    """Cabeceras de caché comunes a la respuesta completa y al 304"""
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    if etag is not None:
+        # Débil: la misma versión sirve comprimida o sin comprimir
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+    return response
+
+def _not_modified(etag, last_modified):
+    """Respuesta 304 si el cliente ya tiene esta versión; si no, None"""
+    if etag is None or is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return _with_validators(Response(status=304), etag, last_modified)
+
+def _compress(response):
+    """Comprime el cuerpo con brotli o gzip según Accept-Encoding"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        data = brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+        encoding = 'br'
+    elif accepted['gzip']:
+        data = gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'], mtime=0)
+        encoding = 'gzip'
+    else:
+        return response
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.route('/leads')
 def leads():
-    """Página para ver todos los leads"""
-    all_leads = get_all_leads()
-    return render_template('leads.html', leads=all_leads)
+    """Página para ver los leads, paginada por cursor"""
+    # Con mensajes flash pendientes la página cambia aunque no cambien los datos
+    etag, last_modified, version = (None, None, None) if session.get('_flashes') else _leads_validators(f"html-{_TEMPLATES_MTIME}")
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    try:
+        limit, cursor, _ = _page_args()
+        page, next_cursor = get_leads_page(limit=limit, cursor=cursor, version=version)
+    except ValueError:
+        return redirect(url_for('leads'))
+    stats = get_lead_stats(version) or {"total": 0, "este_mes": 0, "por_servicio": {}}
+    response = make_response(render_template('leads.html', leads=page, next_cursor=next_cursor, limit=limit, stats=stats))
+    return _compress(_with_validators(response, etag, last_modified))
 
 @app.route('/add_lead', methods=['POST'])
 def add_lead():
@@ -48,23 +269,382 @@ def add_lead():
             flash('Por favor complete todos los campos obligatorios', 'error')
             return redirect(url_for('index'))
         
-        if create_lead(nombre, correo, telefono, interes):
+        if ingest_queue is not None:
+            try:
+                future = ingest_queue.submit(nombre, correo, telefono, interes)
+            except IngestQueueFull:
+                # Backpressure: con la cola llena se escribe de forma síncrona
+                ok = create_lead(nombre, correo, telefono, interes)
+            else:
+                if not app.config['INGEST_WAIT']:
+                    flash('Lead recibido, se registrará en breve', 'success')
+                    return redirect(url_for('index'))
+                try:
+                    ok = future.result(timeout=app.config['INGEST_WAIT_TIMEOUT'])
+                except Exception as e:
+                    # Tiempo agotado o error de la base de datos: no es un duplicado
+                    logger.error("Lead sin confirmar en la cola de ingesta: %s", str(e) or type(e).__name__)
+                    flash('No se pudo confirmar el registro del lead. Inténtelo de nuevo en unos segundos.', 'error')
+                    return redirect(url_for('index'))
+        else:
+            ok = create_lead(nombre, correo, telefono, interes)
+        
+        if ok:
             flash('Lead registrado exitosamente!', 'success')
         else:
             flash('Error al registrar el lead. El correo puede estar duplicado.', 'error')
         
         return redirect(url_for('index'))
 
+_FORMAT_NAMES = {mimetype: name for name, mimetype in FORMATS.items()}
+
+def _leads_format():
+    """(tipo MIME, fechas) de /api/leads según ?format=, Accept y ?dates="""
+    name = request.args.get('format')
+    if name:
+        if name not in FORMATS:
+            raise ValueError(f"format debe ser uno de: {', '.join(FORMATS)}")
+        mimetype = FORMATS[name]
+    else:
+        mimetype = request.accept_mimetypes.best_match(list(FORMATS.values()), default=JSON)
+    dates = request.args.get('dates', 'iso')
+    if dates not in DATE_FORMATS:
+        raise ValueError(f"dates debe ser uno de: {', '.join(DATE_FORMATS)}")
+    return mimetype, dates
+
 @app.route('/api/leads', methods=['GET'])
 def api_leads():
-    """API endpoint para obtener leads en formato JSON"""
-    all_leads = get_all_leads()
-    return jsonify(all_leads)
+    """API endpoint para obtener leads en formato JSON (paginado por cursor).
+
+    Con Accept (o ?format=) columnar o MessagePack devuelve las columnas una
+    vez y un array de valores por columna (ver serializers.py). Con
+    ?archived=true continúa en el archivo frío tras los leads de la tabla.
+    """
+    try:
+        mimetype, dates = _leads_format()
+        limit, cursor, fields = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # La versión se lee antes que los datos: si cambian entre medias, el
+    # siguiente sondeo no coincide con el ETag y recibe la página nueva.
+    # Cada formato es una representación distinta con su propio ETag
+    prefix = "api" if mimetype == JSON else f"api-{_FORMAT_NAMES[mimetype]}-{dates}"
+    archived = _archived_arg()
+    if archived:
+        prefix += "-archived"
+    etag, last_modified, version = _leads_validators(prefix)
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        not_modified.vary.add('Accept')
+        return not_modified
+    try:
+        page, next_cursor = get_leads_page(limit=limit, cursor=cursor, fields=fields, archived=archived, version=version)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if mimetype == JSON:
+        response = jsonify({"leads": page, "next": next_cursor})
+    else:
+        document = columnar(page, fields or LEAD_COLUMNS, dates)
+        document["next"] = next_cursor
+        response = Response(encode(mimetype, document), mimetype=mimetype)
+    response.vary.add('Accept')
+    return _compress(_with_validators(response, etag, last_modified))
+
+def _json_default(value):
+    """Fechas en ISO 8601 para la exportación"""
+    if isinstance(value, Record):
+        return value._asdict()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _ndjson_lines(rows):
+    """Serializa cada lead como una línea JSON"""
+    for row in rows:
+        yield json.dumps(row, default=_json_default, ensure_ascii=False) + "\n"
+
+def _csv_lines(rows, columns):
+    """Serializa los leads como CSV con cabecera"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row[c] for c in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _chunked(lines, chunk_size=64 * 1024):
+    """Agrupa líneas en bloques para no enviar un trozo HTTP por fila"""
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(chunk).encode('utf-8')
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk).encode('utf-8')
+
+def _gzipped(chunks):
+    """Comprime el stream en formato gzip bloque a bloque"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/api/leads/stream')
+def stream_leads():
+    """Feed de cambios de leads (created/updated/deleted) por Server-Sent Events.
+
+    El navegador reenvía Last-Event-ID al reconectar y recibe los eventos
+    perdidos; un evento `reset` indica que debe recargar /api/leads. Aquí
+    cada conexión retiene un hilo: en gunicorn el feed lo sirve FeedServer
+    en SSE_BIND y esta vista no acepta suscriptores.
+    """
+    if feed_server is not None:
+        return jsonify({"error": f"El feed de cambios se sirve en {feed_server.bind}"}), 404
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = lead_events.subscribe(last_event_id)
+    if subscription is None:
+        return jsonify({"error": "Demasiados suscriptores, reintente más tarde"}), 503, {"Retry-After": "5"}
+    body = lead_events.stream(*subscription, heartbeat=app.config['SSE_HEARTBEAT'])
+    headers = {
+        "Cache-Control": "no-cache",
+        # Sin buffer en proxies (nginx) para que cada evento salga al momento
+        "X-Accel-Buffering": "no",
+    }
+    return Response(body, mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/leads/export', methods=['GET'])
+def export_leads():
+    """Exporta todos los leads en streaming como NDJSON o CSV (con
+    ?archived=true, también los del archivo frío)"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "format debe ser 'ndjson' o 'csv'"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    columns = fields or list(LEAD_COLUMNS)
+    rows = iter_leads(since=since, fields=columns, archived=_archived_arg())
+    if fmt == 'csv':
+        body = _chunked(_csv_lines(rows, columns))
+        mimetype = 'text/csv'
+    else:
+        body = _chunked(_ndjson_lines(rows))
+        mimetype = 'application/x-ndjson'
+
+    headers = {
+        "Content-Disposition": f"attachment; filename=leads.{fmt}",
+        "Vary": "Accept-Encoding"
+    }
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body = _gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype=mimetype, headers=headers)
+
+def _ndjson_row(line):
+    """Una línea NDJSON; None (fila rechazada) si no es JSON válido"""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+def _csv_rows(text):
+    """Filas del CSV; un error de formato a mitad se notifica como ValueError"""
+    try:
+        yield from csv.DictReader(text)
+    except csv.Error as e:
+        raise ValueError(f"CSV inválido: {e}") from e
+
+def _import_rows(stream, kind):
+    """Lee filas de un CSV, NDJSON o array JSON sin cargar el CSV completo.
+
+    Las líneas NDJSON mal formadas cuentan como rechazadas; un error de
+    codificación o de CSV detiene la lectura (ver import_leads).
+    """
+    if kind == 'json':
+        data = json.load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+        if not isinstance(data, list):
+            raise ValueError("Se esperaba un array JSON de leads")
+        return iter(data)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if kind == 'ndjson':
+        return (_ndjson_row(line) for line in text if line.strip())
+    return _csv_rows(text)
+
+def _import_kind(filename, mimetype):
+    """Determina el formato del archivo importado"""
+    name = (filename or '').lower()
+    if name.endswith('.ndjson') or name.endswith('.jsonl') or mimetype == 'application/x-ndjson':
+        return 'ndjson'
+    if name.endswith('.json') or mimetype == 'application/json':
+        return 'json'
+    if name.endswith('.csv') or mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    return None
+
+@app.route('/api/leads/import', methods=['POST'])
+def import_leads_route():
+    """Importa leads desde un archivo CSV/JSON en lotes"""
+    upload = request.files.get('file')
+    if upload:
+        stream, kind = upload.stream, _import_kind(upload.filename, upload.mimetype)
+    else:
+        stream, kind = request.stream, _import_kind(None, request.mimetype)
+    if kind is None:
+        return jsonify({"error": "Formato no soportado: use CSV, JSON o NDJSON"}), 415
+
+    batch_size = request.args.get('batch_size', app.config['IMPORT_BATCH_SIZE'], type=int)
+    batch_size = max(1, min(batch_size, 10000))
+    try:
+        result = import_leads(_import_rows(stream, kind), batch_size=batch_size)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": f"Archivo inválido: {e}"}), 400
+    if "error" in result:
+        # Archivo dañado a mitad: los lotes leídos antes ya están guardados
+        result["error"] = f"Archivo inválido: {result['error']}"
+        return jsonify(result), 400
+    return jsonify(result)
+
+def _batch_args():
+    """(payload, ids, filtros, dry_run, chunk_size) de una petición en lote"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ValueError("Se esperaba un objeto JSON con ids y/o filter")
+    ids, filters = parse_batch_selection(payload.get('ids'), payload.get('filter'))
+    dry_run = bool(payload.get('dry_run')) or request.args.get('dry_run', '').lower() in ('1', 'true')
+    chunk_size = payload.get('chunk_size', app.config['BATCH_CHUNK_SIZE'])
+    if type(chunk_size) is not int or chunk_size < 1:
+        raise ValueError("chunk_size debe ser un entero positivo")
+    return payload, ids, filters, dry_run, min(chunk_size, 10000)
+
+def _batch_response(result):
+    if result is None:
+        return jsonify({"error": "Sin conexión a la base de datos"}), 503
+    # Con error, los trozos anteriores ya están confirmados: se devuelven sus conteos
+    return jsonify(result), (500 if "error" in result else 200)
+
+@app.route('/api/leads/batch/update', methods=['POST'])
+def batch_update_route():
+    """Actualiza interes_servicio/telefono de los leads por ids o filtro.
+
+    {"ids": [...], "filter": {...}, "set": {...}, "dry_run": true}
+    """
+    try:
+        payload, ids, filters, dry_run, chunk_size = _batch_args()
+        changes = parse_batch_changes(payload.get('set'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _batch_response(batch_update_leads(ids, filters, changes, dry_run=dry_run, chunk_size=chunk_size))
+
+@app.route('/api/leads/batch/delete', methods=['POST'])
+def batch_delete_route():
+    """Elimina los leads por ids o filtro; {"dry_run": true} solo cuenta"""
+    try:
+        _, ids, filters, dry_run, chunk_size = _batch_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _batch_response(batch_delete_leads(ids, filters, dry_run=dry_run, chunk_size=chunk_size))
+
+# API JSON de leads con vistas async sobre database/async_models.py. Con
+# gunicorn (WSGI) Flask ejecuta cada vista async con async_to_sync, que
+# retiene el hilo del worker hasta que termina: la concurrencia sigue
+# limitada por SERVER_THREADS. Lo que se gana es que las consultas
+# independientes de una petición van a la vez (/api/dashboard)
+def _lead_json():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ValueError("Se esperaba un objeto JSON con el lead")
+    return parse_lead(payload)
+
+@app.route('/api/leads', methods=['POST'])
+async def api_create_lead():
+    """Crea un lead desde JSON (nombre_completo, correo_electronico, telefono, interes_servicio)"""
+    try:
+        lead = _lead_json()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not await async_db.create_lead(*lead):
+        return jsonify({"error": "No se pudo registrar el lead; el correo puede estar duplicado"}), 409
+    return jsonify({"created": True}), 201
+
+@app.route('/api/leads/<int:lead_id>', methods=['GET'])
+async def api_lead(lead_id):
+    """Lead por id, de la tabla o del archivo frío"""
+    lead = await async_db.get_lead_by_id(lead_id)
+    archived = lead is None
+    if archived:
+        lead = await asyncio.to_thread(get_archived_lead, lead_id)
+    if lead is None:
+        return jsonify({"error": "Lead no encontrado"}), 404
+    return jsonify({"lead": lead, "archivado": archived})
+
+@app.route('/api/leads/<int:lead_id>', methods=['PUT'])
+async def api_update_lead(lead_id):
+    """Reemplaza los datos de un lead"""
+    try:
+        lead = _lead_json()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not await async_db.update_lead(lead_id, *lead):
+        if await async_db.get_lead_by_id(lead_id) is None:
+            return jsonify({"error": "Lead no encontrado"}), 404
+        return jsonify({"error": "No se pudo actualizar el lead; el correo puede estar duplicado"}), 409
+    return jsonify({"lead": await async_db.get_lead_by_id(lead_id)})
+
+@app.route('/api/leads/<int:lead_id>', methods=['DELETE'])
+async def api_delete_lead(lead_id):
+    """Elimina un lead"""
+    if not await async_db.delete_lead(lead_id):
+        return jsonify({"error": "Lead no encontrado"}), 404
+    return Response(status=204)
+
+@app.route('/api/dashboard', methods=['GET'])
+async def api_dashboard():
+    """Estadísticas y primera página de leads, consultadas a la vez"""
+    try:
+        limit, cursor, fields = _page_args()
+        stats, (page, next_cursor) = await async_db.get_dashboard(limit, cursor, fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if stats is None:
+        return jsonify({"error": "No se pudieron obtener las estadísticas"}), 503
+    return jsonify({"stats": stats, "leads": page, "next": next_cursor})
+
+@app.route('/api/leads/lookup', methods=['GET'])
+def api_lead_lookup():
+    """Leads por correo (?correo=), de la tabla y del archivo frío"""
+    correo = request.args.get('correo', '').strip()
+    if not correo:
+        return jsonify({"error": "Indique el parámetro correo"}), 400
+    lead, archived = find_leads_by_email(correo, archived=request.args.get('archived', 'true').lower() != 'false')
+    if lead is None and not archived:
+        return jsonify({"error": "Lead no encontrado"}), 404
+    # Un correo archivado puede haberse registrado de nuevo: hasta un lead
+    # en la tabla y varios en el archivo
+    return jsonify({"lead": lead, "archivados": archived})
+
+@app.route('/api/leads/archive', methods=['GET'])
+def api_archive_stats():
+    """Particiones, filas y tamaño del archivo frío"""
+    return jsonify(get_archive_stats())
 
 @app.route('/edit_lead/<int:lead_id>', methods=['GET', 'POST'])
 def edit_lead(lead_id):
     """Editar lead existente"""
-    lead = get_lead_by_id(lead_id)
+    # Del primario: el formulario parte siempre de la última versión del lead
+    lead = get_lead_by_id(lead_id, primary=True)
     if not lead:
         flash('Lead no encontrado', 'error')
         return redirect(url_for('leads'))
@@ -106,17 +686,142 @@ def delete_lead_route(lead_id):
     
     return redirect(url_for('leads'))
 
+@app.route('/api/leads/stats', methods=['GET'])
+def api_lead_stats():
+    """Estadísticas agregadas de leads en formato JSON"""
+    stats = get_lead_stats()
+    if stats is None:
+        return jsonify({"error": "No se pudieron obtener las estadísticas"}), 503
+    return jsonify(stats)
+
+def _date_arg(name):
+    """Parámetro YYYY-MM-DD de la query string; ValueError si no es válido"""
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+@app.route('/api/reports/leads', methods=['GET'])
+def api_leads_report():
+    """Leads por periodo (day, month, quarter, year) y servicio"""
+    period = request.args.get('period', 'month')
+    if period not in REPORT_PERIODS:
+        return jsonify({"error": f"period debe ser uno de: {', '.join(REPORT_PERIODS)}"}), 400
+    try:
+        desde, hasta = _date_arg('desde'), _date_arg('hasta')
+    except ValueError:
+        return jsonify({"error": "desde y hasta deben tener formato YYYY-MM-DD"}), 400
+    if desde and hasta and desde > hasta:
+        return jsonify({"error": "desde no puede ser posterior a hasta"}), 400
+    report = get_leads_report(period, desde, hasta, request.args.get('servicio') or None)
+    if report is None:
+        return jsonify({"error": "No se pudo obtener el informe"}), 503
+    return jsonify(report)
+
+@app.route('/api/reports/summary', methods=['GET'])
+def api_leads_summary():
+    """Resumen general: total, servicios, con teléfono, primer y último día"""
+    summary = get_leads_summary()
+    if summary is None:
+        return jsonify({"error": "No se pudo obtener el resumen"}), 503
+    return jsonify(summary)
+
+@app.route('/api/leads/search', methods=['GET'])
+def api_search_leads():
+    """Busca leads por fragmentos de nombre, correo o teléfono"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    backend = request.args.get('backend')
+    if backend not in (None, 'db', 'memory'):
+        return jsonify({"error": "backend debe ser 'db' o 'memory'"}), 400
+    return jsonify({"query": query, "results": search_leads(query, limit, backend)})
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Contadores de la caché de leads (aciertos, fallos, expulsiones)"""
+    return jsonify(get_cache_stats())
+
+@app.route('/api/leads/email-filter/stats')
+def email_filter_stats():
+    """Memoria, ocupación y falsos positivos del filtro de correos"""
+    return jsonify(get_email_filter_stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas en formato de exposición Prometheus"""
+    pool = get_pool_stats()
+    gauges = [
+        ('leadtracker_db_pool_in_use', 'Conexiones prestadas', pool['in_use']),
+        ('leadtracker_db_pool_idle', 'Conexiones libres en el pool', pool['idle']),
+        ('leadtracker_db_pool_waiting', 'Hilos esperando una conexión', pool['waiting']),
+        ('leadtracker_db_pool_created', 'Conexiones abiertas desde el arranque', pool['created']),
+        ('leadtracker_db_pool_recycled', 'Conexiones recicladas desde el arranque', pool['recycled']),
+        ('leadtracker_db_pool_timeouts', 'Esperas de conexión agotadas', pool['timeouts']),
+    ]
+    breaker = get_breaker_stats()
+    gauges.append(('leadtracker_db_breaker_open', 'Circuit breaker abierto (1) o cerrado (0)',
+                   int(breaker['state'] != 'closed')))
+    gauges.append(('leadtracker_db_breaker_rejected', 'Conexiones rechazadas por el breaker', breaker['rejected']))
+    replicas = get_replica_stats()
+    if replicas:
+        gauges.append(('leadtracker_db_replicas_healthy', 'Réplicas de lectura con el breaker cerrado',
+                       sum(1 for replica in replicas if replica['breaker']['state'] != 'open')))
+    cache = get_cache_stats()
+    for key in ('hits', 'misses', 'evictions', 'invalidations', 'stale_skips'):
+        if key in cache:
+            gauges.append((f'leadtracker_cache_{key}', f'Caché de leads: {key}', cache[key]))
+    for key, value in get_event_stats().items():
+        gauges.append((f'leadtracker_events_{key}', f'Feed de cambios: {key}', value))
+    if feed_server is not None:
+        feed = feed_server.stats()
+        gauges.append(('leadtracker_events_connections', 'Conexiones abiertas al servidor del feed', feed['connections']))
+        gauges.append(('leadtracker_events_rejected', 'Suscriptores rechazados por el límite', feed['rejected']))
+    for key, value in get_email_filter_stats().items():
+        if isinstance(value, (int, float)):
+            gauges.append((f'leadtracker_email_filter_{key}', f'Filtro de correos: {key}', int(value) if isinstance(value, bool) else value))
+    async_pool = async_db.get_pool_stats()
+    if async_pool is not None:
+        for key in ('in_use', 'idle', 'waiting', 'created', 'timeouts'):
+            gauges.append((f'leadtracker_db_async_pool_{key}', f'Pool asíncrono: {key}', async_pool[key]))
+    archive = get_archive_stats()
+    gauges.append(('leadtracker_archive_rows', 'Leads en el archivo frío', archive['rows']))
+    gauges.append(('leadtracker_archive_bytes', 'Bytes comprimidos del archivo frío', archive['bytes']))
+    if ingest_queue is not None:
+        for key, value in ingest_queue.stats().items():
+            gauges.append((f'leadtracker_ingest_{key}', f'Cola de ingesta: {key}', value))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
-    """Endpoint para verificar el estado de la aplicación y base de datos"""
-    db_status = "✅ Conectado" if test_connection() else "❌ Error"
+    """Endpoint para verificar el estado de la aplicación y base de datos (cacheado)"""
+    db = health_monitor.snapshot()
+    db_status = "✅ Conectado" if db["ok"] else "❌ Error"
     return {
         "status": "OK",
         "database": db_status,
         "service": "LeadTracker API"
     }
 
+@app.route('/health/live')
+def liveness():
+    """Liveness: el proceso responde; no toca la base de datos"""
+    return {"status": "OK"}
+
+@app.route('/health/ready')
+def readiness():
+    """Readiness: último resultado del heartbeat de la base de datos"""
+    db = health_monitor.snapshot()
+    body = {
+        "status": "OK" if db["ok"] else "UNAVAILABLE",
+        "database": db,
+        "breaker": get_breaker_stats(),
+        "replicas": [
+            {"name": replica["name"], "state": replica["breaker"]["state"], "in_use": replica["pool"]["in_use"]}
+            for replica in get_replica_stats()
+        ]
+    }
+    return body, (200 if db["ok"] else 503)
+
 if __name__ == '__main__':
-    print(f"🌐 Servidor iniciado en http://0.0.0.0:5000")
-    print(f"📊 Conectado a RDS: {config['default'].DB_HOST}")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Servidor de desarrollo (un proceso); en producción: gunicorn -c gunicorn.conf.py app:app
+    init_db()
+    logger.info("Servidor iniciado en http://0.0.0.0:5000 (RDS: %s)", config['default'].DB_HOST)
+    app.run(host='0.0.0.0', port=5000, debug=app.config['DEBUG'])
\ No newline at end of file
@@ -0,0 +1,492 @@
+# benchmark.py
+"""Benchmark reproducible de LeadTracker.
+
+Arranca la aplicación en un servidor local contra una base de datos de
+prueba (SQLite en un fichero temporal por defecto), la siembra con N leads
+y mide:
+
+- rutas HTTP (/add_lead, /leads, /api/leads, /edit_lead/<id>, /health)
+  atacadas en paralelo: throughput y latencias p50/p95/p99 por ruta;
+- micro-benchmarks de cada función CRUD de database/models.py;
+- formatos de /api/leads (serializers.py): tamaño y tiempo de codificación
+  de una página frente al JSON de siempre;
+- pico de memoria residente (RSS) del proceso.
+
+El resultado se guarda en JSON para comparar dos ejecuciones:
+
+    python benchmark.py --leads 5000 --output antes.json
+    python benchmark.py --leads 5000 --output despues.json --compare antes.json
+
+Con --engine env se usa la base de datos configurada en .env / variables
+de entorno en lugar del SQLite temporal (¡escribe datos de prueba en ella!).
+"""
+import argparse
+import gzip
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+SERVICIOS = [
+    "Consultoría Tecnológica",
+    "Desarrollo de Software",
+    "Marketing Digital",
+    "Análisis de Datos",
+    "Transformación Digital",
+    "Soporte Técnico",
+]
+NOMBRES = [
+    "María", "José", "Lucía", "Juan", "Sofía", "Carlos", "Valentina", "Luis",
+    "Camila", "Miguel", "Daniela", "Jorge", "Gabriela", "Andrés", "Fernanda",
+    "Diego", "Ana", "Ricardo", "Isabel", "Alejandro", "Rosa", "Fernando",
+    "Paula", "Javier", "Carmen", "Sebastián", "Elena", "Raúl", "Natalia", "Óscar",
+]
+APELLIDOS = [
+    "García", "Rodríguez", "Martínez", "López", "González", "Pérez", "Sánchez",
+    "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Cruz", "Morales",
+    "Reyes", "Gutiérrez", "Ortiz", "Chávez", "Ramos", "Vargas", "Castillo",
+    "Jiménez", "Rojas", "Mendoza", "Quispe", "Huamán", "Núñez", "Vallejo", "Muñoz",
+]
+
+
+def _slug(text):
+    table = str.maketrans("áéíóúñÁÉÍÓÚÑ", "aeiounAEIOUN")
+    return text.translate(table).lower().replace(' ', '.')
+
+
+def fake_lead(rng, tag):
+    """Lead realista con correo único (`tag` lo distingue)"""
+    nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+    return {
+        "nombre_completo": nombre,
+        "correo_electronico": f"{_slug(nombre)}.{tag}@example.com",
+        "telefono": f"9{rng.randrange(10 ** 8):08d}",
+        "interes_servicio": rng.choice(SERVICIOS),
+    }
+
+
+def percentiles(samples):
+    """Resumen de latencias en milisegundos (percentil por rango más cercano)"""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(samples)
+
+    def rank(p):
+        index = min(len(ordered), max(1, math.ceil(p / 100 * len(ordered)))) - 1
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def peak_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KiB y macOS en bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+# ----------------------------------------------------------------------
+# Preparación del entorno
+# ----------------------------------------------------------------------
+def configure_environment(args):
+    """Variables de entorno que leen config.py y la app; antes de importarlas"""
+    if args.engine == 'sqlite':
+        os.environ['DB_ENGINE'] = 'sqlite'
+        os.environ['DB_PATH'] = args.db_path or os.path.join(
+            tempfile.mkdtemp(prefix='leadtracker-bench-'), 'bench.db')
+    os.environ['CACHE_BACKEND'] = args.cache
+    os.environ.setdefault('LOG_LEVEL', 'OFF')
+
+
+def seed(models, count, rng, batch_size):
+    """Siembra `count` leads con import_leads; devuelve métricas de la carga"""
+    start = time.perf_counter()
+    rows = (fake_lead(rng, f"seed{i}") for i in range(count))
+    result = models.import_leads(rows, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {
+        "leads": result["totals"]["inserted"],
+        "duplicates": result["totals"]["duplicates"],
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(count / elapsed, 1) if elapsed else None,
+    }
+
+
+def known_leads(models):
+    """(id, correo) de los leads existentes para /edit_lead y update_lead"""
+    return [(lead['id'], lead['correo_electronico'])
+            for lead in models.iter_leads(fields=['id', 'correo_electronico'])]
+
+
+# ----------------------------------------------------------------------
+# Rutas HTTP
+# ----------------------------------------------------------------------
+class HttpWorker(threading.Thread):
+    """Cliente HTTP keep-alive que lanza peticiones hasta `deadline`"""
+
+    def __init__(self, number, port, scenarios, leads, deadline, rng):
+        super().__init__(name=f"bench-{number}", daemon=True)
+        self.number = number
+        self.port = port
+        self.scenarios = scenarios
+        self.leads = leads
+        self.deadline = deadline
+        self.rng = rng
+        self.samples = {name: [] for name in scenarios}
+        self.errors = {name: 0 for name in scenarios}
+        self._conn = None
+        self._sequence = 0
+
+    def _request(self, method, path, form=None):
+        body = urlencode(form).encode() if form else None
+        headers = {"Content-Type": "application/x-www-form-urlencoded"} if form else {}
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self._conn.close()
+                    self._conn = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                # El servidor cerró la conexión keep-alive: se reintenta una vez
+                self._conn.close()
+                self._conn = None
+                if attempt == 2:
+                    raise
+
+    def _form(self, lead, correo=None):
+        return {
+            "nombre": lead["nombre_completo"],
+            "correo": correo or lead["correo_electronico"],
+            "telefono": lead["telefono"],
+            "interes": lead["interes_servicio"],
+        }
+
+    def call(self, name):
+        if name == 'add_lead':
+            self._sequence += 1
+            lead = fake_lead(self.rng, f"w{self.number}r{self._sequence}")
+            return self._request('POST', '/add_lead', self._form(lead))
+        if name == 'edit_lead':
+            lead_id, correo = self.rng.choice(self.leads)
+            lead = fake_lead(self.rng, 'edit')
+            return self._request('POST', f'/edit_lead/{lead_id}', self._form(lead, correo))
+        if name == 'leads':
+            return self._request('GET', '/leads')
+        if name == 'api_leads':
+            return self._request('GET', '/api/leads?limit=50')
+        return self._request('GET', '/health')
+
+    def run(self):
+        names = list(self.scenarios)
+        while time.perf_counter() < self.deadline:
+            name = self.rng.choice(names)
+            start = time.perf_counter()
+            try:
+                status = self.call(name)
+                ok = status < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                self.samples[name].append(elapsed)
+            else:
+                self.errors[name] += 1
+        if self._conn is not None:
+            self._conn.close()
+
+
+ROUTES = {
+    'add_lead': 'POST /add_lead',
+    'leads': 'GET /leads',
+    'api_leads': 'GET /api/leads',
+    'edit_lead': 'POST /edit_lead/<id>',
+    'health': 'GET /health',
+}
+
+
+def run_routes(app, leads, concurrency, duration, seed_value):
+    """Ataca las rutas en paralelo durante `duration` segundos"""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, name='bench-server', daemon=True)
+    server_thread.start()
+    try:
+        # Calentamiento: plantillas compiladas y primera conexión abierta
+        warmup = HttpWorker(-1, server.server_port, ROUTES, leads, 0, random.Random(seed_value))
+        for name in ROUTES:
+            warmup.call(name)
+        warmup.run()
+
+        start = time.perf_counter()
+        deadline = start + duration
+        workers = [
+            HttpWorker(n, server.server_port, ROUTES, leads, deadline, random.Random(seed_value + n))
+            for n in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    results = {}
+    all_samples, all_errors = [], 0
+    for name, label in ROUTES.items():
+        samples = [s for worker in workers for s in worker.samples[name]]
+        errors = sum(worker.errors[name] for worker in workers)
+        all_samples.extend(samples)
+        all_errors += errors
+        results[label] = {
+            "requests": len(samples),
+            "errors": errors,
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "latency_ms": percentiles(samples),
+        }
+    results["TOTAL"] = {
+        "requests": len(all_samples),
+        "errors": all_errors,
+        "throughput_rps": round(len(all_samples) / elapsed, 1),
+        "latency_ms": percentiles(all_samples),
+    }
+    return results
+
+
+# ----------------------------------------------------------------------
+# Micro-benchmarks CRUD
+# ----------------------------------------------------------------------
+def _measure(func, iterations):
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / total, 1) if total else None,
+        "latency_ms": percentiles(samples),
+    }
+
+
+def run_crud(models, leads, iterations, rng):
+    """Cada función de la capa de datos, de una en una y sin concurrencia"""
+    created = []
+
+    def create(i):
+        lead = fake_lead(rng, f"micro{i}")
+        if models.create_lead(lead["nombre_completo"], lead["correo_electronico"],
+                              lead["telefono"], lead["interes_servicio"]):
+            created.append(lead["correo_electronico"])
+
+    def update(i):
+        lead_id, correo = rng.choice(leads)
+        lead = fake_lead(rng, 'micro')
+        models.update_lead(lead_id, lead["nombre_completo"], correo,
+                           lead["telefono"], lead["interes_servicio"])
+
+    results = {
+        "create_lead": _measure(create, iterations),
+        "get_lead_by_id": _measure(lambda i: models.get_lead_by_id(rng.choice(leads)[0]), iterations),
+        "get_leads_page": _measure(lambda i: models.get_leads_page(limit=50), iterations),
+        "get_lead_stats": _measure(lambda i: models.get_lead_stats(), iterations),
+        "update_lead": _measure(update, iterations),
+        "search_leads": _measure(lambda i: models.search_leads(rng.choice(APELLIDOS)[:4]), iterations),
+        # Recorre la tabla entera: menos iteraciones
+        "iter_leads": _measure(lambda i: sum(1 for _ in models.iter_leads()), max(5, iterations // 20)),
+    }
+
+    # Se borran los leads creados arriba para no alterar ejecuciones siguientes
+    created = set(created)
+    created_ids = [lead_id for lead_id, correo in known_leads(models) if correo in created]
+    results["delete_lead"] = _measure(lambda i: models.delete_lead(created_ids[i]), len(created_ids))
+    return results
+
+
+# ----------------------------------------------------------------------
+# Formatos de /api/leads
+# ----------------------------------------------------------------------
+def run_serializers(app, models, page_sizes, iterations):
+    """Bytes (sin comprimir y con gzip) y tiempo de codificar una página"""
+    import serializers
+    from database.records import LEAD_COLUMNS
+
+    def stdlib_columnar(page, dates):
+        document = serializers.columnar(page, LEAD_COLUMNS, dates)
+        return json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    encoders = {
+        # Lo que devolvía /api/leads: lista de objetos con el encoder de Flask
+        "json": lambda page: app.json.dumps({"leads": page, "next": None}).encode('utf-8'),
+        "columnar_stdlib_iso": lambda page: stdlib_columnar(page, 'iso'),
+        "columnar_stdlib_epoch": lambda page: stdlib_columnar(page, 'epoch'),
+    }
+    for dates in serializers.DATE_FORMATS:
+        if serializers.orjson is not None:
+            encoders[f"columnar_orjson_{dates}"] = (
+                lambda page, dates=dates: serializers.encode(
+                    serializers.COLUMNAR_JSON, serializers.columnar(page, LEAD_COLUMNS, dates)))
+        if serializers.msgpack is not None:
+            encoders[f"msgpack_{dates}"] = (
+                lambda page, dates=dates: serializers.encode(
+                    serializers.MSGPACK, serializers.columnar(page, LEAD_COLUMNS, dates)))
+
+    results = {}
+    for size in page_sizes:
+        page, _ = models.get_leads_page(limit=size)
+        section = results[str(len(page))] = {}
+        for name, encoder in encoders.items():
+            body = encoder(page)
+            timing = _measure(lambda i: encoder(page), iterations)
+            section[name] = {
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=6, mtime=0)),
+                "encode_ms": timing["latency_ms"],
+            }
+    return results
+
+
+# ----------------------------------------------------------------------
+# Comparación de resultados
+# ----------------------------------------------------------------------
+def _delta(old, new):
+    if not old or new is None:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def compare(base, current):
+    """Tabla de diferencias de throughput y p95 entre dos ejecuciones"""
+    lines = [f"{'':28} {'rps/ops':>10} {'Δ':>8} {'p95 ms':>10} {'Δ':>8}"]
+    for section, rate_key in (("routes", "throughput_rps"), ("crud", "ops_per_sec")):
+        for name, now in current.get(section, {}).items():
+            before = base.get(section, {}).get(name)
+            if before is None:
+                continue
+            lines.append(
+                f"{name:28} {now[rate_key] or 0:>10} {_delta(before[rate_key], now[rate_key]):>8} "
+                f"{now['latency_ms']['p95'] or 0:>10} "
+                f"{_delta(before['latency_ms']['p95'], now['latency_ms']['p95']):>8}"
+            )
+    lines.append(f"{'peak_rss_mb':28} {current['peak_rss_bytes'] / 2 ** 20:>10.1f} "
+                 f"{_delta(base['peak_rss_bytes'], current['peak_rss_bytes']):>8}")
+    return "\n".join(lines)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de rutas y CRUD de LeadTracker")
+    parser.add_argument('--leads', type=int, default=5000, help="leads sembrados antes de medir")
+    parser.add_argument('--concurrency', type=int, default=8, help="clientes HTTP en paralelo")
+    parser.add_argument('--duration', type=float, default=10.0, help="segundos de carga HTTP")
+    parser.add_argument('--iterations', type=int, default=200, help="iteraciones por función CRUD")
+    parser.add_argument('--engine', choices=['sqlite', 'env'], default='sqlite',
+                        help="sqlite: fichero temporal; env: la base de datos configurada")
+    parser.add_argument('--db-path', help="fichero SQLite (por defecto uno temporal)")
+    parser.add_argument('--cache', choices=['none', 'memory'], default='none',
+                        help="caché de lecturas durante el benchmark")
+    parser.add_argument('--seed', type=int, default=42, help="semilla de los datos aleatorios")
+    parser.add_argument('--skip-routes', action='store_true')
+    parser.add_argument('--skip-crud', action='store_true')
+    parser.add_argument('--skip-serializers', action='store_true')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', metavar='BASE_JSON', help="resultado previo con el que comparar")
+    args = parser.parse_args(argv)
+
+    configure_environment(args)
+    # Importar después de fijar el entorno: config.py lo lee al importarse
+    from database import models
+    from database.migrations import migrate
+    from app import app
+    from config import config
+
+    rng = random.Random(args.seed)
+    migrate()
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec='seconds'),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": config['default'].DB_ENGINE,
+            "cache": args.cache,
+            "leads": args.leads,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "seed": seed(models, args.leads, rng, app.config['IMPORT_BATCH_SIZE']),
+    }
+    leads = known_leads(models)
+    if not leads:
+        raise SystemExit("No hay leads en la base de datos de prueba")
+    print(f"Sembrados {report['seed']['leads']} leads en {report['seed']['seconds']} s", file=sys.stderr)
+
+    if not args.skip_routes:
+        print(f"Rutas: {args.concurrency} clientes durante {args.duration} s", file=sys.stderr)
+        report["routes"] = run_routes(app, leads, args.concurrency, args.duration, args.seed)
+    if not args.skip_crud:
+        print(f"CRUD: {args.iterations} iteraciones por función", file=sys.stderr)
+        report["crud"] = run_crud(models, leads, args.iterations, rng)
+    if not args.skip_serializers:
+        print("Formatos de /api/leads", file=sys.stderr)
+        report["serializers"] = run_serializers(
+            app, models, (app.config['LEADS_PAGE_SIZE'], app.config['LEADS_MAX_PAGE_SIZE']), args.iterations)
+    report["peak_rss_bytes"] = peak_rss_bytes()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados en {args.output}", file=sys.stderr)
+
+    for section in ("routes", "crud"):
+        for name, result in report.get(section, {}).items():
+            rate = result.get("throughput_rps", result.get("ops_per_sec"))
+            latency = result["latency_ms"]
+            print(f"{name:28} {rate:>10} /s  p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms")
+    for size, formats in report.get("serializers", {}).items():
+        for name, result in formats.items():
+            print(f"{name + ' x' + size:28} {result['bytes']:>10} B  gzip {result['gzip_bytes']} B  "
+                  f"p50 {result['encode_ms']['p50']} ms")
+    print(f"{'peak_rss_mb':28} {report['peak_rss_bytes'] / 2 ** 20:>10.1f}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = json.load(f)
+        print()
+        print(compare(base, report))
+
+
+if __name__ == '__main__':
+    main()
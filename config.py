@@ -13,11 +13,107 @@ class Config:
     DB_USER = os.environ.get('DB_USER', 'admin')
     DB_PASSWORD = os.environ.get('DB_PASSWORD', '12345678')
     DB_PORT = os.environ.get('DB_PORT', '3306')
+    # Fichero de la base embebida cuando DB_ENGINE=sqlite (edge/kiosko, CI)
+    DB_PATH = os.environ.get('DB_PATH', 'leadtracker.db')
+    # Réplicas de lectura separadas por comas: 'host' o 'host:puerto'
+    # (ficheros con DB_ENGINE=sqlite). Vacío = todo va al primario
+    DB_REPLICAS = [r.strip() for r in os.environ.get('DB_REPLICAS', '').split(',') if r.strip()]
+    # Segundos que un cliente lee del primario tras escribir (read-your-writes)
+    DB_READ_YOUR_WRITES = float(os.environ.get('DB_READ_YOUR_WRITES', '5'))
+
+    # Pool de conexiones
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '3600'))
+    DB_POOL_IDLE_TIMEOUT = int(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300'))
+    # Pool del driver asíncrono (database/async_models.py), uno por proceso
+    DB_ASYNC_POOL_MAX_SIZE = int(os.environ.get('DB_ASYNC_POOL_MAX_SIZE', '20'))
+
+    # Circuit breaker y heartbeat de la base de datos
+    DB_BREAKER_THRESHOLD = int(os.environ.get('DB_BREAKER_THRESHOLD', '3'))
+    DB_BREAKER_RESET = float(os.environ.get('DB_BREAKER_RESET', '15'))
+    HEALTH_INTERVAL = float(os.environ.get('HEALTH_INTERVAL', '5'))
+    HEALTH_MAX_AGE = float(os.environ.get('HEALTH_MAX_AGE', '15'))
+
+    # Paginación de leads
+    LEADS_PAGE_SIZE = int(os.environ.get('LEADS_PAGE_SIZE', '50'))
+    LEADS_MAX_PAGE_SIZE = int(os.environ.get('LEADS_MAX_PAGE_SIZE', '500'))
+    # Compresión de /api/leads y /leads (brotli si está instalado, si no gzip)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+
+    # Importación masiva
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+
+    # Actualización/borrado en lote: filas por transacción y máximo de ids
+    BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', '1000'))
+    BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', '100000'))
+
+    # Archivo frío (`flask --app app archive`): los leads con más de
+    # ARCHIVE_AFTER_DAYS días pasan a ficheros comprimidos por mes en ARCHIVE_DIR
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+    ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', '5000'))
+    ARCHIVE_COMPRESS_LEVEL = int(os.environ.get('ARCHIVE_COMPRESS_LEVEL', '9'))
+    ARCHIVE_BLOCK_CACHE = int(os.environ.get('ARCHIVE_BLOCK_CACHE', '64'))
+
+    # Ingesta diferida de /add_lead ('sync' o 'buffered')
+    INGEST_MODE = os.environ.get('INGEST_MODE', 'sync')
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', '10000'))
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', '500'))
+    INGEST_FLUSH_MS = int(os.environ.get('INGEST_FLUSH_MS', '50'))
+    INGEST_WAIT = os.environ.get('INGEST_WAIT', 'true').lower() == 'true'
+    INGEST_WAIT_TIMEOUT = float(os.environ.get('INGEST_WAIT_TIMEOUT', '5'))
+
+    # Caché de lectura ('memory', 'redis' o 'none')
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', '60'))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Búsqueda ('db' usa índices FULLTEXT/trigramas, 'memory' el índice n-grama)
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'db')
+    SEARCH_INDEX_REFRESH = int(os.environ.get('SEARCH_INDEX_REFRESH', '30'))
+
+    # Filtro de cuckoo de correos para detectar altas duplicadas sin INSERT;
+    # la capacidad mínima crece al doble de los leads existentes
+    EMAIL_FILTER = os.environ.get('EMAIL_FILTER', 'true').lower() == 'true'
+    EMAIL_FILTER_CAPACITY = int(os.environ.get('EMAIL_FILTER_CAPACITY', '100000'))
+
+    # Feed de cambios /api/leads/stream (Server-Sent Events)
+    SSE_HISTORY = int(os.environ.get('SSE_HISTORY', '1000'))
+    SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', '256'))
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', '15'))
+    # Puerto del servidor asíncrono del feed en cada worker de gunicorn
+    # (database/feed.py); el proxy le enruta /api/leads/stream
+    SSE_BIND = os.environ.get('SSE_BIND', '0.0.0.0:5001')
+    # Suscriptores por worker: sin hilo propio, cada uno cuesta un socket y su buffer
+    SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', '1000'))
+
+    # Servidor de producción (gunicorn.conf.py): workers prefork con la app
+    # precargada, reciclados tras SERVER_MAX_REQUESTS peticiones (+ jitter)
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', str(2 * (os.cpu_count() or 1) + 1)))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '4'))
+    SERVER_WORKER_CLASS = os.environ.get('SERVER_WORKER_CLASS', 'gthread')
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', '10000'))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', '1000'))
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', '30'))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', '30'))
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', '5'))
+
+    # Logging ('DEBUG', 'INFO', 'WARNING', 'ERROR' u 'OFF') y muestreo de INFO/DEBUG
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
     
     @property
     def DATABASE_URI(self):
         if self.DB_ENGINE == 'mysql':
             return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        elif self.DB_ENGINE == 'sqlite':
+            return f"sqlite:///{self.DB_PATH}"
         else:
             return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
@@ -26,9 +122,12 @@ class DevelopmentConfig(Config):
 
 class ProductionConfig(Config):
     DEBUG = False
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
 
+# APP_ENV=production selecciona ProductionConfig (gunicorn.conf.py lo fija);
+# todo el código lee la configuración activa de config['default']
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
-    'default': DevelopmentConfig
+    'default': ProductionConfig if os.environ.get('APP_ENV') == 'production' else DevelopmentConfig
 }
\ No newline at end of file
@@ -0,0 +1,515 @@
+# database/aio.py
+"""Acceso asíncrono a la base de datos: drivers, pool y bucle de eventos.
+
+Cada driver asíncrono (aiomysql, asyncpg, y aiosqlite con DB_ENGINE=sqlite)
+se envuelve en una conexión con la misma interfaz mínima: fetchone,
+fetchall y execute con el SQL de database/models.py (placeholders `%s`),
+commit, rollback y close. Como en los dialectos síncronos, solo se importa
+el driver del motor configurado.
+
+El pool (AsyncPool) y sus conexiones pertenecen a un único bucle de eventos
+que corre en un hilo propio (DatabaseLoop). Las corrutinas de
+database/async_models.py se ejecutan en ese bucle aunque se esperen desde
+otro: Flask crea un bucle por petición en las vistas async y las conexiones
+no pueden compartirse entre bucles.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from database.dialects import _PLACEHOLDER, _host_port
+from database.pool import PoolTimeout
+
+
+class AsyncConnection:
+    """Interfaz común de las conexiones asíncronas"""
+
+    closed = False
+
+    async def fetchall(self, sql, params=()):
+        raise NotImplementedError
+
+    async def fetchone(self, sql, params=()):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+    async def execute(self, sql, params=()):
+        """Ejecuta una escritura; devuelve (filas afectadas, último id o None)"""
+        raise NotImplementedError
+
+    async def commit(self):
+        raise NotImplementedError
+
+    async def rollback(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+
+class _MySQLConnection(AsyncConnection):
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def closed(self):
+        return self._conn.closed
+
+    async def fetchall(self, sql, params=()):
+        async with self._conn.cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+    async def fetchone(self, sql, params=()):
+        async with self._conn.cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchone()
+
+    async def execute(self, sql, params=()):
+        async with self._conn.cursor() as cur:
+            await cur.execute(sql, params)
+            return cur.rowcount, cur.lastrowid
+
+    async def commit(self):
+        await self._conn.commit()
+
+    async def rollback(self):
+        await self._conn.rollback()
+
+    async def close(self):
+        self._conn.close()
+
+
+@lru_cache(maxsize=512)
+def _numbered(sql):
+    """%s -> $1, $2... (asyncpg) y %% -> %"""
+    counter = iter(range(1, sql.count('%s') + 1))
+    return _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else f'${next(counter)}', sql)
+
+
+class _PostgresConnection(AsyncConnection):
+    """asyncpg confirma cada sentencia por defecto; aquí la transacción se
+    abre con la primera sentencia y dura hasta commit/rollback, como en
+    psycopg2. asyncpg prepara y guarda las sentencias por conexión."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._transaction = None
+
+    @property
+    def closed(self):
+        return self._conn.is_closed()
+
+    async def _begin(self):
+        if self._transaction is None:
+            self._transaction = self._conn.transaction()
+            await self._transaction.start()
+
+    async def fetchall(self, sql, params=()):
+        await self._begin()
+        return [tuple(row) for row in await self._conn.fetch(_numbered(sql), *params)]
+
+    async def execute(self, sql, params=()):
+        await self._begin()
+        status = await self._conn.execute(_numbered(sql), *params)
+        # 'UPDATE 3', 'DELETE 0', 'INSERT 0 1'
+        count = status.rsplit(' ', 1)[-1]
+        return (int(count) if count.isdigit() else -1), None
+
+    async def commit(self):
+        transaction, self._transaction = self._transaction, None
+        if transaction is not None:
+            await transaction.commit()
+
+    async def rollback(self):
+        transaction, self._transaction = self._transaction, None
+        if transaction is not None:
+            await transaction.rollback()
+
+    async def close(self):
+        await self._conn.close()
+
+
+class _SQLiteConnection(AsyncConnection):
+    """aiosqlite con los pragmas, fechas y placeholders de sqlite_backend"""
+
+    def __init__(self, conn, translate):
+        self._conn = conn
+        self._translate = translate
+        self.closed = False
+
+    async def fetchall(self, sql, params=()):
+        async with self._conn.execute(self._translate(sql), list(params)) as cur:
+            return await cur.fetchall()
+
+    async def fetchone(self, sql, params=()):
+        async with self._conn.execute(self._translate(sql), list(params)) as cur:
+            return await cur.fetchone()
+
+    async def execute(self, sql, params=()):
+        async with self._conn.execute(self._translate(sql), list(params)) as cur:
+            return cur.rowcount, cur.lastrowid
+
+    async def commit(self):
+        await self._conn.commit()
+
+    async def rollback(self):
+        await self._conn.rollback()
+
+    async def close(self):
+        self.closed = True
+        await self._conn.close()
+
+
+class AsyncDriver:
+    name = None
+    # Excepción del driver para una clave UNIQUE duplicada
+    IntegrityError = None
+
+    async def connect(self, cfg):
+        """Abre una conexión (AsyncConnection) al primario"""
+        raise NotImplementedError
+
+    async def validate(self, conn):
+        """Comprueba que una conexión reutilizada del pool sigue viva"""
+        if conn.closed:
+            return False
+        await conn.fetchone("SELECT 1")
+        return True
+
+
+class MySQLAsyncDriver(AsyncDriver):
+    name = 'mysql'
+
+    def __init__(self):
+        import aiomysql
+        self.module = aiomysql
+        self.IntegrityError = aiomysql.IntegrityError
+
+    async def connect(self, cfg):
+        host, port = _host_port(cfg, None)
+        conn = await self.module.connect(
+            host=host,
+            db=cfg.DB_NAME,
+            user=cfg.DB_USER,
+            password=cfg.DB_PASSWORD,
+            port=int(port),
+            connect_timeout=10,
+            charset='utf8mb4',
+            autocommit=False
+        )
+        return _MySQLConnection(conn)
+
+
+class PostgresAsyncDriver(AsyncDriver):
+    name = 'postgresql'
+
+    def __init__(self):
+        import asyncpg
+        self.module = asyncpg
+        self.IntegrityError = asyncpg.IntegrityConstraintViolationError
+
+    async def connect(self, cfg):
+        host, port = _host_port(cfg, None)
+        conn = await self.module.connect(
+            host=host,
+            database=cfg.DB_NAME,
+            user=cfg.DB_USER,
+            password=cfg.DB_PASSWORD,
+            port=int(port),
+            timeout=10
+        )
+        return _PostgresConnection(conn)
+
+
+class SQLiteAsyncDriver(AsyncDriver):
+    name = 'sqlite'
+
+    def __init__(self):
+        import sqlite3
+        import aiosqlite
+        from database import sqlite_backend
+        self.module = aiosqlite
+        self.IntegrityError = sqlite3.IntegrityError
+        self._sqlite3 = sqlite3
+        self._backend = sqlite_backend
+
+    async def connect(self, cfg):
+        conn = await self.module.connect(
+            cfg.DB_PATH,
+            detect_types=self._sqlite3.PARSE_DECLTYPES,
+            cached_statements=256
+        )
+        for pragma in self._backend.PRAGMAS:
+            await conn.execute(pragma)
+        return _SQLiteConnection(conn, self._backend._translate)
+
+
+def get_async_driver(engine):
+    """Driver asíncrono de DB_ENGINE; ImportError si no está instalado"""
+    if engine == 'mysql':
+        return MySQLAsyncDriver()
+    if engine == 'sqlite':
+        return SQLiteAsyncDriver()
+    return PostgresAsyncDriver()
+
+
+class AsyncPool:
+    """Pool acotado de conexiones asíncronas, con el comportamiento de
+    ConnectionPool (reciclado, validación, cierre de ociosas).
+
+    Solo debe usarse desde el bucle de eventos en el que se creó.
+    """
+
+    def __init__(self, creator, validator=None, min_size=0, max_size=10,
+                 timeout=30, recycle=3600, idle_timeout=300):
+        self._creator = creator
+        self._validator = validator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+
+        self._cond = asyncio.Condition()
+        self._idle = deque()      # (conn, creada_en, ultimo_uso)
+        self._born = {}           # id(conn) -> creada_en de las prestadas
+        self._size = 0
+
+        self.created = 0
+        self.recycled = 0
+        self.waiting = 0
+        self.timeouts = 0
+
+    async def acquire(self, timeout=None):
+        """Presta una conexión validada; abre una nueva si hay cupo"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        async with self._cond:
+            while True:
+                stale = self._prune_idle()
+                if self._idle:
+                    conn, born, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"Sin conexiones libres tras {timeout}s (máximo {self.max_size})"
+                    )
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    self.waiting -= 1
+
+        for old in stale:
+            await self._close(old)
+        if conn is not None:
+            if self._expired(born) or not await self._is_valid(conn):
+                await self._close(conn)
+                self.recycled += 1
+                conn = None
+        if conn is None:
+            conn, born = await self._open()
+            if conn is None:
+                return None
+
+        self._born[id(conn)] = born
+        return conn
+
+    async def release(self, conn, discard=False):
+        """Devuelve una conexión al pool (o la cierra si está rota)"""
+        if conn is None:
+            return
+        born = self._born.pop(id(conn), None)
+        if born is None:
+            await self._close(conn)
+            return
+
+        if not discard:
+            try:
+                await conn.rollback()
+            except Exception:
+                discard = True
+
+        async with self._cond:
+            if discard or self._expired(born):
+                if not discard:
+                    self.recycled += 1
+                self._size -= 1
+            else:
+                self._idle.append((conn, born, time.monotonic()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            await self._close(conn)
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """Presta una conexión y la devuelve al salir"""
+        conn = await self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            await self.release(conn, discard=True)
+            raise
+        else:
+            await self.release(conn)
+
+    async def close_all(self):
+        """Cierra las conexiones libres"""
+        async with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            await self._close(conn)
+
+    def stats(self):
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._size - len(self._idle),
+            "waiting": self.waiting,
+            "created": self.created,
+            "recycled": self.recycled,
+            "timeouts": self.timeouts,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+        }
+
+    async def _open(self):
+        try:
+            conn = await self._creator()
+        except Exception:
+            conn = None
+        if conn is None:
+            async with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return None, None
+        self.created += 1
+        return conn, time.monotonic()
+
+    def _prune_idle(self):
+        """Saca las conexiones ociosas por encima de min_size (llamar con lock)"""
+        now = time.monotonic()
+        stale = []
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][2] > self.idle_timeout):
+            stale.append(self._idle.popleft()[0])
+            self._size -= 1
+            self.recycled += 1
+        return stale
+
+    def _expired(self, born):
+        return self.recycle is not None and time.monotonic() - born > self.recycle
+
+    async def _is_valid(self, conn):
+        if self._validator is None:
+            return True
+        try:
+            return await self._validator(conn) is not False
+        except Exception:
+            return False
+
+    @staticmethod
+    async def _close(conn):
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+class DatabaseLoop:
+    """Bucle de eventos en un hilo propio para la capa de datos asíncrona.
+
+    Se arranca en el primer uso en cada proceso: con la app precargada en
+    gunicorn el hilo no sobrevive al fork y cada worker arranca el suyo.
+    """
+
+    def __init__(self, name='db-async'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+
+    def loop(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=self._run, args=(loop,), name=self.name, daemon=True).start()
+                    self._loop = loop
+                    self._pid = os.getpid()
+        return self._loop
+
+    @staticmethod
+    def _run(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Programa la corrutina en este bucle con el contexto (contextvars)
+        de quien llama; devuelve un concurrent.futures.Future"""
+        loop = self.loop()
+        context = contextvars.copy_context()
+        future = concurrent.futures.Future()
+
+        def done(task):
+            if future.cancelled():
+                return
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        def start():
+            if future.cancelled():
+                coro.close()
+                return
+            # La tarea copia el contexto actual: el de quien llamó
+            task = context.run(loop.create_task, coro)
+            task.add_done_callback(done)
+            future.add_done_callback(lambda f: f.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+        loop.call_soon_threadsafe(start)
+        return future
+
+    async def run(self, coro):
+        """Espera la corrutina desde cualquier bucle; ya dentro de este bucle
+        se espera directamente (varias a la vez con asyncio.gather)"""
+        loop = self.loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self):
+        """Detiene el bucle de este proceso (si se arrancó)"""
+        if self._pid != os.getpid():
+            return
+        loop = self._loop
+        self._pid = None
+        loop.call_soon_threadsafe(loop.stop)
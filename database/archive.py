@@ -0,0 +1,415 @@
+# database/archive.py
+"""Archivo frío de leads: ficheros comprimidos por mes, solo de añadido.
+
+Cada mes (según fecha_registro) tiene tres ficheros en ARCHIVE_DIR:
+
+- leads-AAAA-MM.seg: bloques de leads que solo se añaden al final. Cada
+  bloque es una cabecera (b'LTA1', bytes, filas) y el documento columnar de
+  serializers.columnar (los nombres de columna una vez y un array por
+  columna) comprimido con zlib.
+- leads-AAAA-MM.ids: pares (id, posición del bloque) ordenados por id.
+- leads-AAAA-MM.emails: pares (hash del correo, id) ordenados por hash.
+
+Segmentos e índices se leen con mmap: una búsqueda por id o correo es una
+búsqueda binaria sobre el índice y la descompresión de un solo bloque, sin
+cargar ficheros enteros. manifest.json lista los bloques confirmados de
+cada mes, con la primera y la última clave (fecha_registro, id) de cada uno,
+y se reescribe (de forma atómica) después de los datos y los índices; un
+bloque escrito a medias por un fallo queda fuera del manifiesto y se ignora.
+
+Los listados por (fecha_registro, id) usan esas claves para descomprimir
+solo los bloques que alcanza la página (ver LeadArchive._scan), nunca el
+mes entero.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import defaultdict, deque
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain, islice
+from operator import attrgetter, itemgetter
+
+from database.emailfilter import email_key
+from database.records import LEAD_COLUMNS, Lead, record_type
+from serializers import columnar, dumps_json
+
+_BLOCK_MAGIC = b'LTA1'
+_BLOCK_HEADER = struct.Struct('<4sII')
+_ENTRY = struct.Struct('<QQ')
+
+_lead_key = attrgetter('fecha_registro', 'id')
+
+
+def email_hash(correo):
+    """Clave de 64 bits del índice de correos (sobre email_key)"""
+    return int.from_bytes(hashlib.blake2b(email_key(correo), digest_size=8).digest(), 'little')
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _pack_entries(entries):
+    """Pares (clave, valor) como enteros de 64 bits little-endian"""
+    packed = array('Q', chain.from_iterable(entries))
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+class _SortedIndex:
+    """Índice (clave, valor) ordenado sobre un mmap; admite bisect por clave"""
+
+    __slots__ = ('_buffer', '_size')
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._size = len(buffer) // _ENTRY.size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return _ENTRY.unpack_from(self._buffer, index * _ENTRY.size)[0]
+
+    def lookup(self, key):
+        """Valores de todas las entradas con esa clave"""
+        values = []
+        for index in range(bisect.bisect_left(self, key), self._size):
+            found, value = _ENTRY.unpack_from(self._buffer, index * _ENTRY.size)
+            if found != key:
+                break
+            values.append(value)
+        return values
+
+    def entries(self):
+        return _ENTRY.iter_unpack(self._buffer) if self._size else iter(())
+
+    def last_key(self):
+        return self[self._size - 1] if self._size else None
+
+
+class _Keys:
+    """Claves (fecha_registro, id) de un bloque ordenado, para bisect"""
+
+    __slots__ = ('_leads',)
+
+    def __init__(self, leads):
+        self._leads = leads
+
+    def __len__(self):
+        return len(self._leads)
+
+    def __getitem__(self, index):
+        return _lead_key(self._leads[index])
+
+
+class _Descending:
+    """Invierte el orden de una clave en el heap de LeadArchive._scan"""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+
+def _range_entry(leads):
+    """Primera y última clave de un bloque, como se guardan en el manifiesto"""
+    first, last = min(leads, key=_lead_key), max(leads, key=_lead_key)
+    return [[first.fecha_registro.isoformat(), first.id], [last.fecha_registro.isoformat(), last.id]]
+
+
+def _parse_key(entry):
+    return datetime.fromisoformat(entry[0]), entry[1]
+
+
+class LeadArchive:
+    """Particiones mensuales de leads archivados en `directory`.
+
+    Solo un proceso debe escribir a la vez (models.archive_leads toma un
+    bloqueo de la base de datos); los lectores de cualquier proceso ven los
+    bloques nuevos cuando cambia el manifiesto.
+    """
+
+    def __init__(self, directory, compress_level=9, block_cache=64):
+        self.directory = directory
+        self.compress_level = compress_level
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stamp = None
+        self._months = {}
+        self._offsets = {}
+        self._ranges = {}
+        self._maps = {}
+        # Los bloques no cambian una vez escritos: (mes, posición) identifica
+        # siempre el mismo contenido
+        self._block = lru_cache(maxsize=block_cache)(self._decode_block)
+        self._block_range = lru_cache(maxsize=None)(self._scan_block_range)
+
+    # Manifiesto y ficheros mapeados
+    def _path(self, month, kind):
+        return os.path.join(self.directory, f'leads-{month}.{kind}')
+
+    def _load(self):
+        """Meses del manifiesto; se relee si otro proceso lo reescribió"""
+        try:
+            stat = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return {}
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stamp != self._stamp:
+                with open(self._manifest_path, encoding='utf-8') as f:
+                    self._set_months(json.load(f)["months"])
+                self._stamp = stamp
+            return self._months
+
+    def _set_months(self, months):
+        self._months = months
+        self._offsets = {month: {block[0] for block in info["blocks"]} for month, info in months.items()}
+        # (posición, primera clave, última clave) de cada bloque; los
+        # manifiestos anteriores no guardan las claves (None)
+        self._ranges = {
+            month: [(block[0],) + ((_parse_key(block[2]), _parse_key(block[3])) if len(block) > 2 else (None, None))
+                    for block in info["blocks"]]
+            for month, info in months.items()
+        }
+        # Los índices se reemplazan y los segmentos crecen: se vuelven a mapear
+        self._maps = {}
+
+    def _map(self, path):
+        buffer = self._maps.get(path)
+        if buffer is None:
+            try:
+                with open(path, 'rb') as f:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                # ValueError: no se puede mapear un fichero vacío
+                buffer = b''
+            self._maps[path] = buffer
+        return buffer
+
+    def _index(self, month, kind):
+        return _SortedIndex(self._map(self._path(month, kind)))
+
+    # Lectura
+    def _decode_block(self, month, offset):
+        data = self._map(self._path(month, 'seg'))
+        magic, length, _ = _BLOCK_HEADER.unpack_from(data, offset)
+        if magic != _BLOCK_MAGIC:
+            raise ValueError(f"Bloque dañado en leads-{month}.seg ({offset})")
+        start = offset + _BLOCK_HEADER.size
+        document = json.loads(zlib.decompress(data[start:start + length]))
+        columns = document["columns"]
+        values = document["values"]
+        index = columns.index('fecha_registro')
+        values[index] = list(map(datetime.fromisoformat, values[index]))
+        make = Lead if tuple(columns) == LEAD_COLUMNS else record_type(columns)
+        # En la caché, ordenados por (fecha_registro, id) como los listados
+        return tuple(sorted(map(make, *values), key=_lead_key))
+
+    def _scan_block_range(self, month, offset):
+        leads = self._block(month, offset)
+        return _lead_key(leads[0]), _lead_key(leads[-1])
+
+    def _block_ranges(self, month):
+        with self._lock:
+            ranges = self._ranges.get(month, ())
+        return [(offset, first, last) if first is not None else (offset,) + self._block_range(month, offset)
+                for offset, first, last in ranges]
+
+    def _scan(self, month, low=None, high=None, reverse=False):
+        """Leads del mes con low <= (fecha_registro, id) < high, en orden
+        ascendente (o descendente con `reverse`).
+
+        Cada bloque está ordenado; se mezclan en un heap y un bloque solo se
+        descomprime cuando su primera clave (la última si `reverse`) puede ser
+        la siguiente. archive_leads escribe bloques casi sin solapes, así que
+        una página descomprime uno o dos bloques.
+        """
+        edge = 2 if reverse else 1
+        blocks = sorted(
+            (block for block in self._block_ranges(month)
+             if (low is None or block[2] >= low) and (high is None or block[1] < high)),
+            key=itemgetter(edge), reverse=reverse
+        )
+        order = _Descending if reverse else tuple
+        pending = deque(blocks)
+        heap = []
+
+        def push(leads, position, stop):
+            # Entradas (clave, desempate, posición, fin, bloque); el heap
+            # guarda la siguiente fila de cada bloque abierto
+            if position != stop:
+                heapq.heappush(heap, (order(_lead_key(leads[position])), id(leads), position, stop, leads))
+
+        while pending or heap:
+            while pending and (not heap or order(pending[0][edge]) < heap[0][0]):
+                leads = self._block(month, pending.popleft()[0])
+                keys = _Keys(leads)
+                start = bisect.bisect_left(keys, low) if low is not None else 0
+                end = bisect.bisect_left(keys, high) if high is not None else len(leads)
+                if reverse:
+                    push(leads, end - 1, start - 1)
+                else:
+                    push(leads, start, end)
+            if not heap:
+                return
+            _, _, position, stop, leads = heapq.heappop(heap)
+            yield leads[position]
+            push(leads, position + (-1 if reverse else 1), stop)
+
+    def _find(self, month, lead_id):
+        committed = self._offsets[month]
+        for offset in self._index(month, 'ids').lookup(lead_id):
+            if offset in committed:
+                for lead in self._block(month, offset):
+                    if lead.id == lead_id:
+                        return lead
+        return None
+
+    def get(self, lead_id):
+        """Lead archivado con ese id, o None"""
+        for month, info in self._load().items():
+            if info["min_id"] <= lead_id <= info["max_id"]:
+                lead = self._find(month, lead_id)
+                if lead is not None:
+                    return lead
+        return None
+
+    def contains(self, lead_id):
+        """Si el id ya está archivado (sin descomprimir ningún bloque)"""
+        for month, info in self._load().items():
+            if info["min_id"] <= lead_id <= info["max_id"]:
+                if any(offset in self._offsets[month] for offset in self._index(month, 'ids').lookup(lead_id)):
+                    return True
+        return False
+
+    def find_email(self, correo):
+        """Leads archivados con ese correo, del más reciente al más antiguo"""
+        key = email_hash(correo)
+        expected = email_key(correo)
+        found = []
+        for month in self._load():
+            for lead_id in self._index(month, 'emails').lookup(key):
+                lead = self._find(month, lead_id)
+                # Colisión del hash de 64 bits: se comprueba el correo
+                if lead is not None and email_key(lead.correo_electronico) == expected:
+                    found.append(lead)
+        found.sort(key=_lead_key, reverse=True)
+        return found
+
+    def iter_leads(self, since=None):
+        """Leads archivados por (fecha_registro, id) ascendente, mes a mes"""
+        months = self._load()
+        first = since.strftime('%Y-%m') if since else None
+        for month in sorted(months):
+            if first and month < first:
+                continue
+            yield from self._scan(month, low=(since, 0) if first == month else None)
+
+    def page(self, before=None, limit=50):
+        """Hasta `limit` leads archivados anteriores a (fecha, id), del más
+        reciente al más antiguo"""
+        months = self._load()
+        last = before[0].strftime('%Y-%m') if before else None
+        page = []
+        for month in sorted(months, reverse=True):
+            if last and month > last:
+                continue
+            high = before if last == month else None
+            page.extend(islice(self._scan(month, high=high, reverse=True), limit - len(page)))
+            if len(page) >= limit:
+                break
+        return page
+
+    def stats(self):
+        months = self._load()
+        rows = sum(info["rows"] for info in months.values())
+        stored = sum(info["bytes"] for info in months.values())
+        raw = sum(info["raw_bytes"] for info in months.values())
+        return {
+            "directory": self.directory,
+            "months": len(months),
+            "rows": rows,
+            "blocks": sum(len(info["blocks"]) for info in months.values()),
+            "bytes": stored,
+            "raw_bytes": raw,
+            "compression_ratio": round(raw / stored, 2) if stored else None,
+            "partitions": [
+                {"month": month, "rows": info["rows"], "bytes": info["bytes"],
+                 "min_id": info["min_id"], "max_id": info["max_id"]}
+                for month, info in sorted(months.items())
+            ],
+        }
+
+    # Escritura
+    def _merge_index(self, month, kind, entries):
+        """Reescribe el índice del mes con las entradas nuevas en orden"""
+        entries.sort()
+        current = self._index(month, kind)
+        last = current.last_key()
+        if last is None or entries[0][0] > last:
+            data = bytes(current._buffer) + _pack_entries(entries)
+        else:
+            data = _pack_entries(heapq.merge(current.entries(), entries))
+        _write_atomic(self._path(month, kind), data)
+
+    def append(self, leads):
+        """Añade leads (registros Lead completos) a sus meses; un bloque por
+        mes y llamada. Devuelve cuántos se escribieron."""
+        if not leads:
+            return 0
+        by_month = defaultdict(list)
+        for lead in leads:
+            by_month[lead.fecha_registro.strftime('%Y-%m')].append(lead)
+        with self._write_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            months = {month: dict(info, blocks=list(info["blocks"])) for month, info in self._load().items()}
+            for month, rows in sorted(by_month.items()):
+                rows.sort(key=attrgetter('id'))
+                raw = dumps_json(columnar(rows, LEAD_COLUMNS, 'iso'))
+                payload = zlib.compress(raw, self.compress_level)
+                with open(self._path(month, 'seg'), 'ab') as f:
+                    offset = f.tell()
+                    f.write(_BLOCK_HEADER.pack(_BLOCK_MAGIC, len(payload), len(rows)))
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._merge_index(month, 'ids', [(lead.id, offset) for lead in rows])
+                self._merge_index(month, 'emails', [(email_hash(lead.correo_electronico), lead.id) for lead in rows])
+                info = months.setdefault(month, {
+                    "rows": 0, "bytes": 0, "raw_bytes": 0,
+                    "min_id": rows[0].id, "max_id": rows[-1].id, "blocks": [],
+                })
+                info["rows"] += len(rows)
+                info["bytes"] += _BLOCK_HEADER.size + len(payload)
+                info["raw_bytes"] += len(raw)
+                info["min_id"] = min(info["min_id"], rows[0].id)
+                info["max_id"] = max(info["max_id"], rows[-1].id)
+                info["blocks"].append([offset, len(rows)] + _range_entry(rows))
+            # El manifiesto confirma los bloques: se escribe el último
+            _write_atomic(self._manifest_path, json.dumps({"version": 1, "months": months}).encode('utf-8'))
+            stat = os.stat(self._manifest_path)
+            with self._lock:
+                self._set_months(months)
+                self._stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return len(leads)
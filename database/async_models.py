@@ -0,0 +1,335 @@
+# database/async_models.py
+"""Variante asíncrona del CRUD de leads de database/models.py.
+
+Mismo SQL y mismos efectos tras el commit (contadores y agregados, versión
+de los datos, caché, filtro de correos, índice de búsqueda y feed de
+cambios), pero sobre el driver asíncrono del motor y su propio pool
+(database/aio.py). Mientras una consulta espera a la base de datos el bucle
+atiende otras, y las consultas independientes de una petición pueden ir a
+la vez (get_dashboard). Las funciones síncronas de models.py no cambian.
+
+Todas las corrutinas se ejecutan en el bucle de la capa de datos
+(db_loop) y pueden esperarse desde cualquier otro bucle. Las lecturas van
+al primario: las réplicas de lectura solo tienen pool síncrono.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from functools import partial, wraps
+
+from config import config
+from database import models
+from database.aio import AsyncPool, DatabaseLoop, get_async_driver
+from database.cache import MISSING
+from database.models import (
+    BUMP_COUNTER, BUMP_COUNTER_NOW, BUMP_EDIT_VERSION, BUMP_ROLLUP, BUMP_ROLLUP_NOW, BUMP_VERSION, DELETE_LEAD,
+    EMAIL_EXISTS, INSERT_LEAD, LEAD_STATS_SQL, LOCK_LEAD, SELECT_LEAD, SELECT_VERSION, UPDATE_LEAD,
+    DB_ENGINE, dialect, lead_cache, lead_events,
+)
+from database.pool import PoolTimeout
+from database.records import LEAD_COLUMNS, Lead
+from metrics import timed, DB_ACQUIRE_SECONDS
+
+logger = logging.getLogger('leadtracker.db')
+
+db_loop = DatabaseLoop()
+
+# Driver y pool del proceso; se crean en el bucle de la capa de datos en su
+# primer uso (también en cada worker tras el fork)
+_state = {"pid": None, "driver": None, "pool": None}
+
+
+def _on_db_loop(func):
+    """La corrutina se ejecuta en db_loop aunque se espere desde otro bucle"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db_loop.run(func(*args, **kwargs))
+    return wrapper
+
+
+async def _connect(driver):
+    """Conexión nueva al primario; respeta su circuit breaker"""
+    breaker = models.breaker
+    if not breaker.allow():
+        logger.debug("Base de datos marcada como caída; no se intenta conectar")
+        return None
+    try:
+        conn = await driver.connect(config['default'])
+    except Exception as e:
+        breaker.record_failure()
+        logger.warning("No se pudo abrir la conexión asíncrona: %s", e)
+        return None
+    breaker.record_success()
+    return conn
+
+
+def _get_pool():
+    if _state["pid"] != os.getpid():
+        settings = config['default']
+        driver = get_async_driver(DB_ENGINE)
+        _state["driver"] = driver
+        _state["pool"] = AsyncPool(
+            creator=partial(_connect, driver),
+            validator=driver.validate,
+            max_size=settings.DB_ASYNC_POOL_MAX_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            recycle=settings.DB_POOL_RECYCLE,
+            idle_timeout=settings.DB_POOL_IDLE_TIMEOUT
+        )
+        _state["pid"] = os.getpid()
+    return _state["pool"]
+
+
+@asynccontextmanager
+async def db_connection(timeout=None):
+    """Presta una conexión del pool asíncrono (None si no hay)"""
+    start = time.perf_counter()
+    pool = conn = None
+    try:
+        pool = _get_pool()
+        conn = await pool.acquire(timeout)
+    except PoolTimeout as e:
+        logger.error("%s", e)
+    except ImportError as e:
+        logger.error("Driver asíncrono no instalado para %s: %s", DB_ENGINE, e)
+    DB_ACQUIRE_SECONDS.observe(time.perf_counter() - start)
+    try:
+        yield conn
+    except BaseException:
+        if pool is not None:
+            await pool.release(conn, discard=True)
+        raise
+    else:
+        if pool is not None:
+            await pool.release(conn)
+
+
+def get_pool_stats():
+    """Estadísticas del pool asíncrono (None si aún no se usó)"""
+    pool = _state["pool"] if _state["pid"] == os.getpid() else None
+    return pool.stats() if pool is not None else None
+
+
+def close_pool(timeout=5):
+    """Cierra las conexiones libres y detiene el bucle (al salir un worker)"""
+    if _state["pid"] != os.getpid():
+        return
+    try:
+        db_loop.submit(_state["pool"].close_all()).result(timeout)
+    except Exception as e:
+        logger.warning("Error cerrando el pool asíncrono: %s", e)
+    _state["pid"] = None
+    db_loop.stop()
+
+
+async def _bump_counters(conn, service, delta, fecha=None, phones=0):
+    """models._bump_counters en la transacción de `conn`"""
+    if fecha is None:
+        await conn.execute(BUMP_COUNTER_NOW.sql, (service, delta))
+        await conn.execute(BUMP_ROLLUP_NOW.sql, (service, delta, phones))
+    else:
+        await conn.execute(BUMP_COUNTER.sql, (service, date(fecha.year, fecha.month, 1), delta))
+        day = fecha.date() if isinstance(fecha, datetime) else fecha
+        await conn.execute(BUMP_ROLLUP.sql, (day, service, delta, phones))
+
+
+async def _bump_version(conn, edit=False):
+    await conn.execute((BUMP_EDIT_VERSION if edit else BUMP_VERSION).sql, (int(time.time()),))
+
+
+# Lecturas
+@_on_db_loop
+@timed('async_get_leads_version')
+async def get_leads_version():
+    """(versión, segundos epoch del último cambio) o None sin base de datos"""
+    async with db_connection() as conn:
+        if conn:
+            try:
+                row = await conn.fetchone(SELECT_VERSION.sql, ('leads',))
+                return (int(row[0]), int(row[1])) if row else None
+            except Exception as e:
+                logger.error("Error leyendo la versión de los leads: %s", e)
+    return None
+
+
+@_on_db_loop
+@timed('async_get_lead_stats')
+async def get_lead_stats():
+    """Estadísticas del panel desde lead_counters (ver models.get_lead_stats)"""
+    stats = models._cached('leads:stats')
+    if stats is not MISSING:
+        return stats
+    async with db_connection() as conn:
+        if not conn:
+            return None
+        try:
+            rows = await conn.fetchall(LEAD_STATS_SQL)
+        except Exception as e:
+            logger.error("Error obteniendo estadísticas: %s", e)
+            return None
+    return models._stats_result(rows)
+
+
+@_on_db_loop
+@timed('async_get_lead_by_id')
+async def get_lead_by_id(lead_id):
+    """Obtener lead por ID"""
+    key = f'lead:{lead_id}'
+    lead = models._cached(key)
+    if lead is not MISSING:
+        return lead
+    # Como en models.get_lead_by_id: no se cachea si hubo una invalidación
+    generation = lead_cache.generation()
+    async with db_connection() as conn:
+        if conn:
+            try:
+                row = await conn.fetchone(SELECT_LEAD.sql, (lead_id,))
+                lead = Lead(*row) if row else None
+                if lead:
+                    lead_cache.set(key, lead, tags=[key], generation=generation)
+                return lead
+            except Exception as e:
+                logger.error("Error obteniendo lead: %s", e)
+    return None
+
+
+@_on_db_loop
+@timed('async_get_leads_page')
+async def get_leads_page(limit=50, cursor=None, fields=None, archived=False):
+    """Página de leads por cursor (ver models.get_leads_page).
+
+    InvalidCursor (ValueError) si el cursor no es válido.
+    """
+    columns = list(fields or LEAD_COLUMNS)
+    query, params, query_columns, before = models._page_query(limit, cursor, columns)
+    key = models._page_key(limit, cursor, columns, archived)
+    cached = models._cached(key)
+    if cached is not MISSING:
+        return cached
+
+    async with db_connection() as conn:
+        if not conn:
+            return [], None
+        try:
+            rows = await conn.fetchall(query, params)
+        except Exception as e:
+            logger.error("Error obteniendo página de leads: %s", e)
+            return [], None
+
+    if archived:
+        # Lectura de ficheros (mmap y zlib): fuera del bucle
+        rows = await asyncio.to_thread(models._merge_archived_page, rows, query_columns, before, limit + 1)
+    return models._page_result(key, rows, query_columns, columns, limit, cursor)
+
+
+@_on_db_loop
+async def get_dashboard(limit=50, cursor=None, fields=None):
+    """Estadísticas y una página de leads con las dos consultas a la vez,
+    cada una con su conexión del pool. Devuelve (stats, (leads, next_cursor))."""
+    return tuple(await asyncio.gather(get_lead_stats(), get_leads_page(limit, cursor, fields)))
+
+
+# Escrituras
+@_on_db_loop
+@timed('async_create_lead')
+async def create_lead(nombre, correo, telefono, interes):
+    """INSERT - Crear nuevo lead"""
+    email_filter = models._email_filter_ready()
+    async with db_connection() as conn:
+        if conn:
+            try:
+                if email_filter is not None and models._email_maybe_taken(email_filter, correo):
+                    if await conn.fetchone(EMAIL_EXISTS.sql, (correo,)) is not None:
+                        models._email_counts["duplicates"] += 1
+                        logger.info("El correo %s ya existe", correo)
+                        return False
+                    models._email_counts["false_positives"] += 1
+                params = (nombre, correo, telefono, interes)
+                if dialect.returning:
+                    lead_id = (await conn.fetchone(INSERT_LEAD.sql, params))[0]
+                else:
+                    _, lead_id = await conn.execute(INSERT_LEAD.sql, params)
+                await _bump_counters(conn, interes, 1, phones=models._has_phone(telefono))
+                await _bump_version(conn)
+                await conn.commit()
+                models._remember_email(correo)
+                models._invalidate_leads()
+                models._index_lead(lead_id, nombre, correo, telefono, interes)
+                models._publish_lead('created', lead_id, nombre, correo, telefono, interes)
+                logger.debug("Lead creado: %s - %s", nombre, correo)
+                return True
+            except _state["driver"].IntegrityError:
+                models._remember_email(correo)
+                logger.info("El correo %s ya existe", correo)
+                return False
+            except Exception as e:
+                logger.error("Error creando lead: %s", e)
+                return False
+    return False
+
+
+@_on_db_loop
+@timed('async_update_lead')
+async def update_lead(lead_id, nombre, correo, telefono, interes):
+    """UPDATE - Actualizar lead existente; False si no existe o falla"""
+    async with db_connection() as conn:
+        if conn:
+            try:
+                old = await conn.fetchone(LOCK_LEAD.sql, (lead_id,))
+                if old is None:
+                    return False
+                await conn.execute(UPDATE_LEAD.sql, (nombre, correo, telefono, interes, lead_id))
+                old_interes, fecha, old_telefono, old_correo = old
+                if old_interes != interes or models._has_phone(old_telefono) != models._has_phone(telefono):
+                    # Mismo orden de bloqueo que models.update_lead
+                    for service, delta, phones in sorted([(old_interes, -1, -models._has_phone(old_telefono)),
+                                                          (interes, 1, models._has_phone(telefono))]):
+                        await _bump_counters(conn, service, delta, fecha, phones)
+                await _bump_version(conn, edit=True)
+                await conn.commit()
+                models._invalidate_leads(lead_id)
+                models._search_edited()
+                if old_correo != correo:
+                    models._forget_email(old_correo)
+                    models._remember_email(correo)
+                models._index_lead(lead_id, nombre, correo, telefono, interes)
+                models._publish_lead('updated', lead_id, nombre, correo, telefono, interes)
+                logger.debug("Lead actualizado: ID %s", lead_id)
+                return True
+            except _state["driver"].IntegrityError:
+                logger.info("El correo %s ya existe", correo)
+                return False
+            except Exception as e:
+                logger.error("Error actualizando lead: %s", e)
+                return False
+    return False
+
+
+@_on_db_loop
+@timed('async_delete_lead')
+async def delete_lead(lead_id):
+    """DELETE - Eliminar lead; False si no existe o falla"""
+    async with db_connection() as conn:
+        if conn:
+            try:
+                old = await conn.fetchone(LOCK_LEAD.sql, (lead_id,))
+                if old is None:
+                    return False
+                await conn.execute(DELETE_LEAD.sql, (lead_id,))
+                await _bump_counters(conn, old[0], -1, old[1], -models._has_phone(old[2]))
+                await _bump_version(conn, edit=True)
+                await conn.commit()
+                models._invalidate_leads(lead_id)
+                models._search_edited()
+                models._unindex_lead(lead_id)
+                models._forget_email(old[3])
+                lead_events.publish('deleted', {'id': lead_id})
+                logger.debug("Lead eliminado: ID %s", lead_id)
+                return True
+            except Exception as e:
+                logger.error("Error eliminando lead: %s", e)
+                return False
+    return False
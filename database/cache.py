@@ -0,0 +1,239 @@
+# database/cache.py
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Distingue "no está en caché" de un valor cacheado
+MISSING = object()
+
+
+class LRUCache:
+    """Caché en memoria del proceso con expulsión LRU, TTL y etiquetas.
+
+    Las etiquetas permiten invalidar con precisión: cada entrada se guarda con
+    las etiquetas de los leads que contiene y invalidate_tags() borra solo las
+    entradas afectadas.
+
+    Cada invalidación avanza la generación. Quien lee de la base de datos
+    toma generation() antes de la consulta y la pasa a set(): si entre medias
+    se invalidó algo, el valor leído puede ser anterior a esa escritura y no
+    se guarda.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()   # key -> (valor, expira_en, etiquetas)
+        self._tags = {}              # etiqueta -> {keys}
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_skips = 0
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tags=(), generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self.stale_skips += 1
+                return
+            if key in self._data:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._data[key] = (value, time.monotonic() + self.ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate_tags(self, tags):
+        """Elimina todas las entradas marcadas con alguna de las etiquetas"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_skips": self.stale_skips,
+            }
+
+    def _remove(self, key):
+        """Quita una entrada y sus referencias de etiquetas (llamar con lock)"""
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """Caché compartida entre procesos sobre Redis con la misma interfaz.
+
+    Las etiquetas se guardan como sets de Redis para que una invalidación en
+    un worker afecte a todos; la generación (ver LRUCache) es un contador
+    compartido y set() la comprueba con WATCH.
+    """
+
+    def __init__(self, client, ttl=60, prefix='leadtracker:'):
+        self._client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_skips = 0
+
+    def generation(self):
+        return int(self._client.get(self.prefix + 'generation') or 0)
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, tags=(), generation=None):
+        from redis.exceptions import WatchError
+        with self._client.pipeline() as pipe:
+            try:
+                if generation is not None:
+                    pipe.watch(self.prefix + 'generation')
+                    if int(pipe.get(self.prefix + 'generation') or 0) != generation:
+                        raise WatchError
+                    pipe.multi()
+                pipe.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+                for tag in tags:
+                    pipe.sadd(self.prefix + 'tag:' + tag, key)
+                    pipe.expire(self.prefix + 'tag:' + tag, self.ttl)
+                pipe.execute()
+            except WatchError:
+                with self._lock:
+                    self.stale_skips += 1
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def invalidate_tags(self, tags):
+        # Primero la generación: un set() en curso ya no guarda su valor
+        self._client.incr(self.prefix + 'generation')
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = self._client.smembers(tag_key)
+            if keys:
+                self._client.delete(*[self.prefix + k.decode() for k in keys])
+                with self._lock:
+                    self.invalidations += len(keys)
+            self._client.delete(tag_key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def stats(self):
+        info = self._client.info('stats')
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "redis",
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": info.get('evicted_keys', 0),
+                "expirations": info.get('expired_keys', 0),
+                "invalidations": self.invalidations,
+                "stale_skips": self.stale_skips,
+            }
+
+
+class NullCache:
+    """Caché desactivada: nunca guarda nada"""
+
+    def generation(self):
+        return 0
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, tags=(), generation=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def invalidate_tags(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "none"}
+
+
+def create_cache(cfg):
+    """Construye la caché según CACHE_BACKEND ('memory', 'redis' o 'none')"""
+    if cfg.CACHE_BACKEND == 'none':
+        return NullCache()
+    if cfg.CACHE_BACKEND == 'redis':
+        import redis
+        return RedisCache(redis.Redis.from_url(cfg.CACHE_REDIS_URL), ttl=cfg.CACHE_TTL)
+    return LRUCache(max_entries=cfg.CACHE_MAX_ENTRIES, ttl=cfg.CACHE_TTL)
@@ -0,0 +1,77 @@
+# database/circuit.py
+import threading
+import time
+
+
+class CircuitOpen(Exception):
+    """La base de datos se considera caída; se falla sin intentar conectar"""
+
+
+class CircuitBreaker:
+    """Circuit breaker para las conexiones a la base de datos.
+
+    Tras `failure_threshold` fallos seguidos pasa a 'open' y rechaza los
+    intentos durante `reset_timeout` segundos; después deja pasar un único
+    intento de prueba ('half_open') que lo cierra o lo vuelve a abrir.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """True si se puede intentar conectar ahora mismo"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                self.rejected += 1
+                return False
+            # Pasado el tiempo de espera, un solo intento de prueba
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "failures": self._failures,
+                "rejected": self.rejected,
+                "opened": self.opened,
+            }
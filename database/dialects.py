@@ -0,0 +1,314 @@
+# database/dialects.py
+"""Diferencias entre motores de base de datos en un solo sitio.
+
+database/models.py escribe el SQL común una vez y pide al dialecto lo que
+cambia entre MySQL, PostgreSQL y SQLite: cómo conectar, el cursor para
+exportar en streaming, el UPSERT de contadores, la búsqueda de texto y la
+reutilización de sentencias preparadas. Todos los dialectos devuelven las
+filas como tuplas (también MySQL) para convertirlas en registros compactos.
+"""
+import re
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+
+class Statement:
+    """Sentencia con nombre que se prepara una vez por conexión"""
+
+    __slots__ = ('name', 'sql')
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+
+
+class Dialect:
+    name = None
+    label = None
+    # INSERT ... RETURNING disponible (si no, se usa cursor.lastrowid)
+    returning = True
+    version_sql = "SELECT version()"
+    current_month_sql = None
+
+    def connect(self, cfg, endpoint=None):
+        """Abre una conexión al primario o a `endpoint` (réplica de DB_REPLICAS)"""
+        raise NotImplementedError
+
+    def validate(self, conn):
+        """Comprueba que una conexión reutilizada del pool sigue viva"""
+        if conn.closed:
+            return False
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        return True
+
+    def execute(self, cur, statement, params):
+        """Ejecuta una sentencia con nombre; por defecto sin preparar"""
+        cur.execute(statement.sql, params)
+
+    def month_of(self, column):
+        """Expresión SQL con el primer día del mes de `column`"""
+        raise NotImplementedError
+
+    def day_of(self, column):
+        """Expresión SQL con la fecha (sin hora) de `column`"""
+        return f"CAST({column} AS DATE)"
+
+    def add_upsert(self, table, keys, totals, values_sql):
+        """INSERT de (keys + totals) que suma los totales si la fila ya existe"""
+        columns = ', '.join(keys + totals)
+        updates = ', '.join(f"{c} = {table}.{c} + EXCLUDED.{c}" for c in totals)
+        return (
+            f"INSERT INTO {table} ({columns}) VALUES ({values_sql}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+        )
+
+    def counter_upsert(self, month_sql):
+        """Suma a lead_counters (servicio, mes, total) creando la fila si falta"""
+        return self.add_upsert('lead_counters', ('interes_servicio', 'mes'), ('total',), f"%s, {month_sql}, %s")
+
+    def stream_cursor(self, conn, batch_size):
+        """Cursor que recorre un resultado grande sin cargarlo entero"""
+        cur = conn.cursor()
+        cur.itersize = batch_size
+        return cur
+
+    def search_query(self, columns, query, limit):
+        """(sql, params) de la búsqueda por fragmentos con una columna score"""
+        raise NotImplementedError
+
+    def table_exists(self, cur, table, cfg):
+        raise NotImplementedError
+
+    def lock(self, cur, name):
+        """Bloqueo de aplicación entre procesos (migraciones)"""
+
+    def unlock(self, cur, name):
+        pass
+
+
+def _host_port(cfg, endpoint):
+    """'host' o 'host:puerto' de una réplica; sin endpoint, el primario"""
+    if not endpoint:
+        return cfg.DB_HOST, cfg.DB_PORT
+    host, _, port = endpoint.partition(':')
+    return host, port or cfg.DB_PORT
+
+
+def _escape_like(query):
+    return query.replace('%', r'\%').replace('_', r'\_')
+
+
+class MySQLDialect(Dialect):
+    name = 'mysql'
+    label = 'MySQL'
+    returning = False
+    current_month_sql = "DATE_SUB(CURRENT_DATE, INTERVAL DAYOFMONTH(CURRENT_DATE) - 1 DAY)"
+
+    def __init__(self):
+        import pymysql
+        self.module = pymysql
+
+    def connect(self, cfg, endpoint=None):
+        # Cursor por defecto (tuplas): cada fila se convierte en un registro
+        # compacto en lugar de un dict por fila
+        host, port = _host_port(cfg, endpoint)
+        return self.module.connect(
+            host=host,
+            database=cfg.DB_NAME,
+            user=cfg.DB_USER,
+            password=cfg.DB_PASSWORD,
+            port=int(port),
+            connect_timeout=10,
+            charset='utf8mb4'
+        )
+
+    def validate(self, conn):
+        conn.ping(reconnect=False)
+        return True
+
+    def month_of(self, column):
+        return f"DATE_SUB(DATE({column}), INTERVAL DAYOFMONTH({column}) - 1 DAY)"
+
+    def day_of(self, column):
+        return f"DATE({column})"
+
+    def add_upsert(self, table, keys, totals, values_sql):
+        columns = ', '.join(keys + totals)
+        updates = ', '.join(f"{c} = {c} + VALUES({c})" for c in totals)
+        return f"INSERT INTO {table} ({columns}) VALUES ({values_sql}) ON DUPLICATE KEY UPDATE {updates}"
+
+    def stream_cursor(self, conn, batch_size):
+        # Cursor sin buffer: las filas se leen del socket según se piden
+        return conn.cursor(self.module.cursors.SSCursor)
+
+    def search_query(self, columns, query, limit):
+        # Frase entre comillas: los n-gramas deben aparecer seguidos
+        phrase = '"' + query.replace('"', ' ') + '"'
+        prefix = _escape_like(query) + '%'
+        sql = f"""
+            SELECT {', '.join(columns)},
+                   MATCH(nombre_completo, correo_electronico) AGAINST (%s IN BOOLEAN MODE)
+                   + (nombre_completo LIKE %s) + (COALESCE(telefono, '') LIKE %s) AS score
+            FROM leads
+            WHERE MATCH(nombre_completo, correo_electronico) AGAINST (%s IN BOOLEAN MODE)
+               OR telefono LIKE %s
+            ORDER BY score DESC, id DESC
+            LIMIT %s
+        """
+        return sql, [phrase, prefix, prefix, phrase, prefix, limit]
+
+    def table_exists(self, cur, table, cfg):
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_schema = %s
+            AND table_name = %s
+        """, (cfg.DB_NAME, table))
+        return cur.fetchone()[0] > 0
+
+    def lock(self, cur, name):
+        cur.execute("SELECT GET_LOCK(%s, 60)", (name,))
+        if not cur.fetchone()[0]:
+            raise RuntimeError(f"No se pudo obtener el bloqueo {name}")
+
+    def unlock(self, cur, name):
+        cur.execute("SELECT RELEASE_LOCK(%s)", (name,))
+
+
+class PostgresDialect(Dialect):
+    name = 'postgresql'
+    label = 'PostgreSQL'
+    current_month_sql = "CAST(date_trunc('month', CURRENT_DATE) AS DATE)"
+
+    def __init__(self):
+        import psycopg2
+        import psycopg2.extensions
+        self.module = psycopg2
+
+        class PreparingConnection(psycopg2.extensions.connection):
+            """Conexión que recuerda las sentencias ya preparadas en su sesión"""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.prepared = set()
+
+        self._connection_factory = PreparingConnection
+
+    def connect(self, cfg, endpoint=None):
+        host, port = _host_port(cfg, endpoint)
+        return self.module.connect(
+            host=host,
+            database=cfg.DB_NAME,
+            user=cfg.DB_USER,
+            password=cfg.DB_PASSWORD,
+            port=port,
+            connect_timeout=10,
+            connection_factory=self._connection_factory
+        )
+
+    def execute(self, cur, statement, params):
+        # PREPARE una vez por conexión y después solo EXECUTE: el servidor no
+        # vuelve a analizar ni planificar la consulta en cada llamada.
+        # Las sentencias preparadas son de sesión, no se deshacen con ROLLBACK.
+        prepared = cur.connection.prepared
+        if statement.name not in prepared:
+            counter = iter(range(1, len(params) + 1))
+            sql = _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else f'${next(counter)}', statement.sql)
+            cur.execute(f"PREPARE {statement.name} AS {sql}")
+            prepared.add(statement.name)
+        cur.execute(f"EXECUTE {statement.name} ({', '.join(['%s'] * len(params))})", params)
+
+    def month_of(self, column):
+        return f"CAST(date_trunc('month', {column}) AS DATE)"
+
+    def stream_cursor(self, conn, batch_size):
+        # Cursor con nombre: el servidor envía el resultado por bloques
+        cur = conn.cursor(name='leads_export')
+        cur.itersize = batch_size
+        return cur
+
+    def search_query(self, columns, query, limit):
+        pattern = '%' + _escape_like(query) + '%'
+        sql = f"""
+            SELECT {', '.join(columns)},
+                   GREATEST(similarity(nombre_completo, %s), similarity(correo_electronico, %s),
+                            similarity(COALESCE(telefono, ''), %s)) AS score
+            FROM leads
+            WHERE nombre_completo ILIKE %s OR correo_electronico ILIKE %s OR telefono LIKE %s
+            ORDER BY score DESC, id DESC
+            LIMIT %s
+        """
+        return sql, [query, query, query, pattern, pattern, pattern, limit]
+
+    def table_exists(self, cur, table, cfg):
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = %s
+            );
+        """, (table,))
+        return cur.fetchone()[0]
+
+    def lock(self, cur, name):
+        cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (name,))
+
+    def unlock(self, cur, name):
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+
+
+class SQLiteDialect(Dialect):
+    name = 'sqlite'
+    label = 'SQLite'
+    version_sql = "SELECT sqlite_version()"
+    current_month_sql = "date('now', 'start of month')"
+
+    def __init__(self):
+        import sqlite3
+        from database import sqlite_backend
+        self.module = sqlite3
+        self._backend = sqlite_backend
+
+    def connect(self, cfg, endpoint=None):
+        # sqlite3 ya guarda las sentencias preparadas por conexión y texto SQL.
+        # Las réplicas son otros ficheros (copias mantenidas externamente)
+        return self._backend.connect(endpoint or cfg.DB_PATH)
+
+    def month_of(self, column):
+        return f"date({column}, 'start of month')"
+
+    def day_of(self, column):
+        return f"date({column})"
+
+    def search_query(self, columns, query, limit):
+        # Sin FTS ni trigramas: LIKE (insensible a mayúsculas en ASCII) y
+        # puntuación por prefijo; SEARCH_BACKEND=memory es más rápido aquí
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = '%' + escaped + '%'
+        prefix = escaped + '%'
+        sql = f"""
+            SELECT {', '.join(columns)},
+                   (nombre_completo LIKE %s ESCAPE '\\') * 2
+                   + (correo_electronico LIKE %s ESCAPE '\\')
+                   + (COALESCE(telefono, '') LIKE %s ESCAPE '\\') AS score
+            FROM leads
+            WHERE nombre_completo LIKE %s ESCAPE '\\' OR correo_electronico LIKE %s ESCAPE '\\'
+               OR telefono LIKE %s ESCAPE '\\'
+            ORDER BY score DESC, id DESC
+            LIMIT %s
+        """
+        return sql, [prefix, prefix, prefix, pattern, pattern, pattern, limit]
+
+    def table_exists(self, cur, table, cfg):
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return cur.fetchone()[0] > 0
+
+
+def get_dialect(engine):
+    """Dialecto de DB_ENGINE; solo importa el driver de ese motor"""
+    if engine == 'mysql':
+        return MySQLDialect()
+    if engine == 'sqlite':
+        return SQLiteDialect()
+    return PostgresDialect()
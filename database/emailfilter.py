@@ -0,0 +1,133 @@
+# database/emailfilter.py
+import hashlib
+import random
+import threading
+from array import array
+
+from database.search import normalize
+
+
+def email_key(correo):
+    """Clave del filtro: sin espacios, minúsculas y sin acentos.
+
+    Más laxa que el índice UNIQUE de cualquier motor (la intercalación de
+    MySQL ignora mayúsculas y acentos): dos correos que la base de datos
+    considera iguales tienen siempre la misma clave.
+    """
+    return normalize((correo or '').strip()).encode('utf-8')
+
+
+class CuckooFilter:
+    """Filtro de cuckoo: pertenencia aproximada con borrado.
+
+    Guarda una huella de 16 bits por elemento en cubos de 4 huecos; cada
+    elemento puede estar en dos cubos (el segundo se deriva de la huella,
+    así que se puede mover sin conocer la clave original). `might_contain`
+    nunca da falsos negativos mientras no esté saturado; los falsos
+    positivos rondan 2·4/2^16 ≈ 0,012 % con el filtro lleno.
+
+    Si una inserción no encuentra hueco tras MAX_KICKS desplazamientos se
+    pierde una huella y el filtro queda `saturated`: hay que reconstruirlo
+    con más capacidad.
+    """
+
+    BUCKET_SIZE = 4
+    FINGERPRINT_BITS = 16
+    MAX_KICKS = 500
+    MAX_LOAD = 0.95
+
+    def __init__(self, capacity):
+        buckets = 1
+        while buckets * self.BUCKET_SIZE * self.MAX_LOAD < max(capacity, 1):
+            buckets *= 2
+        self._mask = buckets - 1
+        self._table = array('H', bytes(2 * buckets * self.BUCKET_SIZE))   # 0 = hueco libre
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self.capacity = int(buckets * self.BUCKET_SIZE * self.MAX_LOAD)
+        self.count = 0
+        self.saturated = False
+
+    def _locate(self, key):
+        digest = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+        fingerprint = (digest >> 32) & 0xFFFF or 1
+        first = digest & self._mask
+        return fingerprint, first, self._alternate(first, fingerprint)
+
+    def _alternate(self, bucket, fingerprint):
+        # XOR con un hash de la huella: alternate(alternate(b)) == b
+        return (bucket ^ (fingerprint * 0x5BD1E995)) & self._mask
+
+    def _slots(self, bucket):
+        start = bucket * self.BUCKET_SIZE
+        return range(start, start + self.BUCKET_SIZE)
+
+    def _put(self, bucket, fingerprint):
+        table = self._table
+        for slot in self._slots(bucket):
+            if not table[slot]:
+                table[slot] = fingerprint
+                return True
+        return False
+
+    def add(self, key):
+        """Añade la clave; False si el filtro se saturó al hacerlo"""
+        fingerprint, first, second = self._locate(key)
+        with self._lock:
+            if self._put(first, fingerprint) or self._put(second, fingerprint):
+                self.count += 1
+                return True
+            bucket = self._random.choice((first, second))
+            for _ in range(self.MAX_KICKS):
+                slot = bucket * self.BUCKET_SIZE + self._random.randrange(self.BUCKET_SIZE)
+                fingerprint, self._table[slot] = self._table[slot], fingerprint
+                bucket = self._alternate(bucket, fingerprint)
+                if self._put(bucket, fingerprint):
+                    self.count += 1
+                    return True
+            # La huella desplazada se pierde: ya no se garantiza "no está"
+            self.saturated = True
+            return False
+
+    def remove(self, key):
+        """Quita una aparición de la clave (debe haberse añadido antes)"""
+        fingerprint, first, second = self._locate(key)
+        with self._lock:
+            for bucket in (first, second):
+                for slot in self._slots(bucket):
+                    if self._table[slot] == fingerprint:
+                        self._table[slot] = 0
+                        self.count -= 1
+                        return True
+        return False
+
+    def might_contain(self, key):
+        """False = seguro que no está; True = puede estar"""
+        if self.saturated:
+            return True
+        fingerprint, first, second = self._locate(key)
+        table = self._table
+        size = self.BUCKET_SIZE
+        return (fingerprint in table[first * size:(first + 1) * size]
+                or fingerprint in table[second * size:(second + 1) * size])
+
+    def load_factor(self):
+        return self.count / len(self._table)
+
+    def memory_bytes(self):
+        return len(self._table) * self._table.itemsize
+
+    def expected_fp_rate(self):
+        """Probabilidad teórica de falso positivo con la ocupación actual"""
+        checked = 2 * self.BUCKET_SIZE * self.load_factor()
+        return 1 - (1 - 1 / (2 ** self.FINGERPRINT_BITS - 1)) ** checked
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "load_factor": round(self.load_factor(), 4),
+            "memory_bytes": self.memory_bytes(),
+            "expected_fp_rate": round(self.expected_fp_rate(), 6),
+            "saturated": self.saturated,
+        }
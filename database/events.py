@@ -0,0 +1,192 @@
+# database/events.py
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    """Buffer acotado de un suscriptor; `overflowed` si no leyó a tiempo.
+
+    `wake` (si se asigna) se llama al publicar: los suscriptores asíncronos
+    no esperan en la Condition sino en su bucle de eventos.
+    """
+
+    __slots__ = ('queue', 'overflowed', 'wake')
+
+    def __init__(self):
+        self.queue = deque()
+        self.overflowed = False
+        self.wake = None
+
+
+def _frame(event_id, kind, data):
+    """Evento en formato Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBroker:
+    """Pub/sub en proceso para el feed de cambios de leads (/api/leads/stream).
+
+    Cada evento se serializa una vez y se copia al buffer de cada suscriptor
+    (como mucho `buffer_size` eventos pendientes); un suscriptor lento recibe
+    un evento `reset` para que recargue los datos en lugar de bloquear al
+    resto. Los últimos `history` eventos permiten reanudar con Last-Event-ID.
+
+    Los ids son `<arranque>-<secuencia>` y solo valen en el proceso que los
+    emitió: un Last-Event-ID de otro worker o de antes de un reinicio también
+    recibe `reset`. `stream` es el generador de la vista WSGI (un hilo por
+    conexión, solo con el servidor de desarrollo); `astream` el del servidor
+    asíncrono de feed.py, donde un único bucle atiende a todos los
+    suscriptores del worker.
+    """
+
+    def __init__(self, history=1000, buffer_size=256, max_subscribers=1000):
+        self.history_size = history
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._cond = threading.Condition()
+        self._pid = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._boot = f"{self._pid:x}{int(time.time() * 1000):x}"
+        self._seq = 0
+        self._history = deque(maxlen=self.history_size)   # (seq, frame)
+        self._subscribers = set()
+        self.published = 0
+        self.overflows = 0
+
+    def _check_fork(self):
+        # Tras un fork el hijo empieza con su propio historial y suscriptores
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def has_subscribers(self):
+        return bool(self._subscribers) and self._pid == os.getpid()
+
+    def publish(self, kind, data):
+        """Emite un evento a todos los suscriptores; no bloquea nunca"""
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._cond:
+            self._check_fork()
+            self._seq += 1
+            frame = _frame(f"{self._boot}-{self._seq}", kind, payload)
+            self._history.append((self._seq, frame))
+            for sub in self._subscribers:
+                if len(sub.queue) >= self.buffer_size:
+                    if not sub.overflowed:
+                        sub.overflowed = True
+                        self.overflows += 1
+                else:
+                    sub.queue.append(frame)
+                if sub.wake is not None:
+                    sub.wake()
+            self.published += 1
+            self._cond.notify_all()
+
+    def subscribe(self, last_event_id=None):
+        """Registra un suscriptor; devuelve (suscripción, eventos a reenviar, reset).
+
+        Devuelve None si se alcanzó max_subscribers.
+        """
+        with self._cond:
+            self._check_fork()
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            backlog, reset = self._replay(last_event_id)
+            sub = Subscription()
+            self._subscribers.add(sub)
+        return sub, backlog, reset
+
+    def _replay(self, last_event_id):
+        if not last_event_id:
+            return [], False
+        boot, _, seq = last_event_id.rpartition('-')
+        try:
+            seq = int(seq)
+        except ValueError:
+            return [], True
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if boot != self._boot or seq > self._seq or seq < oldest - 1:
+            # Id de otro proceso o anterior al historial: se perdieron eventos
+            return [], True
+        return [frame for number, frame in self._history if number > seq], False
+
+    def unsubscribe(self, sub):
+        with self._cond:
+            self._subscribers.discard(sub)
+
+    @staticmethod
+    def _opening(backlog, reset, retry_ms):
+        frames = [f"retry: {retry_ms}\n\n"]
+        if reset:
+            frames.append(_frame(None, 'reset', '{}'))
+        frames.extend(backlog)
+        return "".join(frames)
+
+    @staticmethod
+    def _take(sub):
+        """Vacía el buffer del suscriptor (con la Condition adquirida)"""
+        frames = list(sub.queue)
+        sub.queue.clear()
+        if sub.overflowed:
+            # Se descartaron eventos: el cliente debe recargar los datos
+            sub.overflowed = False
+            frames.append(_frame(None, 'reset', '{}'))
+        # Sin eventos, un comentario SSE mantiene viva la conexión y detecta cortes
+        return "".join(frames) or ": ping\n\n"
+
+    def stream(self, sub, backlog, reset, heartbeat=15, retry_ms=3000):
+        """Generador de texto SSE para una suscripción; termina al desconectar"""
+        try:
+            yield self._opening(backlog, reset, retry_ms)
+            while True:
+                with self._cond:
+                    if not sub.queue and not sub.overflowed:
+                        self._cond.wait(heartbeat)
+                    chunk = self._take(sub)
+                yield chunk
+        finally:
+            self.unsubscribe(sub)
+
+    async def astream(self, sub, backlog, reset, heartbeat=15, retry_ms=3000):
+        """Como `stream`, pero espera en el bucle de eventos sin ocupar un hilo"""
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Event()
+        sub.wake = lambda: loop.call_soon_threadsafe(pending.set)
+        try:
+            yield self._opening(backlog, reset, retry_ms)
+            while True:
+                # Se limpia antes de mirar el buffer: lo que se publique
+                # después vuelve a activar el evento
+                pending.clear()
+                with self._cond:
+                    empty = not sub.queue and not sub.overflowed
+                if empty:
+                    try:
+                        await asyncio.wait_for(pending.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        pass
+                with self._cond:
+                    chunk = self._take(sub)
+                yield chunk
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "subscribers": len(self._subscribers) if self._pid == os.getpid() else 0,
+                "published": self.published,
+                "overflows": self.overflows,
+                "history": len(self._history),
+            }
@@ -0,0 +1,166 @@
+# database/feed.py
+"""Servidor asíncrono del feed de cambios (/api/leads/stream).
+
+Una conexión SSE pasa casi todo el tiempo esperando eventos; servida por
+WSGI retiene un hilo del worker mientras dura. Este servidor HTTP mínimo
+corre en un bucle de eventos propio dentro de cada worker de gunicorn y
+atiende a todos los suscriptores del worker sin un hilo por conexión: un
+suscriptor inactivo solo cuesta su socket y su buffer en EventBroker.
+
+Todos los workers escuchan en el mismo SSE_BIND con SO_REUSEPORT y el
+kernel reparte las conexiones entre ellos. El proxy enruta
+/api/leads/stream a ese puerto (ver README).
+"""
+import asyncio
+import json
+import socket
+from urllib.parse import parse_qs
+
+from database.aio import DatabaseLoop
+
+STREAM_PATH = '/api/leads/stream'
+
+_REASONS = {404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+def _listen(bind):
+    host, _, port = bind.rpartition(':')
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host.strip('[]') or '0.0.0.0', int(port)))
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
+
+
+class FeedServer:
+    """Sirve EventBroker.astream por HTTP/1.1 en un bucle de eventos propio"""
+
+    def __init__(self, broker, bind, heartbeat=15, header_timeout=10):
+        self.broker = broker
+        self.bind = bind
+        self.heartbeat = heartbeat
+        self.header_timeout = header_timeout
+        self._loop = DatabaseLoop(name='sse-feed')
+        self._server = None
+        self._tasks = set()
+        self.connections = 0
+        self.rejected = 0
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def start(self):
+        """Abre el puerto y empieza a aceptar conexiones (una vez por proceso)"""
+        sock = _listen(self.bind)
+        self._server = self._loop.submit(
+            asyncio.start_server(self._handle, sock=sock)
+        ).result()
+        return self
+
+    def stop(self):
+        if self._server is None:
+            return
+        server, self._server = self._server, None
+
+        async def close():
+            # Cerrar el servidor no corta las conexiones abiertas: se
+            # cancelan para que cada suscriptor se dé de baja
+            server.close()
+            tasks = list(self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await server.wait_closed()
+        try:
+            self._loop.submit(close()).result(5)
+        except Exception:
+            pass
+        self._loop.stop()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self.connections += 1
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, path, query, headers = request
+            if path != STREAM_PATH:
+                await self._error(writer, 404, "Recurso no encontrado")
+                return
+            if method != 'GET':
+                await self._error(writer, 405, "Método no permitido", {"Allow": "GET"})
+                return
+            last_event_id = headers.get('last-event-id') or (parse_qs(query).get('last_event_id') or [None])[0]
+            subscription = self.broker.subscribe(last_event_id)
+            if subscription is None:
+                self.rejected += 1
+                await self._error(writer, 503, "Demasiados suscriptores, reintente más tarde", {"Retry-After": "5"})
+                return
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                b"Cache-Control: no-cache\r\n"
+                # Sin buffer en proxies (nginx) para que cada evento salga al momento
+                b"X-Accel-Buffering: no\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            body = self.broker.astream(*subscription, heartbeat=self.heartbeat)
+            try:
+                async for chunk in body:
+                    writer.write(chunk.encode('utf-8'))
+                    await writer.drain()
+            finally:
+                # Cierra el generador aquí para que se dé de baja al momento
+                await body.aclose()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # stop(): la tarea termina sin error (asyncio.streams consulta
+            # task.exception() al acabar y falla con tareas canceladas)
+            pass
+        finally:
+            self.connections -= 1
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.header_timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return None
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        if len(parts) != 3:
+            return None
+        method, target, _ = parts
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        path, _, query = target.partition('?')
+        return method, path, query, headers
+
+    async def _error(self, writer, status, message, headers=None):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode('utf-8')
+        lines = [f"HTTP/1.1 {status} {_REASONS[status]}",
+                 "Content-Type: application/json",
+                 f"Content-Length: {len(body)}",
+                 "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    def stats(self):
+        return {
+            "bind": self.bind,
+            "running": self.running,
+            "connections": self.connections,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,61 @@
+# database/health.py
+import os
+import threading
+import time
+
+
+class HealthMonitor:
+    """Heartbeat en segundo plano que comprueba la base de datos cada `interval`.
+
+    Los endpoints de readiness leen el último resultado en lugar de abrir una
+    conexión en cada sondeo. El hilo arranca con la primera consulta, así que
+    se crea en cada worker después del fork.
+    """
+
+    def __init__(self, check, interval=5, max_age=15):
+        self._check = check
+        self.interval = interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._result = {"ok": False, "checked_at": None, "latency_ms": None, "error": "Sin comprobar"}
+        self._checked_mono = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="db-heartbeat", daemon=True)
+            self._thread.start()
+
+    def snapshot(self):
+        """Último resultado; ok=False si es más antiguo que max_age"""
+        self.start()
+        with self._lock:
+            result = dict(self._result)
+            checked = self._checked_mono
+        if checked is None or time.monotonic() - checked > self.max_age:
+            result["ok"] = False
+            result["stale"] = checked is not None
+        return result
+
+    def _run(self):
+        while True:
+            start = time.perf_counter()
+            try:
+                ok = bool(self._check())
+                error = None if ok else "Sin conexión a la base de datos"
+            except Exception as e:
+                ok, error = False, str(e)
+            latency = round((time.perf_counter() - start) * 1000, 2)
+            with self._lock:
+                self._result = {
+                    "ok": ok,
+                    "checked_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    "latency_ms": latency,
+                    "error": error,
+                }
+                self._checked_mono = time.monotonic()
+            time.sleep(self.interval)
@@ -0,0 +1,127 @@
+# database/ingest.py
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class IngestQueueFull(Exception):
+    """La cola de ingesta está llena (backpressure)"""
+
+
+class IngestQueue:
+    """Cola de escritura diferida con commit agrupado.
+
+    Los leads validados se encolan y un hilo escritor los inserta en lotes
+    cuando se juntan `batch_size` filas o pasan `flush_ms` milisegundos desde
+    la primera fila del lote. Cada envío devuelve un Future con el resultado.
+    """
+
+    def __init__(self, writer, max_size=10000, batch_size=500, flush_ms=50, put_timeout=0.5):
+        self._writer = writer
+        self._queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.put_timeout = put_timeout
+
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._start()
+        atexit.register(self.stop)
+
+        self.submitted = 0
+        self.written = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def submit(self, nombre, correo, telefono, interes):
+        """Encola un lead; lanza IngestQueueFull si no hay hueco a tiempo"""
+        if self._stopping.is_set():
+            raise IngestQueueFull("La cola de ingesta se está cerrando")
+        self._start()
+        future = Future()
+        try:
+            self._queue.put(((nombre, correo, telefono, interes), future), timeout=self.put_timeout)
+        except queue.Full:
+            raise IngestQueueFull(f"Cola de ingesta llena ({self._queue.maxsize} leads)")
+        self.submitted += 1
+        return future
+
+    def stop(self, timeout=10):
+        """Deja de aceptar leads y vacía la cola antes de terminar"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Estadísticas de la cola"""
+        return {
+            "queued": self._queue.qsize(),
+            "max_size": self._queue.maxsize,
+            "submitted": self.submitted,
+            "written": self.written,
+            "rejected": self.rejected,
+            "batches": self.batches,
+        }
+
+    def _start(self):
+        """Arranca el hilo escritor en este proceso.
+
+        Con la app precargada la cola se crea en el maestro de gunicorn y el
+        hilo no sobrevive al fork: cada worker arranca el suyo con una cola
+        vacía en su primer envío.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name="lead-ingest", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _collect(self):
+        """Espera el primer lead y agrupa los siguientes hasta N filas o T ms"""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        leads = [lead for lead, _ in batch]
+        try:
+            results = self._writer(leads)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            self.rejected += len(batch)
+            return
+        for (_, future), ok in zip(batch, results):
+            future.set_result(ok)
+        written = sum(1 for ok in results if ok)
+        self.written += written
+        self.rejected += len(batch) - written
+        self.batches += 1
@@ -0,0 +1,274 @@
+# database/migrations.py
+"""Migraciones versionadas del esquema.
+
+Se ejecutan una sola vez por despliegue con `flask --app app migrate` (o
+`python -m database.migrations`), no al arrancar cada worker. Cada migración
+es idempotente para poder aplicarse sobre bases creadas por el antiguo
+init_db(), y la versión aplicada queda registrada en `schema_migrations`.
+"""
+import logging
+import time
+
+from config import config
+from database.models import DB_ENGINE, dialect, db_connection, _fetch_dict, _rebuild_rollups
+
+logger = logging.getLogger('leadtracker.db')
+
+
+def _index_exists(cur, table, index):
+    """Comprueba en information_schema si existe un índice (solo MySQL)"""
+    cur.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.statistics
+        WHERE table_schema = %s
+        AND table_name = %s
+        AND index_name = %s
+    """, (config['default'].DB_NAME, table, index))
+    return cur.fetchone()[0] > 0
+
+
+def _table_exists(cur, table):
+    return dialect.table_exists(cur, table, config['default'])
+
+
+def _create_index(cur, table, index, definition):
+    """CREATE INDEX si no existe, en todos los motores"""
+    if DB_ENGINE == 'mysql':
+        if not _index_exists(cur, table, index):
+            cur.execute(f"CREATE INDEX {index} ON {table} {definition}")
+    else:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} {definition}")
+
+
+# ----------------------------------------------------------------------
+# Migraciones
+# ----------------------------------------------------------------------
+def m001_create_leads(cur):
+    if DB_ENGINE == 'mysql':
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS leads (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                nombre_completo VARCHAR(100) NOT NULL,
+                correo_electronico VARCHAR(100) UNIQUE NOT NULL,
+                telefono VARCHAR(20),
+                interes_servicio VARCHAR(100) NOT NULL,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+    elif DB_ENGINE == 'sqlite':
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre_completo VARCHAR(100) NOT NULL,
+                correo_electronico VARCHAR(100) UNIQUE NOT NULL,
+                telefono VARCHAR(20),
+                interes_servicio VARCHAR(100) NOT NULL,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+    else:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS leads (
+                id SERIAL PRIMARY KEY,
+                nombre_completo VARCHAR(100) NOT NULL,
+                correo_electronico VARCHAR(100) UNIQUE NOT NULL,
+                telefono VARCHAR(20),
+                interes_servicio VARCHAR(100) NOT NULL,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+
+def m002_maintenance_indexes(cur):
+    # Índices de la sección 4 de sql_queries.sql. idx_correo e
+    # idx_fecha_registro no se crean: el UNIQUE de correo_electronico y la
+    # primera columna de idx_leads_fecha_id ya cubren esas búsquedas.
+    _create_index(cur, 'leads', 'idx_leads_fecha_id', '(fecha_registro, id)')
+    _create_index(cur, 'leads', 'idx_interes_servicio', '(interes_servicio)')
+
+
+def m003_lead_counters(cur):
+    if _table_exists(cur, 'lead_counters'):
+        return
+    month_of = dialect.month_of('fecha_registro')
+    cur.execute("""
+        CREATE TABLE lead_counters (
+            interes_servicio VARCHAR(100) NOT NULL,
+            mes DATE NOT NULL,
+            total INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (interes_servicio, mes)
+        );
+    """)
+    cur.execute(f"""
+        INSERT INTO lead_counters (interes_servicio, mes, total)
+        SELECT interes_servicio, {month_of}, COUNT(*)
+        FROM leads
+        GROUP BY interes_servicio, {month_of}
+    """)
+
+
+def m004_search_indexes(cur):
+    if DB_ENGINE == 'mysql':
+        if not _index_exists(cur, 'leads', 'ft_leads_nombre_correo'):
+            # El parser ngram permite buscar fragmentos en medio de una palabra
+            cur.execute("ALTER TABLE leads ADD FULLTEXT INDEX ft_leads_nombre_correo (nombre_completo, correo_electronico) WITH PARSER ngram")
+        _create_index(cur, 'leads', 'idx_leads_telefono', '(telefono)')
+    elif DB_ENGINE == 'sqlite':
+        # Sin FTS5: la búsqueda usa LIKE o el índice en memoria
+        _create_index(cur, 'leads', 'idx_leads_telefono', '(telefono)')
+    else:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        _create_index(cur, 'leads', 'idx_leads_nombre_trgm', 'USING gin (nombre_completo gin_trgm_ops)')
+        _create_index(cur, 'leads', 'idx_leads_correo_trgm', 'USING gin (correo_electronico gin_trgm_ops)')
+        _create_index(cur, 'leads', 'idx_leads_telefono_trgm', 'USING gin (telefono gin_trgm_ops)')
+
+
+def m005_data_version(cur):
+    # Versión de los datos para ETag/Last-Modified; changed_at en segundos
+    # epoch para no depender de la zona horaria de cada motor
+    if _table_exists(cur, 'data_version'):
+        return
+    cur.execute("""
+        CREATE TABLE data_version (
+            name VARCHAR(50) PRIMARY KEY,
+            version BIGINT NOT NULL,
+            changed_at BIGINT NOT NULL
+        );
+    """)
+    cur.execute(
+        "INSERT INTO data_version (name, version, changed_at) VALUES (%s, %s, %s)",
+        ('leads', 1, int(time.time()))
+    )
+
+
+def m006_lead_rollups(cur):
+    # Agregado diario por servicio para los informes de /api/reports; se
+    # rellena aquí y después lo mantienen las escrituras (_bump_counters)
+    if _table_exists(cur, 'lead_rollups'):
+        return
+    cur.execute("""
+        CREATE TABLE lead_rollups (
+            dia DATE NOT NULL,
+            interes_servicio VARCHAR(100) NOT NULL,
+            total INT NOT NULL DEFAULT 0,
+            con_telefono INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, interes_servicio)
+        );
+    """)
+    _rebuild_rollups(cur)
+
+
+def m007_lead_edits_version(cur):
+    # Versión que solo incrementan las modificaciones y borrados; el índice
+    # de búsqueda en memoria la compara para saber si debe reconstruirse
+    cur.execute("SELECT 1 FROM data_version WHERE name = %s", ('lead_edits',))
+    if cur.fetchone() is None:
+        cur.execute(
+            "INSERT INTO data_version (name, version, changed_at) VALUES (%s, %s, %s)",
+            ('lead_edits', 1, int(time.time()))
+        )
+
+
+MIGRATIONS = [
+    (1, "Tabla leads", m001_create_leads),
+    (2, "Índices de mantenimiento y paginación", m002_maintenance_indexes),
+    (3, "Contadores por servicio y mes", m003_lead_counters),
+    (4, "Índices de búsqueda de texto", m004_search_indexes),
+    (5, "Versión de los datos de leads", m005_data_version),
+    (6, "Agregado diario por servicio para informes", m006_lead_rollups),
+    (7, "Versión de modificaciones y borrados de leads", m007_lead_edits_version),
+]
+
+
+# ----------------------------------------------------------------------
+# Ejecución
+# ----------------------------------------------------------------------
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def _lock(cur):
+    """Bloqueo de aplicación para que dos despliegues no migren a la vez.
+
+    SQLite no tiene bloqueos con nombre: ya serializa las escrituras del fichero.
+    """
+    try:
+        dialect.lock(cur, 'leadtracker_migrate')
+    except RuntimeError:
+        raise RuntimeError("Otro proceso está aplicando migraciones") from None
+
+
+def _unlock(cur):
+    dialect.unlock(cur, 'leadtracker_migrate')
+
+
+def current_version(cur):
+    cur.execute("SELECT MAX(version) AS version FROM schema_migrations")
+    row = _fetch_dict(cur)
+    return row['version'] or 0
+
+
+def migrate(target=None):
+    """Aplica las migraciones pendientes; devuelve las versiones aplicadas"""
+    applied = []
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError("Sin conexión a la base de datos")
+        cur = conn.cursor()
+        _ensure_version_table(cur)
+        conn.commit()
+        _lock(cur)
+        try:
+            version = current_version(cur)
+            for number, description, func in MIGRATIONS:
+                if number <= version or (target is not None and number > target):
+                    continue
+                logger.info("Aplicando migración %d: %s", number, description)
+                func(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (number, description)
+                )
+                conn.commit()
+                applied.append(number)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            _unlock(cur)
+            conn.commit()
+            cur.close()
+    return applied
+
+
+def status():
+    """Versión aplicada y migraciones pendientes"""
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError("Sin conexión a la base de datos")
+        cur = conn.cursor()
+        _ensure_version_table(cur)
+        conn.commit()
+        version = current_version(cur)
+        cur.close()
+    return {
+        "version": version,
+        "latest": MIGRATIONS[-1][0],
+        "pending": [number for number, _, _ in MIGRATIONS if number > version],
+    }
+
+
+if __name__ == '__main__':
+    from metrics import configure_logging
+    configure_logging(config['default'].LOG_LEVEL)
+    applied = migrate()
+    if applied:
+        logger.info("Migraciones aplicadas: %s", ', '.join(map(str, applied)))
+    else:
+        logger.info("El esquema ya está actualizado")
@@ -1,258 +1,1817 @@
 # database/models.py
 import os
+import base64
+import contextvars
+import heapq
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from collections import Counter
+from functools import partial
+from operator import attrgetter
+from datetime import date, datetime, timedelta
 from config import config
+from database.pool import ConnectionPool, PoolTimeout
+from database.circuit import CircuitBreaker
+from database.replicas import Replica, ReplicaSet, RouteState
+from database.cache import create_cache, MISSING
+from database.search import NgramIndex
+from database.emailfilter import CuckooFilter, email_key
+from database.archive import LeadArchive
+from database.events import EventBroker
+from database.dialects import get_dialect, Statement
+from database.records import LEAD_COLUMNS, Lead, record_type
+from metrics import timed, DB_ACQUIRE_SECONDS, ErrorCountingHandler
 
-# Determinar qué motor usar
+logger = logging.getLogger('leadtracker.db')
+logger.addHandler(ErrorCountingHandler())
+
+# Determinar qué motor usar; el dialecto importa solo el driver necesario
 DB_ENGINE = config['default'].DB_ENGINE
+dialect = get_dialect(DB_ENGINE)
+db_module = dialect.module
 
-if DB_ENGINE == 'mysql':
-    import pymysql
-    db_module = pymysql
-else:
-    import psycopg2
-    db_module = psycopg2
+def get_db_connection(max_retries=3, delay=2, endpoint=None, breaker=None):
+    """Abre una conexión nueva con la base de datos RDS con reintentos.
 
-def get_db_connection(max_retries=3, delay=2):
-    """Establece conexión con la base de datos RDS con reintentos"""
+    Solo la usan los pools; las operaciones CRUD piden conexiones con db_connection().
+    Si el circuit breaker está abierto falla al instante en lugar de reintentar.
+    `endpoint` es una réplica de DB_REPLICAS (por defecto, el primario).
+    """
+    breaker = breaker or primary_breaker
     for attempt in range(max_retries):
+        if not breaker.allow():
+            logger.debug("Base de datos marcada como caída; no se intenta conectar")
+            return None
         try:
-            if DB_ENGINE == 'mysql':
-                conn = pymysql.connect(
-                    host=config['default'].DB_HOST,
-                    database=config['default'].DB_NAME,
-                    user=config['default'].DB_USER,
-                    password=config['default'].DB_PASSWORD,
-                    port=int(config['default'].DB_PORT),
-                    connect_timeout=10,
-                    charset='utf8mb4',
-                    cursorclass=pymysql.cursors.DictCursor
-                )
-            else:
-                conn = psycopg2.connect(
-                    host=config['default'].DB_HOST,
-                    database=config['default'].DB_NAME,
-                    user=config['default'].DB_USER,
-                    password=config['default'].DB_PASSWORD,
-                    port=config['default'].DB_PORT,
-                    connect_timeout=10
-                )
-            
-            print(f"✅ Conexión exitosa a {DB_ENGINE.upper()} RDS: {config['default'].DB_HOST}")
+            conn = dialect.connect(config['default'], endpoint)
+            logger.debug("Conexión abierta a %s RDS: %s", DB_ENGINE.upper(), endpoint or config['default'].DB_HOST)
+            breaker.record_success()
             return conn
         except db_module.Error as e:
-            print(f"⚠️  Intento {attempt + 1} de {max_retries} falló: {e}")
+            breaker.record_failure()
+            logger.warning("Intento %d de %d falló: %s", attempt + 1, max_retries, e)
             if attempt < max_retries - 1:
-                print(f"🔄 Reintentando en {delay} segundos...")
+                logger.info("Reintentando en %s segundos...", delay)
                 time.sleep(delay)
             else:
-                print("❌ No se pudo conectar a la base de datos después de varios intentos")
+                logger.error("No se pudo conectar a la base de datos después de varios intentos")
                 return None
 
+def _new_breaker():
+    return CircuitBreaker(
+        failure_threshold=config['default'].DB_BREAKER_THRESHOLD,
+        reset_timeout=config['default'].DB_BREAKER_RESET
+    )
+
+def _new_pool(creator):
+    if DB_ENGINE == 'sqlite':
+        # Una conexión por hilo: abrir SQLite es barato y no admite compartirla
+        from database.sqlite_backend import ThreadLocalPool
+        return ThreadLocalPool(creator=creator)
+    return ConnectionPool(
+        creator=creator,
+        validator=dialect.validate,
+        min_size=config['default'].DB_POOL_MIN_SIZE,
+        max_size=config['default'].DB_POOL_MAX_SIZE,
+        timeout=config['default'].DB_POOL_TIMEOUT,
+        recycle=config['default'].DB_POOL_RECYCLE,
+        idle_timeout=config['default'].DB_POOL_IDLE_TIMEOUT
+    )
+
+breaker = primary_breaker = _new_breaker()
+pool = _new_pool(get_db_connection)
+
+# Réplicas de lectura (DB_REPLICAS). Un solo intento de conexión: si una
+# réplica no responde la lectura pasa a otra o al primario sin esperar.
+def _new_replica(endpoint):
+    replica_breaker = _new_breaker()
+    creator = partial(get_db_connection, max_retries=1, delay=0, endpoint=endpoint, breaker=replica_breaker)
+    return Replica(endpoint, _new_pool(creator), replica_breaker)
+
+replicas = ReplicaSet(_new_replica(endpoint) for endpoint in config['default'].DB_REPLICAS)
+
+def close_pools():
+    """Cierra las conexiones libres del primario y de las réplicas.
+
+    El lanzador (gunicorn.conf.py) la llama en el maestro antes de crear los
+    workers, para que ninguno herede conexiones, y al salir cada worker.
+    """
+    pool.close_all()
+    replicas.close_all()
+
+# Pools heredados del proceso padre. En el hijo no se cierran: cerrar la
+# conexión enviaría el fin de sesión por el socket que comparte con el padre;
+# se guardan aquí para que el recolector de basura tampoco las finalice.
+_inherited_pools = []
+
+def _reset_after_fork():
+    """Tras un fork, pools y breakers nuevos: cada worker abre sus conexiones"""
+    global breaker, primary_breaker, pool, replicas
+    _inherited_pools.append((pool, replicas))
+    breaker = primary_breaker = _new_breaker()
+    pool = _new_pool(get_db_connection)
+    replicas = ReplicaSet(_new_replica(endpoint) for endpoint in config['default'].DB_REPLICAS)
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Enrutado de lecturas de la petición en curso (ver begin_request_routing)
+_route = contextvars.ContextVar('leadtracker_db_route', default=None)
+
+def begin_request_routing(primary=False):
+    """Empieza el enrutado de una petición; `primary` para leer lo recién escrito.
+
+    Devuelve el token para end_request_routing().
+    """
+    return _route.set(RouteState(primary))
+
+def end_request_routing(token):
+    """Termina el enrutado; True si la petición escribió en la base de datos"""
+    state = _route.get()
+    _route.reset(token)
+    return bool(state and state.wrote)
+
+def _mark_write():
+    # Tras escribir, el resto de la petición lee del primario
+    state = _route.get()
+    if state is not None:
+        state.wrote = True
+        state.primary = True
+
+@contextmanager
+def db_connection(timeout=None, read_only=False):
+    """Presta una conexión del pool y la devuelve al terminar.
+
+    Con `read_only` la conexión sale de una réplica sana (round robin, la
+    misma durante toda la petición) salvo que la petición deba leer del
+    primario; si no hay réplicas disponibles se usa el primario.
+    """
+    start = time.perf_counter()
+    source, conn = None, None
+    state = _route.get()
+    if read_only and replicas and not (state is not None and state.primary):
+        replica, conn = replicas.acquire(timeout, state)
+        source = replica.pool if replica else None
+    if conn is None:
+        source = pool
+        try:
+            conn = pool.acquire(timeout)
+        except PoolTimeout as e:
+            logger.error("%s", e)
+            conn = None
+    DB_ACQUIRE_SECONDS.observe(time.perf_counter() - start)
+    try:
+        yield conn
+    except BaseException:
+        source.release(conn, discard=True)
+        raise
+    else:
+        source.release(conn)
+
+def get_pool_stats():
+    """Estadísticas del pool de conexiones"""
+    return pool.stats()
+
+def get_breaker_stats():
+    """Estado del circuit breaker de la base de datos"""
+    return breaker.stats()
+
+def get_replica_stats():
+    """Breaker y pool de cada réplica de lectura"""
+    return replicas.stats()
+
+def ping_db(timeout=2):
+    """Comprobación barata para el heartbeat: SELECT 1 con una conexión del pool"""
+    with db_connection(timeout) as conn:
+        if not conn:
+            return False
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchone()
+        cur.close()
+    breaker.record_success()
+    return True
+
+# Caché de lectura delante de get_lead_by_id y los listados. Las entradas se
+# etiquetan con los ids que contienen para invalidarlas con precisión; los
+# valores cacheados se comparten, así que no deben modificarse.
+lead_cache = create_cache(config['default'])
+
+def _invalidate_leads(*lead_ids):
+    """Invalida la caché tras una escritura; sin ids significa leads nuevos"""
+    _mark_write()
+    tags = ['leads:stats'] + [f'lead:{lead_id}' for lead_id in lead_ids]
+    if not lead_ids:
+        # Un lead nuevo solo aparece en las primeras páginas (sin cursor)
+        tags.append('leads:head')
+    lead_cache.invalidate_tags(tags)
+
+def _cached(key):
+    """lead_cache.get(), salvo si la petición debe leer del primario tras escribir"""
+    state = _route.get()
+    if replicas and state is not None and state.primary:
+        return MISSING
+    return lead_cache.get(key)
+
+def get_cache_stats():
+    """Contadores de la caché de lectura"""
+    return lead_cache.stats()
+
+# Feed de cambios para /api/leads/stream. Las escrituras publican después del
+# commit; las altas en lote solo buscan los ids si hay alguien escuchando.
+lead_events = EventBroker(
+    history=config['default'].SSE_HISTORY,
+    buffer_size=config['default'].SSE_BUFFER_SIZE,
+    max_subscribers=config['default'].SSE_MAX_SUBSCRIBERS
+)
+
+def _publish_lead(kind, lead_id, nombre, correo, telefono, interes):
+    lead_events.publish(kind, {
+        'id': lead_id,
+        'nombre_completo': nombre,
+        'correo_electronico': correo,
+        'telefono': telefono,
+        'interes_servicio': interes,
+    })
+
+def _publish_created(conn, leads):
+    """Eventos 'created' de leads (tuplas) insertados en lote"""
+    if not leads:
+        return
+    if not lead_events.has_subscribers():
+        # Nadie escuchando: un evento 'bulk' basta para reanudaciones
+        lead_events.publish('bulk', {'created': len(leads)})
+        return
+    emails = [lead[1] for lead in leads]
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT id, correo_electronico FROM leads WHERE correo_electronico IN ({', '.join(['%s'] * len(emails))})",
+        emails
+    )
+    ids = {correo: lead_id for lead_id, correo in cur.fetchall()}
+    cur.close()
+    for lead in leads:
+        _publish_lead('created', ids.get(lead[1]), *lead)
+
+def get_event_stats():
+    """Suscriptores y eventos del feed de cambios"""
+    return lead_events.stats()
+
+@timed('test_connection')
 def test_connection():
     """Función para probar la conexión a RDS"""
-    print(f"🧪 Probando conexión a {DB_ENGINE.upper()} RDS...")
-    print(f"📊 Host: {config['default'].DB_HOST}")
-    print(f"📊 Database: {config['default'].DB_NAME}")
-    print(f"📊 User: {config['default'].DB_USER}")
-    print(f"📊 Port: {config['default'].DB_PORT}")
+    logger.debug("Probando conexión a %s RDS %s:%s/%s", DB_ENGINE.upper(),
+                 config['default'].DB_HOST, config['default'].DB_PORT, config['default'].DB_NAME)
     
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            if DB_ENGINE == 'mysql':
-                cur.execute("SELECT version()")
-                db_version = cur.fetchone()
-                print(f"✅ MySQL version: {db_version['version()']}")
-            else:
-                cur.execute("SELECT version();")
-                db_version = cur.fetchone()
-                print(f"✅ PostgreSQL version: {db_version[0]}")
-            
-            cur.close()
-            conn.close()
-            return True
-        except Exception as e:
-            print(f"❌ Error en prueba: {e}")
-            return False
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(dialect.version_sql)
+                logger.debug("%s version: %s", dialect.label, cur.fetchone()[0])
+                cur.close()
+                return True
+            except Exception as e:
+                logger.error("Error en prueba de conexión: %s", e)
+                return False
     return False
 
 def init_db():
-    """Inicializa la base de datos y crea las tablas necesarias en RDS"""
-    print(f"🚀 Inicializando base de datos en {DB_ENGINE.upper()} RDS...")
-    
-    if not test_connection():
-        print("❌ No se puede inicializar la base de datos sin conexión")
+    """Aplica las migraciones pendientes del esquema (ver database/migrations.py).
+
+    No se llama al importar la app: se ejecuta una vez por despliegue con
+    `flask --app app migrate`.
+    """
+    from database.migrations import migrate
+    logger.info("Inicializando base de datos en %s RDS...", DB_ENGINE.upper())
+    try:
+        applied = migrate()
+    except Exception as e:
+        logger.error("Error inicializando base de datos: %s", e)
         return False
-    
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            
-            if DB_ENGINE == 'mysql':
-                # Verificar si la tabla ya existe en MySQL
-                cur.execute("""
-                    SELECT COUNT(*) as count
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s 
-                    AND table_name = 'leads'
-                """, (config['default'].DB_NAME,))
-                result = cur.fetchone()
-                table_exists = result['count'] > 0
-                
-                if table_exists:
-                    print("✅ La tabla 'leads' ya existe")
-                else:
-                    create_table_query = """
-                    CREATE TABLE leads (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        nombre_completo VARCHAR(100) NOT NULL,
-                        correo_electronico VARCHAR(100) UNIQUE NOT NULL,
-                        telefono VARCHAR(20),
-                        interes_servicio VARCHAR(100) NOT NULL,
-                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    );
-                    """
-            else:
-                # Verificar si la tabla ya existe en PostgreSQL
+    if applied:
+        logger.info("Migraciones aplicadas: %s", ', '.join(map(str, applied)))
+    else:
+        logger.info("El esquema ya está actualizado")
+    return True
+
+# Sentencias frecuentes: SQL fijo, columnas explícitas y preparadas una vez
+# por conexión en los motores que lo permiten (ver Dialect.execute)
+_LEAD_SELECT = f"SELECT {', '.join(LEAD_COLUMNS)} FROM leads"
+_LEAD_INSERT = "INSERT INTO leads (nombre_completo, correo_electronico, telefono, interes_servicio)"
+
+CURRENT_MONTH_SQL = dialect.current_month_sql
+
+INSERT_LEAD = Statement(
+    'insert_lead',
+    f"{_LEAD_INSERT} VALUES (%s, %s, %s, %s)" + (" RETURNING id" if dialect.returning else "")
+)
+SELECT_LEAD = Statement('select_lead', f"{_LEAD_SELECT} WHERE id = %s")
+SELECT_LEAD_BY_EMAIL = Statement('select_lead_by_email', f"{_LEAD_SELECT} WHERE correo_electronico = %s")
+LOCK_LEAD = Statement(
+    'lock_lead',
+    "SELECT interes_servicio, fecha_registro, telefono, correo_electronico FROM leads WHERE id = %s FOR UPDATE"
+)
+UPDATE_LEAD = Statement(
+    'update_lead',
+    "UPDATE leads SET nombre_completo = %s, correo_electronico = %s, telefono = %s, interes_servicio = %s WHERE id = %s"
+)
+DELETE_LEAD = Statement('delete_lead', "DELETE FROM leads WHERE id = %s")
+BUMP_COUNTER_NOW = Statement('bump_counter_now', dialect.counter_upsert(CURRENT_MONTH_SQL))
+BUMP_COUNTER = Statement('bump_counter', dialect.counter_upsert('%s'))
+_ROLLUP_KEYS = ('dia', 'interes_servicio')
+_ROLLUP_TOTALS = ('total', 'con_telefono')
+BUMP_ROLLUP_NOW = Statement(
+    'bump_rollup_now',
+    dialect.add_upsert('lead_rollups', _ROLLUP_KEYS, _ROLLUP_TOTALS, "CURRENT_DATE, %s, %s, %s")
+)
+BUMP_ROLLUP = Statement('bump_rollup', dialect.add_upsert('lead_rollups', _ROLLUP_KEYS, _ROLLUP_TOTALS, "%s, %s, %s, %s"))
+BUMP_VERSION = Statement(
+    'bump_version',
+    "UPDATE data_version SET version = version + 1, changed_at = %s WHERE name = 'leads'"
+)
+# Modificaciones y borrados incrementan también 'lead_edits' (las altas no):
+# el índice de búsqueda en memoria detecta así los cambios de otros procesos
+BUMP_EDIT_VERSION = Statement(
+    'bump_edit_version',
+    "UPDATE data_version SET version = version + 1, changed_at = %s WHERE name IN ('leads', 'lead_edits')"
+)
+EMAIL_EXISTS = Statement('email_exists', "SELECT 1 FROM leads WHERE correo_electronico = %s")
+SELECT_VERSION = Statement('select_version', "SELECT version, changed_at FROM data_version WHERE name = %s")
+
+def _fetch_dict(cur):
+    """fetchone() como dict con los nombres de cur.description"""
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([desc[0] for desc in cur.description], row))
+
+def _has_phone(telefono):
+    """1 si el lead tiene teléfono (mismo criterio que sql_queries.sql)"""
+    return 1 if telefono else 0
+
+def _bump_counters(cur, service, delta, fecha=None, phones=0):
+    """Suma `delta` leads (`phones` con teléfono) del servicio en la fecha de
+    `fecha` (o la actual) a lead_counters (mes) y a lead_rollups (día).
+
+    Se ejecuta con el cursor de la escritura para quedar en la misma transacción.
+    """
+    if fecha is None:
+        dialect.execute(cur, BUMP_COUNTER_NOW, (service, delta))
+        dialect.execute(cur, BUMP_ROLLUP_NOW, (service, delta, phones))
+    else:
+        dialect.execute(cur, BUMP_COUNTER, (service, date(fecha.year, fecha.month, 1), delta))
+        day = fecha.date() if isinstance(fecha, datetime) else fecha
+        dialect.execute(cur, BUMP_ROLLUP, (day, service, delta, phones))
+
+def _bump_counters_for(cur, leads):
+    """Suma a hoy los leads (tuplas) recién insertados"""
+    totals = Counter()
+    phones = Counter()
+    for lead in leads:
+        totals[lead[3]] += 1
+        phones[lead[3]] += _has_phone(lead[2])
+    # Por servicio ordenado: dos lotes concurrentes bloquean las filas de
+    # contadores en el mismo orden (ver update_lead)
+    for service in sorted(totals):
+        _bump_counters(cur, service, totals[service], phones=phones[service])
+
+def _bump_version(cur, edit=False):
+    """Incrementa la versión de los datos de leads (ETag de /api/leads y /leads);
+    con `edit` (UPDATE o DELETE) también la de 'lead_edits'.
+
+    Va justo antes del commit de cada escritura para retener lo mínimo el
+    bloqueo de la fila.
+    """
+    dialect.execute(cur, BUMP_EDIT_VERSION if edit else BUMP_VERSION, (int(time.time()),))
+
+def _read_version(name):
+    """(versión, segundos epoch del último cambio) de data_version o None"""
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                dialect.execute(cur, SELECT_VERSION, (name,))
+                row = cur.fetchone()
+                cur.close()
+                return (int(row[0]), int(row[1])) if row else None
+            except Exception as e:
+                logger.error("Error leyendo la versión %s: %s", name, e)
+    return None
+
+@timed('get_leads_version')
+def get_leads_version():
+    """(versión, segundos epoch del último cambio) o None sin base de datos.
+
+    Una lectura por clave primaria: permite responder 304 sin recorrer leads.
+    """
+    return _read_version('leads')
+
+LEAD_STATS_SQL = f"""
+    SELECT interes_servicio,
+           SUM(total) AS total,
+           SUM(CASE WHEN mes = {CURRENT_MONTH_SQL} THEN total ELSE 0 END) AS este_mes
+    FROM lead_counters
+    GROUP BY interes_servicio
+"""
+
+def _stats_key(version=None):
+    return 'leads:stats' if version is None else f'leads:stats:v{version}'
+
+def _stats_result(rows, key='leads:stats'):
+    """Estadísticas a partir de las filas de LEAD_STATS_SQL (y a la caché)"""
+    por_servicio = {service: int(total) for service, total, _ in rows if total}
+    stats = {
+        "total": sum(por_servicio.values()),
+        "este_mes": sum(int(este_mes) for _, _, este_mes in rows),
+        "por_servicio": por_servicio,
+    }
+    lead_cache.set(key, stats, tags=['leads:stats'])
+    return stats
+
+@timed('get_lead_stats')
+def get_lead_stats(version=None):
+    """Estadísticas del panel: total, por servicio y del mes actual.
+
+    Lee lead_counters (una fila por servicio y mes) en lugar de la tabla leads.
+    Con `version` (la de get_leads_version) solo se usa la caché de esa versión.
+    """
+    key = _stats_key(version)
+    stats = _cached(key)
+    if stats is not MISSING:
+        return stats
+
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(LEAD_STATS_SQL)
+                rows = cur.fetchall()
+                cur.close()
+            except Exception as e:
+                logger.error("Error obteniendo estadísticas: %s", e)
+                return None
+        else:
+            return None
+
+    return _stats_result(rows, key)
+
+# Informes sobre lead_rollups: una fila por día y servicio mantenida por las
+# escrituras (_bump_counters), así un informe mensual o trimestral lee unos
+# cientos de filas en lugar de agrupar la tabla leads
+REPORT_PERIODS = {
+    'day': lambda dia: dia.isoformat(),
+    'month': lambda dia: f"{dia.year}-{dia.month:02d}",
+    'quarter': lambda dia: f"{dia.year}-T{(dia.month - 1) // 3 + 1}",
+    'year': lambda dia: str(dia.year),
+}
+
+def _period_start(dia, period):
+    """Primer día del periodo que contiene `dia`"""
+    if period == 'day':
+        return dia
+    if period == 'year':
+        return date(dia.year, 1, 1)
+    if period == 'quarter':
+        return date(dia.year, (dia.month - 1) // 3 * 3 + 1, 1)
+    return date(dia.year, dia.month, 1)
+
+def _as_date(value):
+    # MIN()/MAX() pierden el tipo declarado en SQLite y llegan como texto
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value.date() if isinstance(value, datetime) else value
+
+def _archived_rollups(cur, desde=None, hasta=None):
+    """(totales, con teléfono) por (día, servicio) de los leads archivados
+    en [desde, hasta], sin los que siguen en la tabla"""
+    totals = Counter()
+    phones = Counter()
+    since = datetime.combine(desde, datetime.min.time()) if desde is not None else None
+    last = None
+    for lead in lead_archive.iter_leads(since):
+        day = lead.fecha_registro.date()
+        if hasta is not None and day > hasta:
+            break
+        key = (day, lead.interes_servicio)
+        totals[key] += 1
+        phones[key] += _has_phone(lead.telefono)
+        last = lead
+    if last is None:
+        return totals, phones
+    # Un trozo cuyo DELETE no llegó a confirmarse está en el archivo y en la
+    # tabla (archive_leads lo borra en la siguiente pasada): cuenta una vez
+    cur.execute(
+        "SELECT id, fecha_registro, interes_servicio FROM leads WHERE fecha_registro <= %s"
+        + (" AND fecha_registro >= %s" if since is not None else ""),
+        [last.fecha_registro] + ([since] if since is not None else [])
+    )
+    for lead_id, fecha, service in cur.fetchall():
+        archived = lead_archive.get(lead_id)
+        if archived is not None:
+            key = (_as_date(fecha), service)
+            totals[key] -= 1
+            phones[key] -= _has_phone(archived.telefono)
+    return +totals, phones
+
+def _rebuild_rollups(cur, desde=None, hasta=None):
+    """Recalcula lead_rollups para los días [desde, hasta] desde la tabla
+    leads y el archivo frío (los leads archivados siguen contando).
+
+    Borra y vuelve a insertar en la transacción de `cur`; las escrituras
+    concurrentes esperan al bloqueo de las filas borradas y suman después.
+    Devuelve el número de filas de lead_rollups del rango.
+    """
+    day_of = dialect.day_of('fecha_registro')
+    where, params = [], []
+    if desde is not None:
+        where.append("fecha_registro >= %s")
+        params.append(datetime.combine(desde, datetime.min.time()))
+    if hasta is not None:
+        where.append("fecha_registro < %s")
+        params.append(datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+    delete_where = " AND ".join(
+        condition for condition, value in (("dia >= %s", desde), ("dia <= %s", hasta)) if value is not None
+    )
+    cur.execute(
+        "DELETE FROM lead_rollups" + (f" WHERE {delete_where}" if delete_where else ""),
+        [value for value in (desde, hasta) if value is not None]
+    )
+    cur.execute(f"""
+        INSERT INTO lead_rollups (dia, interes_servicio, total, con_telefono)
+        SELECT {day_of}, interes_servicio, COUNT(*),
+               SUM(CASE WHEN telefono IS NOT NULL AND telefono <> '' THEN 1 ELSE 0 END)
+        FROM leads
+        {"WHERE " + " AND ".join(where) if where else ""}
+        GROUP BY {day_of}, interes_servicio
+    """, params)
+    totals, phones = _archived_rollups(cur, desde, hasta)
+    for (day, service), total in totals.items():
+        dialect.execute(cur, BUMP_ROLLUP, (day, service, total, phones[(day, service)]))
+    cur.execute(
+        "SELECT COUNT(*) FROM lead_rollups" + (f" WHERE {delete_where}" if delete_where else ""),
+        [value for value in (desde, hasta) if value is not None]
+    )
+    return cur.fetchone()[0]
+
+@timed('backfill_rollups')
+def backfill_rollups(desde=None, hasta=None):
+    """Reconstruye lead_rollups (todo o el rango de días) en una transacción.
+
+    Devuelve el número de filas escritas o None si falló.
+    """
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                rows = _rebuild_rollups(cur, desde, hasta)
+                conn.commit()
+                cur.close()
+                lead_cache.invalidate_tags(['leads:stats'])
+                logger.info("lead_rollups reconstruida: %s filas (%s - %s)", rows, desde, hasta)
+                return rows
+            except Exception as e:
+                conn.rollback()
+                logger.error("Error reconstruyendo lead_rollups: %s", e)
+    return None
+
+@timed('get_leads_report')
+def get_leads_report(period='month', desde=None, hasta=None, servicio=None):
+    """Leads por periodo (day, month, quarter, year) y servicio desde lead_rollups.
+
+    Sin rango devuelve los periodos de los últimos doce meses; `desde` se
+    ajusta al inicio de su periodo para no dar un primer periodo incompleto.
+    """
+    label = REPORT_PERIODS[period]
+    hasta = hasta or date.today()
+    desde = _period_start(desde or date(hasta.year - 1, hasta.month, 1), period)
+    key = f"leads:report:{period}:{desde}:{hasta}:{servicio or ''}"
+    report = _cached(key)
+    if report is not MISSING:
+        return report
+
+    sql = "SELECT dia, interes_servicio, total, con_telefono FROM lead_rollups WHERE dia >= %s AND dia <= %s AND total <> 0"
+    params = [desde, hasta]
+    if servicio:
+        sql += " AND interes_servicio = %s"
+        params.append(servicio)
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+                cur.close()
+            except Exception as e:
+                logger.error("Error obteniendo el informe de leads: %s", e)
+                return None
+        else:
+            return None
+
+    buckets = {}
+    for dia, service, total, phones in rows:
+        dia = _as_date(dia)
+        name = label(dia)
+        bucket = buckets.get(name)
+        if bucket is None:
+            bucket = buckets[name] = {
+                "periodo": name,
+                "desde": _period_start(dia, period).isoformat(),
+                "total": 0,
+                "con_telefono": 0,
+                "por_servicio": Counter(),
+            }
+        bucket["total"] += int(total)
+        bucket["con_telefono"] += int(phones)
+        bucket["por_servicio"][service] += int(total)
+
+    periodos = sorted(buckets.values(), key=lambda bucket: bucket["desde"], reverse=True)
+    for bucket in periodos:
+        bucket["por_servicio"] = dict(bucket["por_servicio"].most_common())
+    report = {
+        "period": period,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "servicio": servicio,
+        "total": sum(bucket["total"] for bucket in periodos),
+        "periodos": periodos,
+        "filas_leidas": len(rows),
+    }
+    lead_cache.set(key, report, tags=['leads:stats'])
+    return report
+
+@timed('get_leads_summary')
+def get_leads_summary():
+    """Resumen general (sección 3 de sql_queries.sql) calculado con lead_rollups.
+
+    Primer y último registro tienen precisión de día.
+    """
+    summary = _cached('leads:summary')
+    if summary is not MISSING:
+        return summary
+
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
                 cur.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name = 'leads'
-                    );
+                    SELECT interes_servicio, SUM(total), SUM(con_telefono), MIN(dia), MAX(dia)
+                    FROM lead_rollups
+                    WHERE total > 0
+                    GROUP BY interes_servicio
                 """)
-                table_exists = cur.fetchone()[0]
-                
-                if table_exists:
-                    print("✅ La tabla 'leads' ya existe")
-                else:
-                    create_table_query = """
-                    CREATE TABLE leads (
-                        id SERIAL PRIMARY KEY,
-                        nombre_completo VARCHAR(100) NOT NULL,
-                        correo_electronico VARCHAR(100) UNIQUE NOT NULL,
-                        telefono VARCHAR(20),
-                        interes_servicio VARCHAR(100) NOT NULL,
-                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    );
-                    """
-            
-            if not table_exists:
-                cur.execute(create_table_query)
-                conn.commit()
-                print("✅ Tabla 'leads' creada exitosamente")
-            
-            cur.close()
-            conn.close()
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error inicializando base de datos: {e}")
-            return False
-    return False
+                rows = cur.fetchall()
+                cur.close()
+            except Exception as e:
+                logger.error("Error obteniendo el resumen de leads: %s", e)
+                return None
+        else:
+            return None
+
+    first = min((_as_date(row[3]) for row in rows), default=None)
+    last = max((_as_date(row[4]) for row in rows), default=None)
+    summary = {
+        "total_leads": sum(int(row[1]) for row in rows),
+        "servicios_unicos": len(rows),
+        "leads_con_telefono": sum(int(row[2]) for row in rows),
+        "primer_registro": first.isoformat() if first else None,
+        "ultimo_registro": last.isoformat() if last else None,
+    }
+    lead_cache.set('leads:summary', summary, tags=['leads:stats'])
+    return summary
 
 # Operaciones CRUD
+@timed('create_lead')
 def create_lead(nombre, correo, telefono, interes):
     """INSERT - Crear nuevo lead"""
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
+    email_filter = _email_filter_ready()
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                if email_filter is not None and _email_maybe_taken(email_filter, correo):
+                    # Posible duplicado: búsqueda por el índice UNIQUE en lugar
+                    # de un INSERT que acabaría en IntegrityError
+                    dialect.execute(cur, EMAIL_EXISTS, (correo,))
+                    if cur.fetchone() is not None:
+                        cur.close()
+                        _email_counts["duplicates"] += 1
+                        logger.info("El correo %s ya existe", correo)
+                        return False
+                    _email_counts["false_positives"] += 1
+                dialect.execute(cur, INSERT_LEAD, (nombre, correo, telefono, interes))
+                lead_id = cur.fetchone()[0] if dialect.returning else cur.lastrowid
+                _bump_counters(cur, interes, 1, phones=_has_phone(telefono))
+                _bump_version(cur)
+                conn.commit()
+                cur.close()
+                _remember_email(correo)
+                _invalidate_leads()
+                _index_lead(lead_id, nombre, correo, telefono, interes)
+                _publish_lead('created', lead_id, nombre, correo, telefono, interes)
+                logger.debug("Lead creado: %s - %s", nombre, correo)
+                return True
+            except db_module.IntegrityError:
+                # Alta de otro proceso que este filtro aún no conocía
+                _remember_email(correo)
+                logger.info("El correo %s ya existe", correo)
+                return False
+            except Exception as e:
+                logger.error("Error creando lead: %s", e)
+                return False
+    return False
+
+@timed('update_lead')
+def update_lead(lead_id, nombre, correo, telefono, interes):
+    """UPDATE - Actualizar lead existente"""
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                dialect.execute(cur, LOCK_LEAD, (lead_id,))
+                old = cur.fetchone()
+                dialect.execute(cur, UPDATE_LEAD, (nombre, correo, telefono, interes, lead_id))
+                if old and (old[0] != interes or _has_phone(old[2]) != _has_phone(telefono)):
+                    old_interes, fecha, old_telefono, _ = old
+                    # Siempre por (servicio, mes) y el mes es el mismo: dos
+                    # ediciones concurrentes A→B y B→A bloquean las filas de
+                    # contadores en el mismo orden y no se interbloquean
+                    for service, delta, phones in sorted([(old_interes, -1, -_has_phone(old_telefono)),
+                                                          (interes, 1, _has_phone(telefono))]):
+                        _bump_counters(cur, service, delta, fecha, phones)
+                if old:
+                    _bump_version(cur, edit=True)
+                conn.commit()
+                cur.close()
+                _invalidate_leads(lead_id)
+                if old:
+                    _search_edited()
+                    if old[3] != correo:
+                        _forget_email(old[3])
+                        _remember_email(correo)
+                    _index_lead(lead_id, nombre, correo, telefono, interes)
+                    _publish_lead('updated', lead_id, nombre, correo, telefono, interes)
+                logger.debug("Lead actualizado: ID %s", lead_id)
+                return True
+            except Exception as e:
+                logger.error("Error actualizando lead: %s", e)
+                return False
+    return False
+
+@timed('delete_lead')
+def delete_lead(lead_id):
+    """DELETE - Eliminar lead"""
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                dialect.execute(cur, LOCK_LEAD, (lead_id,))
+                old = cur.fetchone()
+                dialect.execute(cur, DELETE_LEAD, (lead_id,))
+                deleted = bool(old and cur.rowcount)
+                if deleted:
+                    _bump_counters(cur, old[0], -1, old[1], -_has_phone(old[2]))
+                    _bump_version(cur, edit=True)
+                conn.commit()
+                cur.close()
+                _invalidate_leads(lead_id)
+                if deleted:
+                    _search_edited()
+                _unindex_lead(lead_id)
+                if old:
+                    _forget_email(old[3])
+                    lead_events.publish('deleted', {'id': lead_id})
+                logger.debug("Lead eliminado: ID %s", lead_id)
+                return True
+            except Exception as e:
+                logger.error("Error eliminando lead: %s", e)
+                return False
+    return False
+
+@timed('get_lead_by_id')
+def get_lead_by_id(lead_id, primary=False):
+    """Obtener lead por ID.
+
+    Con `primary` (formulario de edición) se lee del primario sin pasar por
+    la caché. La fila solo se cachea si nadie invalidó la caché durante la
+    lectura: una réplica atrasada o una edición concurrente no dejan en
+    ella un lead anterior a la última escritura.
+    """
+    key = f'lead:{lead_id}'
+    if not primary:
+        lead = _cached(key)
+        if lead is not MISSING:
+            return lead
+    generation = lead_cache.generation()
+    
+    with db_connection(read_only=not primary) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                dialect.execute(cur, SELECT_LEAD, (lead_id,))
+                row = cur.fetchone()
+                lead = Lead(*row) if row else None
+                cur.close()
+                if lead:
+                    lead_cache.set(key, lead, tags=[key], generation=generation)
+                return lead
+            except Exception as e:
+                logger.error("Error obteniendo lead: %s", e)
+                return None
+    return None
+
+
+# Paginación por cursor (keyset) sobre (fecha_registro, id)
+class InvalidCursor(ValueError):
+    """El token de paginación no es válido"""
+
+def encode_cursor(fecha, lead_id):
+    """Genera el token opaco que apunta al lead siguiente a (fecha, id)"""
+    payload = json.dumps([fecha.isoformat(), lead_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Devuelve (fecha_registro, id) a partir de un token de paginación"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        fecha, lead_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(fecha), int(lead_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(f"Cursor inválido: {token!r}")
+
+def parse_fields(fields):
+    """Valida la proyección `fields=a,b,c`; None significa todas las columnas"""
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in selected if f not in LEAD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Columnas desconocidas: {', '.join(unknown)}")
+    return selected
+
+def _page_key(limit, cursor, columns, archived, version=None):
+    key = f"leads:page:{limit}:{cursor or ''}:{','.join(columns)}{':archived' if archived else ''}"
+    return key if version is None else f"{key}:v{version}"
+
+def _page_query(limit, cursor, columns):
+    """(sql, params, query_columns, before) de una página por cursor.
+
+    id y fecha_registro son necesarios para construir el siguiente cursor;
+    se añaden al final de query_columns para poder recortarlos de cada tupla.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    query_columns = columns + [c for c in ('id', 'fecha_registro') if c not in columns]
+    query = f"SELECT {', '.join(query_columns)} FROM leads"
+    params = []
+    if before:
+        fecha, lead_id = before
+        query += " WHERE fecha_registro < %s OR (fecha_registro = %s AND id < %s)"
+        params += [fecha, fecha, lead_id]
+    query += " ORDER BY fecha_registro DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+    return query, params, query_columns, before
+
+def _page_result(key, rows, query_columns, columns, limit, cursor):
+    """Convierte las limit + 1 filas leídas en (registros, next_cursor) y
+    guarda la página en la caché"""
+    id_index = query_columns.index('id')
+    fecha_index = query_columns.index('fecha_registro')
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last[fecha_index], last[id_index])
+    rows = rows[:limit]
+    tags = [f"lead:{row[id_index]}" for row in rows]
+    if not cursor:
+        tags.append('leads:head')
+    make = record_type(columns)
+    if len(query_columns) != len(columns):
+        width = len(columns)
+        rows = [make(*row[:width]) for row in rows]
+    else:
+        rows = [make(*row) for row in rows]
+    lead_cache.set(key, (rows, next_cursor), tags=tags)
+    logger.debug("Página de leads obtenida: %d registros", len(rows))
+    return rows, next_cursor
+
+@timed('get_leads_page')
+def get_leads_page(limit=50, cursor=None, fields=None, archived=False, version=None):
+    """SELECT - Obtener una página de leads (más recientes primero).
+
+    Con `archived` la página continúa en el archivo frío cuando se acaban
+    los leads de la tabla. Devuelve (leads, next_cursor); next_cursor es
+    None en la última página.
+
+    Con `version` (la de get_leads_version) solo se usa la caché de esa
+    versión: la caché es de cada worker y no se entera de las escrituras de
+    los demás, así que una respuesta con ETag no debe servir una página
+    cacheada antes de esa versión.
+    """
+    columns = list(fields or LEAD_COLUMNS)
+    query, params, query_columns, before = _page_query(limit, cursor, columns)
+    
+    key = _page_key(limit, cursor, columns, archived, version)
+    cached = _cached(key)
+    if cached is not MISSING:
+        return cached
+
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(query, params)
+                rows = cur.fetchall()
+                cur.close()
+            except Exception as e:
+                logger.error("Error obteniendo página de leads: %s", e)
+                return [], None
+        else:
+            return [], None
+
+    if archived:
+        rows = _merge_archived_page(rows, query_columns, before, limit + 1)
+    return _page_result(key, rows, query_columns, columns, limit, cursor)
+
+def _merge_archived_page(rows, query_columns, before, limit):
+    """Mezcla una página de la tabla (tuplas de query_columns) con la
+    siguiente del archivo frío, por (fecha_registro, id) descendente"""
+    archived = lead_archive.page(before, limit)
+    if not archived:
+        return rows
+    id_index = query_columns.index('id')
+    fecha_index = query_columns.index('fecha_registro')
+    merged = heapq.merge(
+        rows, map(attrgetter(*query_columns), archived),
+        key=lambda row: (row[fecha_index], row[id_index]), reverse=True
+    )
+    page, seen = [], set()
+    for row in merged:
+        # Un lead archivado cuyo DELETE aún no se confirmó aparece dos veces
+        if row[id_index] not in seen:
+            seen.add(row[id_index])
+            page.append(row)
+            if len(page) == limit:
+                break
+    return page
+
+# Exportación en streaming con cursor del lado del servidor
+def iter_leads(since=None, fields=None, batch_size=1000, after_id=None, archived=False):
+    """Genera los leads uno a uno sin cargar la tabla en memoria.
+
+    En MySQL usa un cursor sin buffer (SSCursor) y en PostgreSQL un cursor
+    con nombre; la conexión queda ocupada hasta agotar o cerrar el generador.
+    Con `after_id` recorre por id los leads posteriores a ese id. Con
+    `archived` empieza por los leads del archivo frío, que son todos
+    anteriores a los de la tabla.
+    """
+    columns = list(fields or LEAD_COLUMNS)
+    if archived and after_id is None:
+        yield from map(_projection(columns), lead_archive.iter_leads(since))
+    query = f"SELECT {', '.join(columns)} FROM leads"
+    params = []
+    if after_id is not None:
+        query += " WHERE id > %s ORDER BY id"
+        params.append(after_id)
+    else:
+        if since:
+            query += " WHERE fecha_registro >= %s"
+            params.append(since)
+        query += " ORDER BY fecha_registro, id"
+
+    with db_connection(read_only=True) as conn:
+        if not conn:
+            return
+        cur = dialect.stream_cursor(conn, batch_size)
+        make = record_type(columns)
+        # Si el cliente corta la descarga, db_connection descarta la conexión
+        # en lugar de leer el resto del resultado para poder reutilizarla
+        cur.execute(query, params)
+        total = 0
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            total += len(rows)
+            for row in rows:
+                yield make(*row)
+        cur.close()
+        logger.info("Leads exportados: %d registros", total)
+
+# Importación masiva por lotes
+IMPORT_ALIASES = {
+    'nombre': 'nombre_completo',
+    'correo': 'correo_electronico',
+    'interes': 'interes_servicio',
+}
+IMPORT_MAX_LENGTHS = {
+    'nombre_completo': 100,
+    'correo_electronico': 100,
+    'telefono': 20,
+    'interes_servicio': 100,
+}
+
+def _clean_import_row(row):
+    """Normaliza una fila importada; devuelve None si no es válida"""
+    if not isinstance(row, dict):
+        return None
+    lead = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        column = IMPORT_ALIASES.get(key.strip(), key.strip())
+        if column in IMPORT_MAX_LENGTHS:
+            lead[column] = (str(value).strip() if value is not None else '')
+    for column, max_length in IMPORT_MAX_LENGTHS.items():
+        value = lead.get(column, '')
+        if len(value) > max_length:
+            return None
+        if not value and column != 'telefono':
+            return None
+    return (lead['nombre_completo'], lead['correo_electronico'],
+            lead.get('telefono') or None, lead['interes_servicio'])
+
+def _insert_batch(conn, batch):
+    """Inserta un lote en una sola sentencia; devuelve los leads insertados"""
+    cur = conn.cursor()
+    if not dialect.returning:
+        # SELECT ... FOR UPDATE sobre el índice único bloquea también los
+        # huecos, así que ningún otro proceso puede insertar estos correos
+        # antes del commit y sabemos exactamente qué filas se insertarán
+        emails = list({row[1] for row in batch})
+        cur.execute(
+            f"SELECT correo_electronico FROM leads WHERE correo_electronico IN ({', '.join(['%s'] * len(emails))}) FOR UPDATE",
+            emails
+        )
+        taken = {row[0] for row in cur.fetchall()}
+        inserted = []
+        for row in batch:
+            if row[1] not in taken:
+                taken.add(row[1])
+                inserted.append(row)
+        if inserted:
+            placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(inserted))
             cur.execute(
-                "INSERT INTO leads (nombre_completo, correo_electronico, telefono, interes_servicio) VALUES (%s, %s, %s, %s)",
-                (nombre, correo, telefono, interes)
+                f"{_LEAD_INSERT.replace('INSERT', 'INSERT IGNORE', 1)} VALUES {placeholders}",
+                [value for row in inserted for value in row]
             )
-            conn.commit()
-            cur.close()
-            conn.close()
-            print(f"✅ Lead creado: {nombre} - {correo}")
-            return True
-        except db_module.IntegrityError:
-            print(f"❌ Error: El correo {correo} ya existe")
-            return False
-        except Exception as e:
-            print(f"❌ Error creando lead: {e}")
-            return False
-    return False
+    else:
+        placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+        cur.execute(
+            f"{_LEAD_INSERT} VALUES {placeholders} "
+            "ON CONFLICT (correo_electronico) DO NOTHING RETURNING correo_electronico",
+            [value for row in batch for value in row]
+        )
+        returned = {row[0] for row in cur.fetchall()}
+        inserted = []
+        for row in batch:
+            if row[1] in returned:
+                returned.discard(row[1])
+                inserted.append(row)
 
-def get_all_leads():
-    """SELECT - Obtener todos los leads"""
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM leads ORDER BY fecha_registro DESC")
-            
-            if DB_ENGINE == 'mysql':
-                leads = cur.fetchall()
+    _bump_counters_for(cur, inserted)
+    if inserted:
+        _bump_version(cur)
+    conn.commit()
+    cur.close()
+    for row in inserted:
+        _remember_email(row[1])
+    return inserted
+
+def parse_lead(data):
+    """Valida un lead de la API JSON (mismas columnas, alias y longitudes que
+    la importación); devuelve (nombre, correo, telefono, interes)"""
+    lead = _clean_import_row(data)
+    if lead is None:
+        raise ValueError(
+            "nombre_completo, correo_electronico e interes_servicio son obligatorios "
+            f"(longitudes máximas: {', '.join(f'{k} {v}' for k, v in IMPORT_MAX_LENGTHS.items())})"
+        )
+    return lead
+
+@timed('import_leads')
+def import_leads(rows, batch_size=1000):
+    """INSERT masivo - Importa leads en lotes, una transacción por lote.
+
+    Los correos duplicados se omiten en la base de datos (INSERT IGNORE /
+    ON CONFLICT DO NOTHING). Devuelve los conteos por lote y los totales.
+    Si `rows` lanza ValueError a mitad de la lectura (archivo dañado), se
+    guardan las filas leídas hasta ahí y el resultado incluye "error".
+    """
+    batches = []
+
+    def flush(batch, rejected):
+        result = {"batch": len(batches) + 1, "inserted": 0, "duplicates": 0, "rejected": rejected}
+        if batch:
+            with db_connection() as conn:
+                if conn:
+                    try:
+                        inserted = len(_insert_batch(conn, batch))
+                        if inserted:
+                            _invalidate_leads()
+                            _mark_search_dirty()
+                            lead_events.publish('bulk', {'created': inserted})
+                        result["inserted"] = inserted
+                        result["duplicates"] = len(batch) - inserted
+                    except Exception as e:
+                        logger.error("Error importando lote %d: %s", result['batch'], e)
+                        conn.rollback()
+                        result["rejected"] += len(batch)
+                        result["error"] = str(e)
+                else:
+                    result["rejected"] += len(batch)
+                    result["error"] = "Sin conexión a la base de datos"
+        batches.append(result)
+
+    batch = []
+    rejected = 0
+    error = None
+    try:
+        for row in rows:
+            lead = _clean_import_row(row)
+            if lead is None:
+                rejected += 1
             else:
-                leads = cur.fetchall()
-                # Convertir a formato similar para consistencia
-                leads = [dict(zip([desc[0] for desc in cur.description], row)) for row in leads]
-            
-            cur.close()
-            conn.close()
-            print(f"✅ Leads obtenidos: {len(leads)} registros")
-            return leads
+                batch.append(lead)
+            if len(batch) + rejected >= batch_size:
+                flush(batch, rejected)
+                batch = []
+                rejected = 0
+    except ValueError as e:
+        # Los lotes anteriores ya están confirmados: se devuelven sus conteos
+        error = str(e)
+        logger.warning("Importación interrumpida por un archivo inválido: %s", e)
+    if batch or rejected:
+        flush(batch, rejected)
+
+    totals = {
+        key: sum(b[key] for b in batches)
+        for key in ("inserted", "duplicates", "rejected")
+    }
+    logger.info("Importación completada: %d insertados, %d duplicados, %d rechazados",
+                totals['inserted'], totals['duplicates'], totals['rejected'])
+    result = {"batches": batches, "totals": totals}
+    if error is not None:
+        result["error"] = error
+    return result
+
+@timed('create_leads_batch')
+def create_leads_batch(leads):
+    """INSERT agrupado - Crea varios leads en una transacción.
+
+    Recibe tuplas (nombre, correo, telefono, interes) y devuelve una lista de
+    booleanos con el resultado de cada una (False = correo duplicado). Un
+    error de la base de datos se propaga: la cola de ingesta lo entrega en el
+    Future de cada lead y el formulario no lo confunde con un duplicado.
+    """
+    results = [False] * len(leads)
+    if not leads:
+        return results
+
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Sin conexión a la base de datos")
+        try:
+            # Correos ya registrados o repetidos dentro del mismo lote; con el
+            # filtro solo se buscan los que pueden estar registrados
+            emails = list({lead[1] for lead in leads})
+            email_filter = _email_filter_ready()
+            if email_filter is not None:
+                emails = [correo for correo in emails if _email_maybe_taken(email_filter, correo)]
+            taken = set()
+            if emails:
+                cur = conn.cursor()
+                cur.execute(
+                    f"SELECT correo_electronico FROM leads WHERE correo_electronico IN ({', '.join(['%s'] * len(emails))})",
+                    emails
+                )
+                taken = {row[0] for row in cur.fetchall()}
+                cur.close()
+                if email_filter is not None:
+                    _email_counts["duplicates"] += len(taken)
+                    _email_counts["false_positives"] += len(emails) - len(taken)
+
+            pending = []
+            for index, lead in enumerate(leads):
+                if lead[1] not in taken:
+                    taken.add(lead[1])
+                    pending.append(index)
+
+            if pending:
+                try:
+                    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(pending))
+                    cur = conn.cursor()
+                    cur.execute(
+                        f"{_LEAD_INSERT} VALUES {placeholders}",
+                        [value for index in pending for value in leads[index]]
+                    )
+                    _bump_counters_for(cur, [leads[index] for index in pending])
+                    _bump_version(cur)
+                    conn.commit()
+                    cur.close()
+                    for index in pending:
+                        results[index] = True
+                    _invalidate_leads()
+                    _mark_search_dirty()
+                except db_module.IntegrityError:
+                    # Otro proceso insertó alguno de los correos entre medias:
+                    # se resuelve fila a fila para dar un resultado exacto
+                    conn.rollback()
+                    cur = conn.cursor()
+                    for index in pending:
+                        try:
+                            dialect.execute(cur, INSERT_LEAD, leads[index])
+                            if dialect.returning:
+                                cur.fetchone()
+                            _bump_counters(cur, leads[index][3], 1, phones=_has_phone(leads[index][2]))
+                            _bump_version(cur)
+                            conn.commit()
+                            results[index] = True
+                        except db_module.IntegrityError:
+                            conn.rollback()
+                    cur.close()
+                    _invalidate_leads()
+                    _mark_search_dirty()
+                # Los que fallaron por IntegrityError también están ya en la tabla
+                for index in pending:
+                    _remember_email(leads[index][1])
+                _publish_created(conn, [leads[index] for index in pending if results[index]])
+
+            logger.debug("Lote de leads creado: %d de %d", sum(results), len(leads))
         except Exception as e:
-            print(f"❌ Error obteniendo leads: {e}")
-            return []
+            logger.error("Error creando lote de leads: %s", e)
+            raise
+    return results
 
-def update_lead(lead_id, nombre, correo, telefono, interes):
-    """UPDATE - Actualizar lead existente"""
-    conn = get_db_connection()
-    if conn:
+
+# Actualización y borrado en lote (sección 2.3/2.4 de sql_queries.sql): la
+# selección por ids y/o filtro se recorre por id en trozos de chunk_size
+# filas; cada trozo es una transacción con un SELECT ... FOR UPDATE (valores
+# anteriores para contadores, índices y filtro de correos) y un único
+# UPDATE/DELETE ... WHERE id IN (...). Un fallo deja aplicados los trozos ya
+# confirmados y se informa junto con sus conteos.
+BATCH_FILTERS = ('interes_servicio', 'desde', 'hasta', 'sin_telefono')
+BATCH_UPDATE_FIELDS = ('interes_servicio', 'telefono')
+
+def parse_batch_selection(ids=None, filters=None):
+    """Valida la selección de un lote: (ids ordenados o None, filtros).
+
+    Lanza ValueError si no es válida o si no selecciona nada (un lote sin
+    ids ni filtro afectaría a toda la tabla).
+    """
+    if ids is not None:
+        if not isinstance(ids, list) or not all(type(i) is int and i > 0 for i in ids):
+            raise ValueError("ids debe ser una lista de enteros positivos")
+        if len(ids) > config['default'].BATCH_MAX_IDS:
+            raise ValueError(f"Como máximo {config['default'].BATCH_MAX_IDS} ids por lote")
+        ids = sorted(set(ids))
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filter debe ser un objeto")
+    unknown = [key for key in filters if key not in BATCH_FILTERS]
+    if unknown:
+        raise ValueError(f"Filtros desconocidos: {', '.join(unknown)}")
+    parsed = {}
+    if filters.get('interes_servicio'):
+        parsed['interes_servicio'] = str(filters['interes_servicio'])
+    for key in ('desde', 'hasta'):
+        if filters.get(key):
+            try:
+                parsed[key] = date.fromisoformat(str(filters[key]))
+            except ValueError:
+                raise ValueError(f"{key} debe tener formato YYYY-MM-DD") from None
+    if filters.get('sin_telefono'):
+        parsed['sin_telefono'] = True
+    if not ids and not parsed:
+        raise ValueError("Indique ids o al menos un filtro")
+    return ids, parsed
+
+def parse_batch_changes(changes):
+    """Valida los campos a modificar en lote (interes_servicio, telefono)"""
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("set debe ser un objeto con los campos a modificar")
+    unknown = [key for key in changes if key not in BATCH_UPDATE_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos no modificables en lote: {', '.join(unknown)}")
+    parsed = {}
+    if 'interes_servicio' in changes:
+        value = str(changes['interes_servicio'] or '').strip()
+        if not value or len(value) > 100:
+            raise ValueError("interes_servicio no puede estar vacío ni superar 100 caracteres")
+        parsed['interes_servicio'] = value
+    if 'telefono' in changes:
+        value = str(changes['telefono'] or '').strip()
+        if len(value) > 20:
+            raise ValueError("telefono no puede superar 20 caracteres")
+        parsed['telefono'] = value
+    return parsed
+
+def _batch_where(filters):
+    where, params = [], []
+    if 'interes_servicio' in filters:
+        where.append("interes_servicio = %s")
+        params.append(filters['interes_servicio'])
+    if 'desde' in filters:
+        where.append("fecha_registro >= %s")
+        params.append(datetime.combine(filters['desde'], datetime.min.time()))
+    if 'hasta' in filters:
+        where.append("fecha_registro < %s")
+        params.append(datetime.combine(filters['hasta'] + timedelta(days=1), datetime.min.time()))
+    if filters.get('sin_telefono'):
+        where.append("(telefono IS NULL OR telefono = '')")
+    return where, params
+
+def _bump_counters_rows(cur, removed=(), added=()):
+    """Resta `removed` y suma `added` (leads) en contadores y agregados diarios,
+    con una sentencia por servicio y día en lugar de una por lead"""
+    totals = Counter()
+    phones = Counter()
+    for rows, sign in ((removed, -1), (added, 1)):
+        for lead in rows:
+            key = (lead.interes_servicio, _as_date(lead.fecha_registro))
+            totals[key] += sign
+            phones[key] += sign * _has_phone(lead.telefono)
+    # Por (servicio, día): el mismo orden de bloqueo en todas las escrituras
+    for (service, day), delta in sorted(totals.items()):
+        if delta or phones[(service, day)]:
+            _bump_counters(cur, service, delta, day, phones[(service, day)])
+
+def _count_batch(conn, ids, filters, changes=None):
+    """Conteos del modo dry_run: seleccionados, por servicio y los que cambiarían"""
+    where, params = _batch_where(filters)
+    # Sin cambios (borrado o archivo) cuenta todas: una condición booleana
+    # válida en todos los motores (PostgreSQL no acepta CASE WHEN 1)
+    changed_sql, changed_params = "1 = 1", []
+    if changes:
+        conditions = []
+        if 'interes_servicio' in changes:
+            conditions.append("interes_servicio <> %s")
+            changed_params.append(changes['interes_servicio'])
+        if 'telefono' in changes:
+            conditions.append("COALESCE(telefono, '') <> %s")
+            changed_params.append(changes['telefono'])
+        changed_sql = " OR ".join(conditions)
+    chunks = [ids[i:i + 1000] for i in range(0, len(ids), 1000)] if ids is not None else [None]
+    por_servicio = Counter()
+    affected = 0
+    cur = conn.cursor()
+    for chunk in chunks:
+        chunk_where, chunk_params = list(where), list(params)
+        if chunk is not None:
+            chunk_where.append(f"id IN ({', '.join(['%s'] * len(chunk))})")
+            chunk_params.extend(chunk)
+        cur.execute(f"""
+            SELECT interes_servicio, COUNT(*), SUM(CASE WHEN {changed_sql} THEN 1 ELSE 0 END)
+            FROM leads
+            WHERE {' AND '.join(chunk_where)}
+            GROUP BY interes_servicio
+        """, changed_params + chunk_params)
+        for service, count, changed in cur.fetchall():
+            por_servicio[service] += int(count)
+            affected += int(changed or 0)
+    cur.close()
+    return {
+        "dry_run": True,
+        "matched": sum(por_servicio.values()),
+        "affected": affected,
+        "por_servicio": dict(por_servicio.most_common()),
+    }
+
+def _run_batch(conn, ids, filters, chunk_size, apply):
+    """Recorre la selección por trozos; `apply(cur, leads)` modifica el trozo
+    y devuelve (filas afectadas, función a llamar tras el commit)"""
+    where, params = _batch_where(filters)
+    result = {"dry_run": False, "matched": 0, "affected": 0, "chunks": 0}
+    remaining = ids
+    last_id = 0
+    while True:
+        chunk_where, chunk_params = list(where), list(params)
+        if ids is not None:
+            chunk, remaining = remaining[:chunk_size], remaining[chunk_size:]
+            if not chunk:
+                break
+            chunk_where.append(f"id IN ({', '.join(['%s'] * len(chunk))})")
+            chunk_params.extend(chunk)
+        else:
+            chunk_where.append("id > %s")
+            chunk_params.append(last_id)
+        cur = conn.cursor()
         try:
-            cur = conn.cursor()
             cur.execute(
-                "UPDATE leads SET nombre_completo = %s, correo_electronico = %s, telefono = %s, interes_servicio = %s WHERE id = %s",
-                (nombre, correo, telefono, interes, lead_id)
+                f"{_LEAD_SELECT} WHERE {' AND '.join(chunk_where)} ORDER BY id LIMIT %s FOR UPDATE",
+                chunk_params + [chunk_size]
             )
+            leads = [Lead(*row) for row in cur.fetchall()]
+            if not leads:
+                conn.rollback()
+                if ids is None:
+                    break
+                continue
+            last_id = leads[-1].id
+            affected, after_commit = apply(cur, leads)
+            if affected:
+                _bump_version(cur, edit=True)
             conn.commit()
-            cur.close()
-            conn.close()
-            print(f"✅ Lead actualizado: ID {lead_id}")
-            return True
         except Exception as e:
-            print(f"❌ Error actualizando lead: {e}")
-            return False
-    return False
+            conn.rollback()
+            logger.error("Error en el trozo %d del lote: %s", result["chunks"] + 1, e)
+            result["error"] = str(e)
+            break
+        finally:
+            cur.close()
+        result["matched"] += len(leads)
+        result["affected"] += affected
+        result["chunks"] += 1
+        if affected:
+            _search_edited()
+            after_commit()
+    return result
 
-def delete_lead(lead_id):
-    """DELETE - Eliminar lead"""
-    conn = get_db_connection()
-    if conn:
-        try:
+@timed('batch_update_leads')
+def batch_update_leads(ids, filters, changes, dry_run=False, chunk_size=None):
+    """UPDATE en lote de interes_servicio y/o telefono (ver parse_batch_*).
+
+    Devuelve {"matched", "affected", ...} o None sin base de datos.
+    """
+    chunk_size = chunk_size or config['default'].BATCH_CHUNK_SIZE
+    assignments = ", ".join(f"{field} = %s" for field in changes)
+    values = list(changes.values())
+
+    def apply(cur, leads):
+        # Un teléfono NULL y uno vacío cuentan como iguales, como en dry_run
+        changed = [
+            (lead, lead._replace(**changes)) for lead in leads
+            if any((getattr(lead, field) or '') != value for field, value in changes.items())
+        ]
+        if not changed:
+            return 0, None
+        changed_ids = [old.id for old, _ in changed]
+        cur.execute(
+            f"UPDATE leads SET {assignments} WHERE id IN ({', '.join(['%s'] * len(changed_ids))})",
+            values + changed_ids
+        )
+        _bump_counters_rows(cur, removed=[old for old, _ in changed], added=[new for _, new in changed])
+
+        def after_commit():
+            _invalidate_leads(*changed_ids)
+            for _, new in changed:
+                _index_lead(new.id, new.nombre_completo, new.correo_electronico, new.telefono, new.interes_servicio)
+            lead_events.publish('bulk', {'updated': len(changed)})
+        return len(changed), after_commit
+
+    with db_connection() as conn:
+        if not conn:
+            return None
+        if dry_run:
+            return _count_batch(conn, ids, filters, changes)
+        result = _run_batch(conn, ids, filters, chunk_size, apply)
+    logger.info("Actualización en lote: %d de %d leads en %d trozos",
+                result["affected"], result["matched"], result["chunks"])
+    return result
+
+@timed('batch_delete_leads')
+def batch_delete_leads(ids, filters, dry_run=False, chunk_size=None):
+    """DELETE en lote por ids y/o filtro (ver parse_batch_selection).
+
+    Devuelve {"matched", "affected", ...} o None sin base de datos.
+    """
+    chunk_size = chunk_size or config['default'].BATCH_CHUNK_SIZE
+
+    def apply(cur, leads):
+        lead_ids = [lead.id for lead in leads]
+        cur.execute(f"DELETE FROM leads WHERE id IN ({', '.join(['%s'] * len(lead_ids))})", lead_ids)
+        _bump_counters_rows(cur, removed=leads)
+
+        def after_commit():
+            _invalidate_leads(*lead_ids)
+            for lead in leads:
+                _unindex_lead(lead.id)
+                _forget_email(lead.correo_electronico)
+            lead_events.publish('bulk', {'deleted': len(leads)})
+        return len(leads), after_commit
+
+    with db_connection() as conn:
+        if not conn:
+            return None
+        if dry_run:
+            return _count_batch(conn, ids, filters)
+        result = _run_batch(conn, ids, filters, chunk_size, apply)
+    logger.info("Borrado en lote: %d leads en %d trozos", result["affected"], result["chunks"])
+    return result
+
+
+# Archivo frío (database/archive.py): los leads antiguos salen de la tabla
+# por trozos, como en el borrado en lote. Cada trozo se añade a los ficheros
+# del archivo antes del DELETE y el commit; si el commit falla, el trozo
+# sigue en la tabla y la siguiente pasada solo lo borra (sus ids ya están en
+# el archivo). lead_counters y lead_rollups no cambian: estadísticas e
+# informes siguen contando los leads archivados. El correo sale del filtro
+# y del índice UNIQUE, así que puede volver a registrarse como lead nuevo.
+lead_archive = LeadArchive(
+    config['default'].ARCHIVE_DIR,
+    compress_level=config['default'].ARCHIVE_COMPRESS_LEVEL,
+    block_cache=config['default'].ARCHIVE_BLOCK_CACHE
+)
+
+def _projection(columns):
+    """Convierte un Lead completo en el registro de `columns`"""
+    if tuple(columns) == LEAD_COLUMNS:
+        return lambda lead: lead
+    make = record_type(columns)
+    getter = attrgetter(*columns)
+    if len(columns) == 1:
+        return lambda lead: make(getter(lead))
+    return lambda lead: make(*getter(lead))
+
+@timed('archive_leads')
+def archive_leads(antes_de=None, dry_run=False, chunk_size=None):
+    """Mueve al archivo frío los leads registrados antes de `antes_de`
+    (por defecto, hace ARCHIVE_AFTER_DAYS días).
+
+    Devuelve {"matched", "affected", "chunks", "antes_de"} o None sin base
+    de datos; con dry_run solo cuenta, por servicio.
+    """
+    settings = config['default']
+    antes_de = antes_de or date.today() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    filters = {'hasta': antes_de - timedelta(days=1)}
+    chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+
+    def apply(cur, leads):
+        lead_archive.append([lead for lead in leads if not lead_archive.contains(lead.id)])
+        lead_ids = [lead.id for lead in leads]
+        cur.execute(f"DELETE FROM leads WHERE id IN ({', '.join(['%s'] * len(lead_ids))})", lead_ids)
+
+        def after_commit():
+            _invalidate_leads(*lead_ids)
+            for lead in leads:
+                _unindex_lead(lead.id)
+                _forget_email(lead.correo_electronico)
+            lead_events.publish('bulk', {'archived': len(leads)})
+        return len(leads), after_commit
+
+    with db_connection() as conn:
+        if not conn:
+            return None
+        if dry_run:
+            result = _count_batch(conn, None, filters)
+        else:
             cur = conn.cursor()
-            cur.execute("DELETE FROM leads WHERE id = %s", (lead_id,))
-            conn.commit()
-            cur.close()
-            conn.close()
-            print(f"✅ Lead eliminado: ID {lead_id}")
-            return True
+            dialect.lock(cur, 'leadtracker_archive')
+            try:
+                result = _run_batch(conn, None, filters, chunk_size, apply)
+            finally:
+                dialect.unlock(cur, 'leadtracker_archive')
+                conn.commit()
+                cur.close()
+    result["antes_de"] = antes_de.isoformat()
+    logger.info("Archivo: %d leads anteriores a %s en %d trozos",
+                result.get("affected", result["matched"]), antes_de, result.get("chunks", 0))
+    return result
+
+@timed('get_archived_lead')
+def get_archived_lead(lead_id):
+    """Lead del archivo frío por id, o None"""
+    try:
+        return lead_archive.get(lead_id)
+    except Exception as e:
+        logger.error("Error leyendo el archivo de leads: %s", e)
+        return None
+
+@timed('find_leads_by_email')
+def find_leads_by_email(correo, archived=True):
+    """(lead de la tabla o None, leads del archivo frío con ese correo del
+    más reciente al más antiguo; vacío sin `archived`)"""
+    lead = None
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                dialect.execute(cur, SELECT_LEAD_BY_EMAIL, (correo,))
+                row = cur.fetchone()
+                lead = Lead(*row) if row else None
+                cur.close()
+            except Exception as e:
+                logger.error("Error buscando el correo: %s", e)
+    found = []
+    if archived:
+        try:
+            found = lead_archive.find_email(correo)
         except Exception as e:
-            print(f"❌ Error eliminando lead: {e}")
-            return False
-    return False
+            logger.error("Error leyendo el archivo de leads: %s", e)
+    return lead, found
+
+def get_archive_stats():
+    """Meses, filas y tamaño (comprimido y sin comprimir) del archivo frío"""
+    return lead_archive.stats()
+
+
+# Búsqueda de leads por fragmentos de nombre, correo o teléfono
+SEARCH_COLUMNS = ('id', 'nombre_completo', 'correo_electronico', 'telefono', 'interes_servicio')
+
+def _search_db(query, limit):
+    """Búsqueda en la base de datos usando los índices de texto del motor"""
+    sql, params = dialect.search_query(SEARCH_COLUMNS, query, limit)
+    with db_connection(read_only=True) as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                make = record_type(SEARCH_COLUMNS + ('score',))
+                rows = [make(*row) for row in cur.fetchall()]
+                cur.close()
+                for row in rows:
+                    row.score = float(row.score)
+                return rows
+            except Exception as e:
+                logger.error("Error buscando leads: %s", e)
+    return []
 
-def get_lead_by_id(lead_id):
-    """Obtener lead por ID"""
-    conn = get_db_connection()
-    if conn:
+# Índice n-grama en memoria (SEARCH_BACKEND=memory). Se construye en la primera
+# búsqueda y luego se mantiene con las escrituras de este proceso. Cada
+# SEARCH_INDEX_REFRESH segundos incorpora los leads insertados en lote o por
+# otros procesos leyendo los ids posteriores al último indexado, y se
+# reconstruye si la versión 'lead_edits' avanzó más que las modificaciones y
+# borrados de este proceso (otro worker cambió o borró leads ya indexados).
+search_index = NgramIndex() if config['default'].SEARCH_BACKEND == 'memory' else None
+_search_lock = threading.Lock()
+_search_state = {"loaded": False, "dirty": False, "synced_at": 0.0,
+                 "edits": None, "own_edits": 0, "rebuilding": False}
+
+def _index_lead(lead_id, nombre, correo, telefono, interes):
+    if search_index is not None and _search_state["loaded"]:
+        search_index.add({
+            'id': lead_id,
+            'nombre_completo': nombre,
+            'correo_electronico': correo,
+            'telefono': telefono,
+            'interes_servicio': interes,
+        })
+
+def _unindex_lead(lead_id):
+    if search_index is not None and _search_state["loaded"]:
+        search_index.remove(lead_id)
+
+def _mark_search_dirty():
+    _search_state["dirty"] = True
+
+def _search_edited():
+    """Una modificación o borrado confirmado por este proceso (un incremento
+    de 'lead_edits') que se aplica al índice directamente"""
+    # Durante una reconstrucción no se cuenta: la fila leída puede ser
+    # anterior al cambio y la siguiente sincronización vuelve a reconstruir
+    if search_index is not None and not _search_state["rebuilding"]:
+        _search_state["own_edits"] += 1
+
+def _sync_search_index():
+    """Carga el índice completo la primera vez y después solo los ids nuevos;
+    lo reconstruye si otro proceso modificó o borró leads"""
+    refresh = config['default'].SEARCH_INDEX_REFRESH
+    state = _search_state
+    if state["loaded"] and not state["dirty"] and time.monotonic() - state["synced_at"] < refresh:
+        return
+    with _search_lock:
+        # Primero las escrituras propias y después la versión: un cambio
+        # propio que confirme entre medias solo provoca una reconstrucción de más
+        own = state["own_edits"]
+        version = _read_version('lead_edits')
+        edits = version[0] if version else None
+        rebuild = not state["loaded"] or (
+            edits is not None and state["edits"] is not None and edits > state["edits"] + own
+        )
+        state["own_edits"] -= own
+        state["edits"] = edits
+        state["dirty"] = False
+        if rebuild:
+            state["rebuilding"] = True
+            search_index.clear()
         try:
+            count = 0
+            for lead in iter_leads(fields=SEARCH_COLUMNS, after_id=search_index.max_id):
+                search_index.add(lead)
+                count += 1
+        finally:
+            state["rebuilding"] = False
+        if rebuild:
+            logger.info("Índice de búsqueda construido: %d leads", count)
+        state["loaded"] = True
+        state["synced_at"] = time.monotonic()
+
+@timed('search_leads')
+def search_leads(query, limit=10, backend=None):
+    """Busca leads por fragmentos de nombre, correo o teléfono, por relevancia"""
+    query = (query or '').strip()
+    if len(query) < NgramIndex.MIN_QUERY:
+        return []
+    backend = backend or config['default'].SEARCH_BACKEND
+    if backend == 'memory' and search_index is not None:
+        _sync_search_index()
+        return search_index.search(query, limit)
+    return _search_db(query, limit)
+
+# Filtro de cuckoo sobre correo_electronico para /add_lead. "No está" permite
+# insertar sin comprobar; "puede estar" se confirma con una búsqueda por el
+# índice UNIQUE y responde duplicado sin intentar el INSERT. Cada proceso lo
+# construye en segundo plano en su primer uso (hasta entonces no se usa) y
+# las escrituras lo mantienen. Las altas de otros workers no se ven aquí: su
+# correo llega como IntegrityError, igual que sin filtro, y se añade entonces.
+_email_filter = None
+_email_building = {"pid": None, "filter": None}
+_email_filter_lock = threading.Lock()
+_email_counts = Counter()
+
+EMAIL_FILTER_MAX_LOAD = 0.9
+
+def _email_filter_ready():
+    """Filtro de este proceso, o None si está desactivado o construyéndose"""
+    if not config['default'].EMAIL_FILTER:
+        return None
+    current = _email_filter
+    if current is None or current.saturated or current.load_factor() > EMAIL_FILTER_MAX_LOAD:
+        _start_email_filter_build()
+    if current is None or current.saturated:
+        return None
+    return current
+
+def _start_email_filter_build():
+    with _email_filter_lock:
+        if _email_building["pid"] == os.getpid():
+            return
+        _email_building["pid"] = os.getpid()
+    threading.Thread(target=_build_email_filter, name="email-filter", daemon=True).start()
+
+def _build_email_filter():
+    """Construye el filtro en una pasada en streaming por los correos"""
+    global _email_filter
+    start = time.perf_counter()
+    try:
+        # Capacidad para el doble de los leads actuales (lead_counters evita
+        # un COUNT(*) sobre la tabla)
+        with db_connection(read_only=True) as conn:
+            if not conn:
+                return
             cur = conn.cursor()
-            cur.execute("SELECT * FROM leads WHERE id = %s", (lead_id,))
-            
-            if DB_ENGINE == 'mysql':
-                lead = cur.fetchone()
-            else:
-                row = cur.fetchone()
-                lead = dict(zip([desc[0] for desc in cur.description], row)) if row else None
-            
+            cur.execute("SELECT COALESCE(SUM(total), 0) FROM lead_counters")
+            total = int(cur.fetchone()[0])
             cur.close()
-            conn.close()
-            return lead
-        except Exception as e:
-            print(f"❌ Error obteniendo lead: {e}")
-            return None
\ No newline at end of file
+        capacity = max(2 * total, config['default'].EMAIL_FILTER_CAPACITY)
+        if _email_filter is not None:
+            capacity = max(capacity, 2 * _email_filter.capacity)
+        building = CuckooFilter(capacity)
+        # Las escrituras durante la construcción también llegan al filtro nuevo
+        _email_building["filter"] = building
+        for lead in iter_leads(fields=['correo_electronico']):
+            building.add(email_key(lead.correo_electronico))
+        if not building.saturated:
+            _email_filter = building
+            logger.info("Filtro de correos construido: %d correos, %d KiB en %.2f s",
+                        building.count, building.memory_bytes() // 1024, time.perf_counter() - start)
+    except Exception as e:
+        logger.error("Error construyendo el filtro de correos: %s", e)
+    finally:
+        _email_building["filter"] = None
+        _email_building["pid"] = None
+
+def _email_filters():
+    # El filtro en uso y, si hay una reconstrucción en curso, el nuevo
+    filters = [_email_filter, _email_building["filter"]]
+    return [f for f in filters if f is not None]
+
+def _remember_email(correo):
+    key = email_key(correo)
+    for email_filter in _email_filters():
+        email_filter.add(key)
+
+def _forget_email(correo):
+    key = email_key(correo)
+    for email_filter in _email_filters():
+        email_filter.remove(key)
+
+def _email_maybe_taken(email_filter, correo):
+    """Consulta el filtro y cuenta la respuesta para las estadísticas"""
+    if email_filter.might_contain(email_key(correo)):
+        _email_counts["maybe"] += 1
+        return True
+    _email_counts["absent"] += 1
+    return False
+
+def get_email_filter_stats():
+    """Memoria, ocupación y tasa de falsos positivos (teórica y observada)"""
+    counts = dict(_email_counts)
+    absent = counts.get("absent", 0)
+    false_positives = counts.get("false_positives", 0)
+    stats = {
+        "enabled": config['default'].EMAIL_FILTER,
+        "ready": _email_filter is not None,
+        "building": _email_building["pid"] == os.getpid(),
+        "absent": absent,
+        "maybe": counts.get("maybe", 0),
+        "duplicates": counts.get("duplicates", 0),
+        "false_positives": false_positives,
+        # Entre los correos nuevos consultados, los que el filtro dio por posibles
+        "observed_fp_rate": round(false_positives / (absent + false_positives), 6)
+                            if absent + false_positives else None,
+    }
+    if _email_filter is not None:
+        stats.update(_email_filter.stats())
+    return stats
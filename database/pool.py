@@ -0,0 +1,213 @@
+# database/pool.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo una conexión del pool dentro del tiempo de espera"""
+
+
+class ConnectionPool:
+    """Pool de conexiones acotado y thread-safe, independiente del motor.
+
+    `creator` abre una conexión nueva (o devuelve None si falla) y `validator`
+    comprueba que una conexión reutilizada sigue viva antes de entregarla.
+    """
+
+    def __init__(self, creator, validator=None, min_size=1, max_size=10,
+                 timeout=30, recycle=3600, idle_timeout=300):
+        self._creator = creator
+        self._validator = validator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()      # (conn, creada_en, ultimo_uso)
+        self._born = {}           # id(conn) -> creada_en de las prestadas
+        self._size = 0            # conexiones abiertas (libres + prestadas)
+
+        self.created = 0
+        self.recycled = 0
+        self.waiting = 0
+        self.timeouts = 0
+
+    # ------------------------------------------------------------------
+    # Préstamo y devolución
+    # ------------------------------------------------------------------
+    def acquire(self, timeout=None):
+        """Presta una conexión validada; abre una nueva si hay cupo"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                self._prune_idle()
+                if self._idle:
+                    conn, born, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"Sin conexiones libres tras {timeout}s (máximo {self.max_size})"
+                    )
+                self.waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+        # Abrir/validar fuera del lock para no bloquear a otros hilos
+        if conn is not None:
+            if self._expired(born) or not self._is_valid(conn):
+                self._close(conn)
+                with self._cond:
+                    self.recycled += 1
+                conn = None
+        if conn is None:
+            conn, born = self._open()
+            if conn is None:
+                return None
+
+        with self._cond:
+            self._born[id(conn)] = born
+        return conn
+
+    def release(self, conn, discard=False):
+        """Devuelve una conexión al pool (o la cierra si está rota)"""
+        if conn is None:
+            return
+        with self._cond:
+            born = self._born.pop(id(conn), None)
+        if born is None:
+            # No pertenece a este pool
+            self._close(conn)
+            return
+
+        if not discard:
+            try:
+                # Cerrar cualquier transacción abierta antes de reutilizarla
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or self._expired(born):
+                if not discard:
+                    self.recycled += 1
+                self._size -= 1
+            else:
+                self._idle.append((conn, born, time.monotonic()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager que presta una conexión y la devuelve al salir"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+    def fill(self):
+        """Abre conexiones hasta llegar a min_size"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn, born = self._open()
+            if conn is None:
+                return
+            with self._cond:
+                self._idle.append((conn, born, time.monotonic()))
+                self._cond.notify()
+
+    def close_all(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Estadísticas actuales del pool"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": self.waiting,
+                "created": self.created,
+                "recycled": self.recycled,
+                "timeouts": self.timeouts,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+    def _open(self):
+        try:
+            conn = self._creator()
+        except Exception:
+            conn = None
+        if conn is None:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return None, None
+        with self._cond:
+            self.created += 1
+        return conn, time.monotonic()
+
+    def _prune_idle(self):
+        """Cierra conexiones ociosas por encima de min_size (llamar con lock)"""
+        now = time.monotonic()
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][2] > self.idle_timeout):
+            conn, _, _ = self._idle.popleft()
+            self._size -= 1
+            self.recycled += 1
+            self._close(conn)
+
+    def _expired(self, born):
+        return self.recycle is not None and time.monotonic() - born > self.recycle
+
+    def _is_valid(self, conn):
+        if self._validator is None:
+            return True
+        try:
+            return self._validator(conn) is not False
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,97 @@
+# database/records.py
+"""Registros compactos para las filas de leads.
+
+Cada combinación de columnas tiene una clase con `__slots__` (sin __dict__
+por fila) y un __init__ posicional generado, de modo que una fila de la base
+de datos se convierte con `Tipo(*row)` sin reconstruir los nombres de columna.
+Los registros admiten además `lead['columna']`, `.get()`, `keys()` y
+`dict(lead)` para el código que trataba las filas como diccionarios.
+"""
+import threading
+
+LEAD_COLUMNS = ('id', 'nombre_completo', 'correo_electronico', 'telefono', 'interes_servicio', 'fecha_registro')
+
+_types = {}
+_types_lock = threading.Lock()
+
+
+class Record:
+    """Base de los registros; las subclases definen __slots__ y _fields"""
+
+    __slots__ = ()
+    _fields = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return [getattr(self, name) for name in self._fields]
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+    def _replace(self, **changes):
+        """Copia con algunos campos cambiados (como namedtuple._replace)"""
+        return type(self)(*[changes.get(name, getattr(self, name)) for name in self._fields])
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self._fields == other._fields and self.values() == other.values()
+        if isinstance(other, dict):
+            return self._asdict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        pairs = ', '.join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({pairs})"
+
+    def __reduce__(self):
+        # Las clases se generan en tiempo de ejecución: se serializan por columnas
+        return _make_record, (self._fields, tuple(self.values()))
+
+
+def record_type(columns):
+    """Clase de registro para `columns` (una por combinación, reutilizada)"""
+    columns = tuple(columns)
+    cls = _types.get(columns)
+    if cls is not None:
+        return cls
+    for name in columns:
+        if not name.isidentifier() or name.startswith('_'):
+            raise ValueError(f"Nombre de columna no válido: {name!r}")
+    # __init__ generado como en collections.namedtuple: asignar cada slot
+    # directamente es varias veces más rápido que recorrer las columnas
+    args = ', '.join(columns)
+    body = ''.join(f"    self.{name} = {name}\n" for name in columns) or "    pass\n"
+    namespace = {}
+    exec(f"def __init__(self, {args}):\n{body}", namespace)
+    name = 'Lead' if columns == LEAD_COLUMNS else 'LeadRow'
+    cls = type(name, (Record,), {
+        '__slots__': columns,
+        '_fields': columns,
+        '__init__': namespace['__init__'],
+        '__module__': __name__,
+    })
+    with _types_lock:
+        return _types.setdefault(columns, cls)
+
+
+def _make_record(columns, values):
+    return record_type(columns)(*values)
+
+
+Lead = record_type(LEAD_COLUMNS)
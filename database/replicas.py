@@ -0,0 +1,85 @@
+# database/replicas.py
+import itertools
+import threading
+
+from database.circuit import CircuitBreaker
+from database.pool import PoolTimeout
+
+
+class Replica:
+    """Réplica de lectura: su propio pool y su propio circuit breaker"""
+
+    def __init__(self, name, pool, breaker):
+        self.name = name
+        self.pool = pool
+        self.breaker = breaker
+
+    def stats(self):
+        return {"name": self.name, "breaker": self.breaker.stats(), "pool": self.pool.stats()}
+
+
+class RouteState:
+    """Enrutado de lecturas de una petición.
+
+    `primary` fuerza el primario (lectura de lo recién escrito); `replica`
+    fija la réplica elegida para que todas las lecturas de la petición (por
+    ejemplo la versión del ETag y la página) vean el mismo estado.
+    """
+
+    __slots__ = ('primary', 'replica', 'wrote')
+
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaSet:
+    """Round robin entre réplicas sanas.
+
+    Se saltan las réplicas con el breaker abierto y las que no dan conexión
+    a tiempo; si ninguna responde, acquire() devuelve (None, None) y la
+    lectura va al primario.
+    """
+
+    def __init__(self, replicas):
+        self.replicas = list(replicas)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def _order(self, state):
+        with self._lock:
+            start = next(self._counter) % len(self.replicas)
+        order = self.replicas[start:] + self.replicas[:start]
+        if state is not None and state.replica is not None:
+            # La réplica ya usada en esta petición va primero
+            order.sort(key=lambda replica: replica is not state.replica)
+        return order
+
+    def acquire(self, timeout=None, state=None):
+        """(réplica, conexión) o (None, None) si no hay ninguna disponible"""
+        for replica in self._order(state):
+            if replica.breaker.state == CircuitBreaker.OPEN:
+                continue
+            try:
+                conn = replica.pool.acquire(timeout)
+            except PoolTimeout:
+                continue
+            if conn is not None:
+                if state is not None:
+                    state.replica = replica
+                return replica, conn
+        return None, None
+
+    def healthy(self):
+        return sum(1 for replica in self.replicas if replica.breaker.state != CircuitBreaker.OPEN)
+
+    def stats(self):
+        return [replica.stats() for replica in self.replicas]
+
+    def close_all(self):
+        for replica in self.replicas:
+            replica.pool.close_all()
@@ -0,0 +1,126 @@
+# database/search.py
+import heapq
+import threading
+import unicodedata
+
+
+def normalize(text):
+    """Minúsculas y sin acentos, para que 'gonzalez' encuentre 'González'"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NgramIndex:
+    """Índice invertido de bigramas y trigramas en memoria para typeahead.
+
+    Cada lead se indexa por su nombre, correo y teléfono normalizados. Una
+    consulta intersecta las listas de sus n-gramas y luego verifica la
+    subcadena sobre los pocos candidatos que quedan.
+    """
+
+    MIN_QUERY = 2
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}       # id -> (nombre, correo, telefono, lead)
+        self._postings = {}   # n-grama -> {ids}
+        self.max_id = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, lead):
+        """Indexa (o reindexa) un lead con id, nombre, correo, teléfono"""
+        lead_id = lead['id']
+        fields = (
+            normalize(lead.get('nombre_completo')),
+            normalize(lead.get('correo_electronico')),
+            normalize(lead.get('telefono')),
+        )
+        with self._lock:
+            if lead_id in self._docs:
+                self._unindex(lead_id)
+            self._docs[lead_id] = fields + (lead,)
+            for gram in self._doc_grams(fields):
+                self._postings.setdefault(gram, set()).add(lead_id)
+            self.max_id = max(self.max_id, lead_id)
+
+    def remove(self, lead_id):
+        with self._lock:
+            if lead_id in self._docs:
+                self._unindex(lead_id)
+                del self._docs[lead_id]
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self.max_id = 0
+
+    def search(self, query, limit=10):
+        """Devuelve hasta `limit` leads ordenados por relevancia"""
+        q = normalize(query).strip()
+        if len(q) < self.MIN_QUERY:
+            return []
+        n = 3 if len(q) >= 3 else 2
+        with self._lock:
+            candidates = None
+            for gram in sorted(_grams(q, n), key=lambda g: len(self._postings.get(g, ()))):
+                ids = self._postings.get(gram)
+                if not ids:
+                    return []
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+            scored = []
+            for lead_id in candidates:
+                nombre, correo, telefono, lead = self._docs[lead_id]
+                score = self._score(q, nombre, correo, telefono)
+                if score:
+                    scored.append((score, -len(nombre), lead_id, lead))
+        best = heapq.nlargest(limit, scored)
+        return [dict(lead, score=score) for score, _, _, lead in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "grams": len(self._postings),
+                "postings": sum(len(ids) for ids in self._postings.values()),
+                "max_id": self.max_id,
+            }
+
+    @staticmethod
+    def _doc_grams(fields):
+        grams = set()
+        for text in fields:
+            grams |= _grams(text, 2)
+            grams |= _grams(text, 3)
+        return grams
+
+    def _unindex(self, lead_id):
+        for gram in self._doc_grams(self._docs[lead_id][:3]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(lead_id)
+                if not ids:
+                    del self._postings[gram]
+
+    @staticmethod
+    def _score(q, nombre, correo, telefono):
+        """Prefijo del nombre > prefijo de una palabra/correo/teléfono > subcadena"""
+        if nombre.startswith(q):
+            return 4
+        if any(word.startswith(q) for word in nombre.split()):
+            return 3
+        if correo.startswith(q) or telefono.startswith(q):
+            return 2
+        if q in nombre or q in correo or q in telefono:
+            return 1
+        return 0
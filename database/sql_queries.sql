@@ -22,6 +22,30 @@ CREATE TABLE IF NOT EXISTS leads (
     fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Contadores por servicio y mes (los mantiene la aplicación en cada escritura)
+CREATE TABLE IF NOT EXISTS lead_counters (
+    interes_servicio VARCHAR(100) NOT NULL,
+    mes DATE NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (interes_servicio, mes)
+);
+
+-- Versión de los datos (ETag/Last-Modified); cada escritura la incrementa
+CREATE TABLE IF NOT EXISTS data_version (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL,
+    changed_at BIGINT NOT NULL
+);
+
+-- Leads por día y servicio para los informes (los mantiene la aplicación)
+CREATE TABLE IF NOT EXISTS lead_rollups (
+    dia DATE NOT NULL,
+    interes_servicio VARCHAR(100) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    con_telefono INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, interes_servicio)
+);
+
 -- =============================================
 -- 2. OPERACIONES CRUD (CREATE, READ, UPDATE, DELETE)
 -- =============================================
@@ -160,6 +184,17 @@ FROM leads
 GROUP BY YEAR(fecha_registro), MONTH(fecha_registro), interes_servicio
 ORDER BY año DESC, mes DESC, total_leads DESC;
 
+-- Lo mismo desde lead_rollups (lo que usa /api/reports/leads)
+SELECT 
+    YEAR(dia) as año,
+    MONTH(dia) as mes,
+    interes_servicio,
+    SUM(total) as total_leads
+FROM lead_rollups 
+GROUP BY YEAR(dia), MONTH(dia), interes_servicio
+HAVING SUM(total) > 0
+ORDER BY año DESC, mes DESC, total_leads DESC;
+
 -- Últimos 10 leads registrados
 SELECT * FROM leads 
 ORDER BY fecha_registro DESC 
@@ -199,6 +234,16 @@ CREATE INDEX idx_fecha_registro ON leads(fecha_registro);
 -- Agregar un índice para búsquedas por servicio
 CREATE INDEX idx_interes_servicio ON leads(interes_servicio);
 
+-- Índice compuesto para la paginación por cursor (más recientes primero)
+CREATE INDEX idx_leads_fecha_id ON leads(fecha_registro, id);
+
+-- Índice FULLTEXT con parser ngram para buscar fragmentos de nombre o correo
+ALTER TABLE leads ADD FULLTEXT INDEX ft_leads_nombre_correo (nombre_completo, correo_electronico) WITH PARSER ngram;
+
+-- Búsqueda usando el índice FULLTEXT en lugar de LIKE '%...%'
+SELECT * FROM leads
+WHERE MATCH(nombre_completo, correo_electronico) AGAINST ('"González"' IN BOOLEAN MODE);
+
 -- Ver la estructura de la tabla
 DESCRIBE leads;
 
@@ -0,0 +1,202 @@
+# database/sqlite_backend.py
+"""Motor SQLite embebido (DB_ENGINE=sqlite) para instancias edge/kiosko y CI.
+
+Envuelve sqlite3 para que el resto de la capa de datos use el mismo SQL que
+con PostgreSQL: placeholders `%s`, `SELECT ... FOR UPDATE` (SQLite serializa
+las escrituras, así que se omite) y cursores con nombre.
+"""
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",
+)
+
+# Fechas con el mismo formato que CURRENT_TIMESTAMP para que las comparaciones
+# de texto (paginación, since=) sean correctas
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()))
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+_FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def _translate(query):
+    query = _FOR_UPDATE.sub('', query)
+    return _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else '?', query)
+
+
+class SQLiteCursor:
+    """Cursor con la interfaz DB-API de psycopg2 (filas como tuplas)"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.itersize = 1000
+
+    def execute(self, query, params=None):
+        if params is None:
+            self._cursor.execute(_FOR_UPDATE.sub('', query))
+        else:
+            self._cursor.execute(_translate(query), list(params))
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self.itersize)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión sqlite3 con pragmas de rendimiento y cursores compatibles"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            # Sentencias preparadas reutilizadas por conexión (mismo texto SQL)
+            cached_statements=256
+        )
+        for pragma in PRAGMAS:
+            self._conn.execute(pragma)
+        self.closed = 0
+
+    def cursor(self, *args, name=None, **kwargs):
+        # `name` (cursor del lado del servidor en PostgreSQL) no aplica: los
+        # cursores de SQLite ya recorren el resultado bajo demanda
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self.closed = 1
+        self._conn.close()
+
+
+def connect(path):
+    return SQLiteConnection(path)
+
+
+class ThreadLocalPool:
+    """Una conexión SQLite por hilo, reutilizada entre peticiones.
+
+    Misma interfaz que ConnectionPool para que db_connection() no cambie.
+    """
+
+    def __init__(self, creator):
+        self._creator = creator
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = set()
+        self._in_use = 0
+        self.created = 0
+        self.recycled = 0
+
+    def acquire(self, timeout=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._creator()
+            if conn is None:
+                return None
+            self._local.conn = conn
+            with self._lock:
+                self._all.add(conn)
+                self.created += 1
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        if conn is None:
+            return
+        with self._lock:
+            self._in_use -= 1
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._local.conn = None
+            with self._lock:
+                self._all.discard(conn)
+                self.recycled += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def fill(self):
+        pass
+
+    def close_all(self):
+        with self._lock:
+            conns = list(self._all)
+            self._all.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._all),
+                "idle": len(self._all) - self._in_use,
+                "in_use": self._in_use,
+                "waiting": 0,
+                "created": self.created,
+                "recycled": self.recycled,
+                "timeouts": 0,
+                "min_size": 0,
+                "max_size": None,
+            }
@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+"""Servidor de producción: `gunicorn -c gunicorn.conf.py app:app`.
+
+Prefork con la aplicación precargada en el maestro (los workers comparten
+el código por copy-on-write). El maestro no conserva conexiones al hacer
+fork y cada worker abre las suyas (database.models._reset_after_fork).
+SIGTERM detiene los workers con gracia: dejan de aceptar conexiones y
+terminan las peticiones en curso durante SERVER_GRACEFUL_TIMEOUT segundos.
+"""
+import os
+
+# Antes de importar config: la aplicación usa ProductionConfig
+os.environ.setdefault('APP_ENV', 'production')
+
+# Alias: gunicorn interpreta `config` de este módulo como uno de sus ajustes
+from config import config as app_config
+
+settings = app_config['default']
+
+bind = settings.SERVER_BIND
+workers = settings.SERVER_WORKERS
+worker_class = settings.SERVER_WORKER_CLASS
+threads = settings.SERVER_THREADS
+preload_app = True
+
+# Reciclado de workers (fugas de memoria, fragmentación); el jitter evita
+# que todos se reinicien a la vez
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS_JITTER
+
+timeout = settings.SERVER_TIMEOUT
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = settings.SERVER_KEEPALIVE
+
+accesslog = '-'
+errorlog = '-'
+loglevel = settings.LOG_LEVEL.lower() if settings.LOG_LEVEL != 'OFF' else 'critical'
+
+
+def on_starting(server):
+    if settings.SECRET_KEY == 'dev-secret-key':
+        server.log.warning("SECRET_KEY no está configurada: las sesiones usan la clave de desarrollo")
+
+
+def pre_fork(server, worker):
+    # Con preload la app se importó aquí; si abrió conexiones (migraciones,
+    # comprobaciones) se cierran para que ningún worker las herede
+    from database.models import close_pools
+    close_pools()
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s iniciado (máximo %s peticiones)", worker.pid, max_requests)
+    # El feed de cambios no ocupa hilos del worker: lo sirve un bucle de
+    # eventos propio en SSE_BIND (todos los workers comparten el puerto)
+    import app as application
+    application.start_feed_server()
+
+
+def worker_exit(server, worker):
+    # Vaciar la cola de ingesta diferida y cerrar las conexiones del worker
+    import app as application
+    if application.ingest_queue is not None:
+        application.ingest_queue.stop(settings.SERVER_GRACEFUL_TIMEOUT)
+    if application.feed_server is not None:
+        application.feed_server.stop()
+    from database.models import close_pools
+    from database.async_models import close_pool
+    close_pools()
+    close_pool()
@@ -0,0 +1,206 @@
+# metrics.py
+import inspect
+import logging
+import random
+import threading
+import time
+from functools import wraps
+
+# Buckets de latencia en segundos (de 1 ms a 10 s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, en formato Prometheus"""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}   # etiquetas -> [conteos por bucket..., suma, total]
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labels + ('le',), values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels + ('le',), values + ('+Inf',))
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labels, values)
+                lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+# ----------------------------------------------------------------------
+# Métricas de la aplicación
+# ----------------------------------------------------------------------
+DB_QUERY_SECONDS = Histogram('leadtracker_db_query_seconds', 'Latencia de las operaciones de datos', ['operation'])
+DB_ROWS = Counter('leadtracker_db_rows_total', 'Filas devueltas o escritas por operación', ['operation'])
+DB_ERRORS = Counter('leadtracker_db_errors_total', 'Errores en operaciones de datos', ['operation'])
+DB_ACQUIRE_SECONDS = Histogram('leadtracker_db_connection_acquire_seconds', 'Tiempo para obtener una conexión del pool')
+HTTP_REQUEST_SECONDS = Histogram('leadtracker_http_request_seconds', 'Latencia de las peticiones HTTP', ['endpoint', 'method'])
+HTTP_REQUESTS = Counter('leadtracker_http_requests_total', 'Peticiones HTTP atendidas', ['endpoint', 'method', 'status'])
+
+REGISTRY = [DB_QUERY_SECONDS, DB_ROWS, DB_ERRORS, DB_ACQUIRE_SECONDS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS]
+
+
+def _count_rows(result):
+    """Filas de un resultado: listas, (lista, cursor), dicts o booleanos"""
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) or result is True:
+        return 1
+    return 0
+
+
+def timed(operation):
+    """Decorador: mide la latencia y las filas de una operación de datos
+    (en corrutinas, hasta que terminan)"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    DB_ERRORS.inc(operation)
+                    raise
+                finally:
+                    DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation)
+                rows = _count_rows(result)
+                if rows:
+                    DB_ROWS.inc(operation, amount=rows)
+                return result
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                DB_ERRORS.inc(operation)
+                raise
+            finally:
+                DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation)
+            rows = _count_rows(result)
+            if rows:
+                DB_ROWS.inc(operation, amount=rows)
+            return result
+        return wrapper
+    return decorator
+
+
+def render(gauges=()):
+    """Texto de exposición Prometheus; `gauges` son tuplas (nombre, ayuda, valor)"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, help, value in gauges:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# Logging por niveles con muestreo
+# ----------------------------------------------------------------------
+class SamplingFilter(logging.Filter):
+    """Deja pasar todos los WARNING/ERROR y solo una fracción de INFO/DEBUG"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class ErrorCountingHandler(logging.Handler):
+    """Cuenta los logs ERROR como errores de la operación (nombre de la función)"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record):
+        DB_ERRORS.inc(record.funcName)
+
+
+def configure_logging(level='INFO', sample_rate=1.0):
+    """Configura la salida del logger 'leadtracker'.
+
+    LOG_LEVEL=OFF silencia la salida pero los errores se siguen contando en
+    /metrics; LOG_SAMPLE_RATE reduce el volumen de INFO/DEBUG.
+    """
+    logger = logging.getLogger('leadtracker')
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.propagate = False
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handler.addFilter(SamplingFilter(sample_rate))
+    level = str(level).upper()
+    if level == 'OFF':
+        handler.setLevel(logging.CRITICAL + 1)
+        logger.setLevel(logging.ERROR)
+    else:
+        handler.setLevel(level)
+        logger.setLevel(min(logging.getLevelName(level), logging.ERROR))
+    logger.addHandler(handler)
+    return logger
@@ -0,0 +1,82 @@
+# serializers.py
+"""Formatos de respuesta de /api/leads.
+
+Además del JSON de siempre (una lista de objetos, con los nombres de las
+columnas repetidos en cada fila), /api/leads ofrece un formato columnar: los
+nombres de las columnas una sola vez y los valores de cada columna en un
+array. Se negocia con Accept o con `?format=`:
+
+- application/vnd.leadtracker.columnar+json (format=columnar)
+- application/msgpack (format=msgpack), el mismo documento en MessagePack
+
+fecha_registro sale en ISO 8601 (`dates=iso`) o en segundos epoch
+(`dates=epoch`); las fechas de la base de datos se interpretan como UTC,
+igual que en el JSON de siempre. Cada columna se extrae y convierte entera
+con map() sobre attrgetter y operaciones de datetime, sin ejecutar código
+Python por valor.
+
+orjson y msgpack son opcionales: sin orjson se usa json de la biblioteca
+estándar y sin msgpack ese formato no se ofrece.
+"""
+import json
+from datetime import datetime, timedelta
+from itertools import repeat
+from operator import attrgetter, sub
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.leadtracker.columnar+json'
+MSGPACK = 'application/msgpack'
+
+# format= de la query string -> tipo MIME
+FORMATS = {'json': JSON, 'columnar': COLUMNAR_JSON}
+if msgpack is not None:
+    FORMATS['msgpack'] = MSGPACK
+
+DATE_FORMATS = ('iso', 'epoch')
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def dumps_json(data):
+    """JSON compacto en bytes UTF-8; con orjson si está instalado"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def date_column(values, dates='iso'):
+    """Convierte una columna de datetime a ISO 8601 o a epoch (enteros)"""
+    if None in values:
+        return [date_column([value], dates)[0] if value is not None else None for value in values]
+    if dates == 'epoch':
+        if values and values[0].tzinfo is not None:
+            return list(map(int, map(datetime.timestamp, values)))
+        # (fecha - 1970-01-01) en segundos: la fecha naive se toma como UTC
+        return list(map(int, map(timedelta.total_seconds, map(sub, values, repeat(_EPOCH)))))
+    return list(map(datetime.isoformat, values))
+
+
+def columnar(rows, columns, dates='iso'):
+    """{"columns": [...], "values": [[...], ...]} con una lista por columna"""
+    values = [list(map(attrgetter(name), rows)) for name in columns]
+    for index, name in enumerate(columns):
+        if name == 'fecha_registro':
+            values[index] = date_column(values[index], dates)
+    return {"columns": list(columns), "values": values, "dates": dates}
+
+
+def encode(mimetype, document):
+    """Serializa un documento columnar en el formato negociado"""
+    if mimetype == MSGPACK:
+        return msgpack.packb(document, use_bin_type=True)
+    return dumps_json(document)
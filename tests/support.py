@@ -0,0 +1,25 @@
+# tests/support.py
+"""Entorno común de las pruebas: base SQLite y archivo frío en un directorio
+temporal, nunca los de .env. Cada módulo de pruebas lo importa antes que
+config, database o app.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+TMP = tempfile.mkdtemp(prefix='leadtracker-tests-')
+os.environ['DB_ENGINE'] = 'sqlite'
+os.environ['DB_PATH'] = os.path.join(TMP, 'leads.db')
+os.environ['DB_REPLICAS'] = ''
+os.environ['ARCHIVE_DIR'] = os.path.join(TMP, 'archive')
+os.environ['LOG_LEVEL'] = 'OFF'
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+
+
+def migrate():
+    """Crea el esquema (idempotente) y devuelve database.models"""
+    from database import models
+    from database.migrations import migrate as run_migrations
+    run_migrations()
+    return models
@@ -0,0 +1,108 @@
+# tests/test_archive.py
+"""Pruebas del archivo frío (database/archive.py): búsquedas, listados en
+orden de (fecha_registro, id) y bloques descomprimidos por página.
+
+    python -m unittest discover -s tests
+"""
+import json
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import support
+from database.archive import LeadArchive
+from database.records import Lead
+
+
+def _key(lead):
+    return lead.fecha_registro, lead.id
+
+
+def _leads(count, start=datetime(2024, 1, 1), seed=7):
+    """Leads de varios meses; ids y fechas no siempre en el mismo orden"""
+    rng = random.Random(seed)
+    leads = []
+    for lead_id in range(1, count + 1):
+        fecha = start + timedelta(hours=lead_id * 7 + rng.randint(-20, 20))
+        leads.append(Lead(lead_id, f'Lead {lead_id}', f'lead{lead_id}@example.com', '', 'Soporte', fecha))
+    return leads
+
+
+class LeadArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=support.TMP)
+        self.leads = _leads(600)
+        archive = LeadArchive(self.directory)
+        # Trozos como los de archive_leads: por id, con fechas que se solapan
+        for start in range(0, len(self.leads), 50):
+            archive.append(self.leads[start:start + 50])
+
+    def archive(self):
+        return LeadArchive(self.directory)
+
+    def pages(self, archive, limit):
+        before, seen = None, []
+        while True:
+            page = archive.page(before, limit)
+            if not page:
+                return seen
+            seen.extend(page)
+            before = _key(page[-1])
+
+    def test_lookup_by_id_and_email(self):
+        archive = self.archive()
+        self.assertEqual(archive.get(123), self.leads[122])
+        self.assertIsNone(archive.get(10_000))
+        self.assertTrue(archive.contains(600))
+        self.assertEqual(archive.find_email('LEAD42@example.com'), [self.leads[41]])
+
+    def test_iter_leads_in_key_order(self):
+        expected = sorted(self.leads, key=_key)
+        self.assertEqual(list(self.archive().iter_leads()), expected)
+        since = expected[250].fecha_registro
+        self.assertEqual(list(self.archive().iter_leads(since)), [lead for lead in expected if lead.fecha_registro >= since])
+
+    def test_pages_walk_everything_newest_first(self):
+        expected = sorted(self.leads, key=_key, reverse=True)
+        for limit in (1, 7, 50, 1000):
+            self.assertEqual(self.pages(self.archive(), limit), expected)
+
+    def test_page_decodes_only_the_blocks_it_needs(self):
+        decode_block = LeadArchive._decode_block
+        with mock.patch.object(LeadArchive, '_decode_block', autospec=True, side_effect=decode_block) as decode:
+            archive = self.archive()
+            first = archive.page(None, 20)
+            archive.page(_key(first[-1]), 20)
+            self.assertEqual(len(first), 20)
+            self.assertLessEqual(decode.call_count, 3)
+            self.assertGreater(archive.stats()['blocks'], 12)
+            list(archive.iter_leads())
+            self.assertEqual(decode.call_count, archive.stats()['blocks'])
+
+    def test_manifest_without_block_keys(self):
+        # Manifiestos anteriores: solo (posición, filas) por bloque
+        path = os.path.join(self.directory, 'manifest.json')
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        for info in manifest["months"].values():
+            info["blocks"] = [block[:2] for block in info["blocks"]]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        expected = sorted(self.leads, key=_key, reverse=True)
+        self.assertEqual(self.pages(self.archive(), 25), expected)
+
+    def test_new_blocks_are_visible(self):
+        archive = self.archive()
+        archive.page(None, 10)
+        extra = Lead(601, 'Nuevo', 'nuevo@example.com', '', 'Soporte', datetime(2023, 12, 31))
+        archive.append([extra])
+        self.assertEqual(archive.page(None, 1000)[-1], extra)
+        self.assertEqual(next(archive.iter_leads()), extra)
+
+
+if __name__ == '__main__':
+    unittest.main()
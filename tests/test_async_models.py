@@ -0,0 +1,192 @@
+# tests/test_async_models.py
+"""Pruebas de la capa de datos asíncrona (database/aio.py y
+database/async_models.py) contra SQLite con aiosqlite.
+
+    python -m unittest discover -s tests
+"""
+import asyncio
+import contextvars
+import threading
+import unittest
+
+import support
+from database.aio import AsyncConnection, AsyncPool, DatabaseLoop, _numbered
+from database.pool import PoolTimeout
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+
+def tearDownModule():
+    if aiosqlite is not None:
+        from database import async_models
+        async_models.close_pool()
+
+
+class FakeConnection(AsyncConnection):
+    closed = False
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncPoolTest(unittest.TestCase):
+
+    def test_reuses_and_bounds_connections(self):
+        async def scenario():
+            async def creator():
+                return FakeConnection()
+            pool = AsyncPool(creator, max_size=1, timeout=0.05)
+            first = await pool.acquire()
+            with self.assertRaises(PoolTimeout):
+                await pool.acquire()
+            await pool.release(first)
+            second = await pool.acquire()
+            self.assertIs(second, first)
+            await pool.release(second, discard=True)
+            self.assertTrue(first.closed)
+            return pool.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["size"], 0)
+
+    def test_waiter_gets_released_connection(self):
+        async def scenario():
+            async def creator():
+                return FakeConnection()
+            pool = AsyncPool(creator, max_size=1, timeout=1)
+            held = await pool.acquire()
+            waiter = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0.01)
+            self.assertEqual(pool.stats()["waiting"], 1)
+            await pool.release(held)
+            self.assertIs(await waiter, held)
+
+        asyncio.run(scenario())
+
+    def test_invalid_connection_is_replaced(self):
+        async def scenario():
+            async def creator():
+                return FakeConnection()
+
+            async def validator(conn):
+                return False
+            pool = AsyncPool(creator, validator=validator, max_size=1)
+            first = await pool.acquire()
+            await pool.release(first)
+            second = await pool.acquire()
+            self.assertIsNot(second, first)
+            self.assertTrue(first.closed)
+            return pool.stats()
+
+        self.assertEqual(asyncio.run(scenario())["recycled"], 1)
+
+
+class NumberedPlaceholdersTest(unittest.TestCase):
+
+    def test_converts_placeholders_for_asyncpg(self):
+        sql = "SELECT %s, '50%%' FROM leads WHERE id = %s"
+        self.assertEqual(_numbered(sql), "SELECT $1, '50%' FROM leads WHERE id = $2")
+
+
+class DatabaseLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db_loop = DatabaseLoop(name='db-async-test')
+
+    def tearDown(self):
+        self.db_loop.stop()
+
+    def test_runs_on_own_thread_from_any_loop(self):
+        async def where():
+            return threading.current_thread().name
+
+        # Cada asyncio.run es un bucle nuevo, como las vistas async de Flask
+        for _ in range(2):
+            self.assertEqual(asyncio.run(self.db_loop.run(where())), 'db-async-test')
+
+    def test_propagates_context_and_exceptions(self):
+        var = contextvars.ContextVar('var', default=None)
+
+        async def read():
+            return var.get()
+
+        async def fail():
+            raise ValueError("fallo")
+
+        async def scenario():
+            var.set('petición')
+            self.assertEqual(await self.db_loop.run(read()), 'petición')
+            with self.assertRaises(ValueError):
+                await self.db_loop.run(fail())
+
+        asyncio.run(scenario())
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite no está instalado")
+class AsyncModelsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from database import async_models
+        cls.models = support.migrate()
+        cls.db = async_models
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def lead_id(self, correo):
+        return next(lead.id for lead in self.models.iter_leads() if lead.correo_electronico == correo)
+
+    def test_crud_matches_sync_layer(self):
+        db, models = self.db, self.models
+        version = models.get_leads_version()[0]
+        self.assertTrue(self.run_async(db.create_lead('Ana Ruiz', 'ana@example.com', '600', 'Marketing Digital')))
+        self.assertFalse(self.run_async(db.create_lead('Ana Ruiz', 'ana@example.com', '', 'Marketing Digital')))
+        lead_id = self.lead_id('ana@example.com')
+        self.assertEqual(self.run_async(db.get_lead_by_id(lead_id)), models.get_lead_by_id(lead_id))
+
+        self.assertTrue(self.run_async(db.update_lead(lead_id, 'Ana Ruiz', 'ana.r@example.com', '', 'Soporte Técnico')))
+        lead = models.get_lead_by_id(lead_id)
+        self.assertEqual((lead.correo_electronico, lead.telefono, lead.interes_servicio),
+                         ('ana.r@example.com', '', 'Soporte Técnico'))
+        stats = models.get_lead_stats()
+        self.assertEqual(self.run_async(db.get_lead_stats()), stats)
+        self.assertEqual(stats["por_servicio"].get('Marketing Digital', 0), 0)
+
+        self.assertTrue(self.run_async(db.delete_lead(lead_id)))
+        self.assertIsNone(models.get_lead_by_id(lead_id))
+        self.assertFalse(self.run_async(db.delete_lead(lead_id)))
+        self.assertFalse(self.run_async(db.update_lead(lead_id, 'X', 'x@example.com', '', 'Y')))
+        # Alta, modificación y borrado: una versión nueva cada uno
+        self.assertEqual(models.get_leads_version()[0], version + 3)
+
+    def test_dashboard_runs_queries_concurrently(self):
+        db, models = self.db, self.models
+
+        async def create_many():
+            return await asyncio.gather(*(
+                db.create_lead(f'Lead {i}', f'dash{i}@example.com', '', 'Análisis de Datos') for i in range(10)
+            ))
+
+        self.assertTrue(all(self.run_async(create_many())))
+        stats, (page, next_cursor) = self.run_async(db.get_dashboard(limit=3, fields=['id', 'nombre_completo']))
+        self.assertEqual(stats, models.get_lead_stats())
+        self.assertEqual((page, next_cursor), models.get_leads_page(limit=3, fields=['id', 'nombre_completo']))
+        self.assertIsNotNone(next_cursor)
+        self.assertIsNotNone(db.get_pool_stats())
+
+    def test_invalid_cursor_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.run_async(self.db.get_leads_page(cursor='no-es-un-cursor'))
+
+
+if __name__ == '__main__':
+    unittest.main()
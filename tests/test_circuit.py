@@ -0,0 +1,88 @@
+# tests/test_circuit.py
+"""Pruebas del circuit breaker (database/circuit.py) y de su uso al abrir
+conexiones SQLite en database/models.py.
+
+    python -m unittest discover -s tests
+"""
+import os
+import time
+import unittest
+
+import support
+from database.circuit import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['rejected'], 1)
+        self.assertEqual(breaker.stats()['opened'], 1)
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # Mientras dura el intento de prueba no pasa nadie más
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        # Un solo fallo en half_open basta para volver a abrir
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['opened'], 2)
+
+
+class ConnectWithBreakerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.models = support.migrate()
+
+    def test_unreachable_database_opens_the_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        missing = os.path.join(support.TMP, 'no-existe', 'leads.db')
+        conn = self.models.get_db_connection(max_retries=3, delay=0, endpoint=missing, breaker=breaker)
+        self.assertIsNone(conn)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        # Con el breaker abierto ni siquiera se intenta conectar
+        self.assertIsNone(self.models.get_db_connection(max_retries=1, delay=0, endpoint=missing, breaker=breaker))
+        self.assertEqual(breaker.stats()['rejected'], 2)
+
+    def test_successful_connection_closes_the_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.1)
+        conn = self.models.get_db_connection(max_retries=1, delay=0, breaker=breaker)
+        self.assertIsNotNone(conn)
+        conn.close()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
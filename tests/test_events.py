@@ -0,0 +1,113 @@
+# tests/test_events.py
+"""Pruebas del feed de cambios: EventBroker y el servidor asíncrono de
+database/feed.py.
+
+    python -m unittest discover -s tests
+"""
+import socket
+import threading
+import time
+import unittest
+
+import support  # noqa: F401
+from database.events import EventBroker
+from database.feed import FeedServer
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _read_until(sock, marker, timeout=5):
+    sock.settimeout(timeout)
+    data = b''
+    while marker not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class EventBrokerTest(unittest.TestCase):
+
+    def test_resume_with_last_event_id(self):
+        broker = EventBroker(history=10)
+        broker.publish('created', {'id': 1})
+        broker.publish('created', {'id': 2})
+        first_id = broker._history[0][1].split('\n')[0][len('id: '):]
+        _, backlog, reset = broker.subscribe(first_id)
+        self.assertFalse(reset)
+        self.assertEqual(len(backlog), 1)
+        self.assertIn('"id": 2', backlog[0])
+        # Un id de otro proceso o arranque obliga a recargar
+        self.assertTrue(broker.subscribe('otro-1')[2])
+
+    def test_slow_subscriber_gets_reset(self):
+        broker = EventBroker(buffer_size=2)
+        sub, _, _ = broker.subscribe()
+        for lead_id in range(5):
+            broker.publish('created', {'id': lead_id})
+        stream = broker.stream(sub, [], False, heartbeat=0.01)
+        next(stream)
+        chunk = next(stream)
+        self.assertEqual(chunk.count('event: created'), 2)
+        self.assertIn('event: reset', chunk)
+        stream.close()
+        self.assertEqual(broker.stats()['subscribers'], 0)
+
+
+class FeedServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = EventBroker(max_subscribers=2)
+        self.server = FeedServer(self.broker, f'127.0.0.1:{_free_port()}', heartbeat=0.2).start()
+        self.address = ('127.0.0.1', int(self.server.bind.rpartition(':')[2]))
+        self.sockets = []
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+        self.server.stop()
+
+    def connect(self, request=b"GET /api/leads/stream HTTP/1.1\r\nHost: test\r\n\r\n"):
+        sock = socket.create_connection(self.address)
+        self.sockets.append(sock)
+        sock.sendall(request)
+        return sock
+
+    def test_subscribers_share_one_thread(self):
+        threads = threading.active_count()
+        first, second = self.connect(), self.connect()
+        for sock in (first, second):
+            self.assertIn(b'200 OK', _read_until(sock, b'retry:'))
+        self.assertEqual(threading.active_count(), threads)
+
+        self.broker.publish('created', {'id': 7})
+        for sock in (first, second):
+            self.assertIn(b'"id": 7', _read_until(sock, b'"id": 7'))
+        # Sin eventos llega el heartbeat
+        self.assertIn(b': ping', _read_until(first, b': ping'))
+
+    def test_rejects_over_limit_and_unknown_paths(self):
+        for _ in range(2):
+            _read_until(self.connect(), b'retry:')
+        self.assertIn(b'503', _read_until(self.connect(), b'}'))
+        self.assertIn(b'404', _read_until(self.connect(b"GET /otra HTTP/1.1\r\n\r\n"), b'}'))
+        self.assertEqual(self.server.stats()['rejected'], 1)
+
+    def test_disconnect_unsubscribes(self):
+        sock = self.connect()
+        _read_until(sock, b'retry:')
+        self.assertEqual(self.broker.stats()['subscribers'], 1)
+        sock.close()
+        deadline = time.monotonic() + 5
+        while self.broker.stats()['subscribers'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.broker.stats()['subscribers'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
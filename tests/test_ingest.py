@@ -0,0 +1,100 @@
+# tests/test_ingest.py
+"""Pruebas de la ingesta diferida de /add_lead (database/ingest.py) y de los
+mensajes del formulario según el resultado.
+
+    python -m unittest discover -s tests
+"""
+import threading
+import unittest
+from unittest import mock
+
+import support
+from database.ingest import IngestQueue
+
+
+def _lead(correo):
+    return ('Lead Ingesta', correo, '', 'Marketing Digital')
+
+
+class IngestQueueTest(unittest.TestCase):
+
+    def test_groups_submissions_into_one_batch(self):
+        batches = []
+
+        def writer(leads):
+            batches.append(len(leads))
+            return [not correo.startswith('dup') for _, correo, _, _ in leads]
+
+        queue = IngestQueue(writer, batch_size=10, flush_ms=200)
+        futures = [queue.submit(*_lead(correo)) for correo in ('a@x.com', 'dup@x.com', 'b@x.com')]
+        self.assertEqual([future.result(5) for future in futures], [True, False, True])
+        queue.stop()
+        self.assertEqual(batches, [3])
+        self.assertEqual(queue.stats()['written'], 2)
+
+    def test_writer_error_reaches_every_future(self):
+        def writer(leads):
+            raise ConnectionError("Sin conexión a la base de datos")
+
+        queue = IngestQueue(writer, flush_ms=10)
+        futures = [queue.submit(*_lead(f'err{i}@x.com')) for i in range(3)]
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result(5)
+        queue.stop()
+
+
+class AddLeadMessagesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.models = support.migrate()
+        import app as application
+        cls.application = application
+        application.app.config['INGEST_WAIT'] = True
+
+    def post(self, writer, correo, timeout=5):
+        queue = IngestQueue(writer, flush_ms=10)
+        client = self.application.app.test_client()
+        with mock.patch.object(self.application, 'ingest_queue', queue), \
+                mock.patch.dict(self.application.app.config, {'INGEST_WAIT_TIMEOUT': timeout}):
+            client.post('/add_lead', data={'nombre': 'Lead Form', 'correo': correo, 'interes': 'Soporte'})
+        queue.stop()
+        with client.session_transaction() as session:
+            return [message for _, message in session.get('_flashes', [])]
+
+    def test_duplicate_message_only_for_duplicates(self):
+        writer = self.models.create_leads_batch
+        self.assertIn('registrado exitosamente', self.post(writer, 'form@x.com')[0])
+        self.assertIn('duplicado', self.post(writer, 'form@x.com')[0])
+
+    def test_database_error_asks_to_retry(self):
+        def writer(leads):
+            raise ConnectionError("Sin conexión a la base de datos")
+
+        message = self.post(writer, 'caida@x.com')[0]
+        self.assertIn('Inténtelo de nuevo', message)
+        self.assertNotIn('duplicado', message)
+
+    def test_timeout_asks_to_retry(self):
+        release = threading.Event()
+
+        def writer(leads):
+            release.wait(5)
+            return [True] * len(leads)
+
+        try:
+            message = self.post(writer, 'lento@x.com', timeout=0.05)[0]
+        finally:
+            release.set()
+        self.assertIn('Inténtelo de nuevo', message)
+
+    def test_batch_raises_instead_of_reporting_duplicates(self):
+        with mock.patch.object(self.models, 'db_connection') as db_connection:
+            db_connection.return_value.__enter__.return_value = None
+            with self.assertRaises(ConnectionError):
+                self.models.create_leads_batch([_lead('sin-conexion@x.com')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+# tests/test_models.py
+"""Pruebas de la capa de datos síncrona (database/models.py) contra SQLite.
+
+    python -m unittest discover -s tests
+"""
+import itertools
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+import support
+
+_emails = itertools.count()
+
+
+def _email(prefix):
+    return f'{prefix}{next(_emails)}@example.com'
+
+
+class ModelsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.models = support.migrate()
+
+    def create(self, interes='Soporte', telefono='600', prefix='lead'):
+        correo = _email(prefix)
+        self.assertTrue(self.models.create_lead('Lead Prueba', correo, telefono, interes))
+        return self.models.find_leads_by_email(correo)[0]
+
+
+class CounterLockOrderTest(ModelsTestCase):
+
+    def services_bumped(self, lead, interes):
+        with mock.patch.object(self.models, '_bump_counters', wraps=self.models._bump_counters) as bump:
+            self.assertTrue(self.models.update_lead(lead.id, lead.nombre_completo, lead.correo_electronico,
+                                                    lead.telefono, interes))
+        return [call.args[1] for call in bump.call_args_list]
+
+    def test_opposite_moves_lock_counters_in_the_same_order(self):
+        first = self.create('Servicio B')
+        second = self.create('Servicio A')
+        self.assertEqual(self.services_bumped(first, 'Servicio A'), ['Servicio A', 'Servicio B'])
+        self.assertEqual(self.services_bumped(second, 'Servicio B'), ['Servicio A', 'Servicio B'])
+
+    def test_counters_follow_the_move(self):
+        before = self.models.get_lead_stats()["por_servicio"]
+        lead = self.create('Origen')
+        self.services_bumped(lead, 'Destino')
+        after = self.models.get_lead_stats()["por_servicio"]
+        self.assertEqual(after.get('Origen', 0), before.get('Origen', 0))
+        self.assertEqual(after['Destino'], before.get('Destino', 0) + 1)
+
+
+class LeadCacheTest(ModelsTestCase):
+
+    def test_read_racing_an_edit_is_not_cached(self):
+        models = self.models
+        lead = self.create('Servicio C')
+        models.lead_cache.delete(f'lead:{lead.id}')
+        make_lead = models.Lead
+        edited = []
+
+        def fetched(*row):
+            # La fila ya se leyó: una edición se confirma antes de cachearla
+            if not edited:
+                edited.append(models.update_lead(lead.id, 'Nombre Nuevo', lead.correo_electronico,
+                                                 lead.telefono, lead.interes_servicio))
+            return make_lead(*row)
+
+        with mock.patch.object(models, 'Lead', side_effect=fetched):
+            stale = models.get_lead_by_id(lead.id)
+        self.assertEqual(edited, [True])
+        self.assertEqual(stale.nombre_completo, 'Lead Prueba')
+        self.assertEqual(models.get_lead_by_id(lead.id).nombre_completo, 'Nombre Nuevo')
+
+    def test_primary_read_bypasses_the_cache(self):
+        models = self.models
+        lead = self.create()
+        old = models.Lead(*['Viejo' if name == 'nombre_completo' else lead[name] for name in models.LEAD_COLUMNS])
+        models.lead_cache.set(f'lead:{lead.id}', old)
+        self.assertEqual(models.get_lead_by_id(lead.id).nombre_completo, 'Viejo')
+        self.assertEqual(models.get_lead_by_id(lead.id, primary=True).nombre_completo, 'Lead Prueba')
+
+
+class LeadsPageTest(ModelsTestCase):
+
+    def test_cursor_walks_every_lead_once(self):
+        models = self.models
+        for _ in range(5):
+            self.create(prefix='pagina')
+        expected, last = models.get_leads_page(limit=100_000)
+        self.assertIsNone(last)
+        # Los leads creados en el mismo segundo se ordenan por id
+        fields = models.parse_fields('id,correo_electronico')
+        seen, cursor = [], None
+        while True:
+            rows, cursor = models.get_leads_page(limit=2, cursor=cursor, fields=fields)
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                break
+            self.assertEqual(models.decode_cursor(cursor)[1], rows[-1].id)
+        self.assertEqual(seen, [lead.id for lead in expected])
+
+    def test_invalid_cursor(self):
+        for cursor in ('basura', 'W10', 'WyJheWVyIiwgMV0'):
+            with self.assertRaises(self.models.InvalidCursor):
+                self.models.get_leads_page(limit=2, cursor=cursor)
+
+
+class ImportLeadsTest(ModelsTestCase):
+
+    def row(self, correo=None, **extra):
+        row = {'nombre_completo': 'Importado', 'correo_electronico': correo or _email('importado'),
+               'telefono': '', 'interes_servicio': 'Importación'}
+        row.update(extra)
+        return row
+
+    def test_duplicates_and_rejected_rows(self):
+        existing = self.create(prefix='importado')
+        repeated = self.row()
+        rows = [self.row(), repeated, dict(repeated), self.row(existing.correo_electronico),
+                self.row(nombre_completo=''), self.row()]
+        result = self.models.import_leads(rows, batch_size=3)
+        self.assertEqual(result["totals"], {"inserted": 3, "duplicates": 2, "rejected": 1})
+        self.assertEqual([b["inserted"] for b in result["batches"]], [2, 1])
+        self.assertNotIn("error", result)
+
+    def test_broken_file_keeps_committed_batches(self):
+        def rows():
+            for _ in range(3):
+                yield self.row()
+            raise ValueError("línea 4: comillas sin cerrar")
+
+        result = self.models.import_leads(rows(), batch_size=2)
+        self.assertEqual(result["totals"], {"inserted": 3, "duplicates": 0, "rejected": 0})
+        self.assertEqual(result["error"], "línea 4: comillas sin cerrar")
+
+    def test_failed_batch_is_rejected_not_duplicate(self):
+        insert_batch = self.models._insert_batch
+        calls = []
+
+        def flaky(conn, batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError("database is locked")
+            return insert_batch(conn, batch)
+
+        with mock.patch.object(self.models, '_insert_batch', side_effect=flaky):
+            result = self.models.import_leads([self.row() for _ in range(5)], batch_size=2)
+        self.assertEqual(result["totals"], {"inserted": 3, "duplicates": 0, "rejected": 2})
+        self.assertEqual(result["batches"][1]["error"], "database is locked")
+        self.assertNotIn("error", result)
+
+
+class BatchDryRunTest(ModelsTestCase):
+
+    def select(self, ids=None, **filters):
+        return self.models.parse_batch_selection(ids, filters)
+
+    def test_update_dry_run_matches_the_update(self):
+        models = self.models
+        service = f'Lote {next(_emails)}'
+        for telefono in ('', '', '700', '701'):
+            self.create(service, telefono)
+        ids, filters = self.select(interes_servicio=service)
+        changes = models.parse_batch_changes({'telefono': '700'})
+        dry = models.batch_update_leads(ids, filters, changes, dry_run=True)
+        self.assertEqual((dry["matched"], dry["affected"]), (4, 3))
+        self.assertEqual(dry["por_servicio"], {service: 4})
+        result = models.batch_update_leads(ids, filters, changes, chunk_size=3)
+        self.assertEqual((result["matched"], result["affected"]), (dry["matched"], dry["affected"]))
+        # Repetido no cambia nada
+        self.assertEqual(models.batch_update_leads(ids, filters, changes, dry_run=True)["affected"], 0)
+
+    def test_delete_dry_run_matches_the_delete(self):
+        models = self.models
+        service = f'Lote {next(_emails)}'
+        leads = [self.create(service) for _ in range(3)]
+        other = self.create()
+        ids, filters = self.select([lead.id for lead in leads] + [other.id], interes_servicio=service)
+        dry = models.batch_delete_leads(ids, filters, dry_run=True)
+        self.assertEqual((dry["matched"], dry["affected"]), (3, 3))
+        result = models.batch_delete_leads(ids, filters, chunk_size=2)
+        self.assertEqual((result["matched"], result["affected"], result["chunks"]), (3, 3, 2))
+        self.assertIsNone(models.get_lead_by_id(leads[0].id))
+        self.assertIsNotNone(models.get_lead_by_id(other.id))
+
+
+class ArchivedRollupsTest(ModelsTestCase):
+
+    def backdate(self, leads, fecha):
+        with self.models.db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"UPDATE leads SET fecha_registro = %s WHERE id IN ({', '.join(['%s'] * len(leads))})",
+                        [fecha] + [lead.id for lead in leads])
+            conn.commit()
+            cur.close()
+
+    def test_rebuild_counts_archived_leads(self):
+        models = self.models
+        desde, hasta = date(2000, 1, 1), date(2000, 1, 31)
+        leads = [self.create('Archivo', telefono) for telefono in ('600', '', '601')]
+        # El UPDATE directo no mueve los agregados: se reconstruyen todos
+        self.backdate(leads, datetime(2000, 1, 10, 12))
+        self.assertIsNotNone(models.backfill_rollups())
+        summary = models.get_leads_summary()
+
+        result = models.archive_leads(antes_de=date(2000, 2, 1))
+        self.assertEqual(result["affected"], 3)
+        self.assertTrue(all(models.lead_archive.contains(lead.id) for lead in leads))
+        self.assertEqual(models.backfill_rollups(desde, hasta), 1)
+        report = models.get_leads_report('day', desde, hasta)
+        self.assertEqual(report["total"], 3)
+        self.assertEqual(report["periodos"][0]["con_telefono"], 2)
+
+        self.assertIsNotNone(models.backfill_rollups())
+        after = models.get_leads_summary()
+        self.assertEqual(after["total_leads"], summary["total_leads"])
+        self.assertEqual(after["primer_registro"], '2000-01-10')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# tests/test_pool.py
+"""Pruebas del pool de conexiones (database/pool.py) y del pool por hilo de
+SQLite (database/sqlite_backend.py) con conexiones SQLite reales.
+
+    python -m unittest discover -s tests
+"""
+import os
+import threading
+import time
+import unittest
+
+import support
+from database import sqlite_backend
+from database.dialects import get_dialect
+from database.pool import ConnectionPool, PoolTimeout
+
+
+class Creator:
+    """Abre conexiones SQLite y recuerda todas las que abrió"""
+
+    def __init__(self, fail=False):
+        self.path = os.path.join(support.TMP, 'pool.db')
+        self.fail = fail
+        self.opened = []
+
+    def __call__(self):
+        if self.fail:
+            return None
+        conn = sqlite_backend.connect(self.path)
+        self.opened.append(conn)
+        return conn
+
+
+def _pool(creator=None, **kwargs):
+    kwargs.setdefault('min_size', 0)
+    kwargs.setdefault('max_size', 2)
+    kwargs.setdefault('timeout', 1)
+    return ConnectionPool(creator or Creator(), validator=get_dialect('sqlite').validate, **kwargs)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def test_timeout_when_exhausted(self):
+        pool = _pool(max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['waiting'], stats['created']), (1, 0, 1))
+
+    def test_waiter_gets_released_connection(self):
+        pool = _pool(max_size=1, timeout=5)
+        conn = pool.acquire()
+        threading.Timer(0.05, pool.release, (conn,)).start()
+        self.assertIs(pool.acquire(), conn)
+
+    def test_recycles_expired_connections(self):
+        creator = Creator()
+        pool = _pool(creator, recycle=0.05)
+        first = pool.acquire()
+        pool.release(first)
+        time.sleep(0.1)
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['recycled'], 1)
+        # Caducada mientras estaba prestada: se cierra al devolverla
+        time.sleep(0.1)
+        pool.release(second)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_validation_replaces_dead_connection(self):
+        pool = _pool()
+        first = pool.acquire()
+        pool.release(first)
+        first.close()
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats()['recycled'], 1)
+
+    def test_prunes_idle_connections_above_min_size(self):
+        pool = _pool(min_size=1, max_size=3, idle_timeout=0.05)
+        conns = [pool.acquire() for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        self.assertEqual(pool.stats()['idle'], 3)
+        time.sleep(0.1)
+        pool.acquire()
+        stats = pool.stats()
+        # Se cierran las ociosas hasta min_size y se presta la que queda
+        self.assertEqual((stats['size'], stats['in_use'], stats['recycled']), (1, 1, 2))
+        self.assertEqual(sum(conn.closed for conn in conns), 2)
+
+    def test_fill_opens_min_size(self):
+        pool = _pool(min_size=2)
+        pool.fill()
+        self.assertEqual(pool.stats()['idle'], 2)
+
+    def test_failed_creator_frees_the_slot(self):
+        pool = _pool(Creator(fail=True), max_size=1, timeout=0.05)
+        self.assertIsNone(pool.acquire())
+        self.assertIsNone(pool.acquire())
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_discard_and_close_all(self):
+        pool = _pool()
+        broken, kept = pool.acquire(), pool.acquire()
+        pool.release(broken, discard=True)
+        pool.release(kept)
+        self.assertTrue(broken.closed)
+        pool.close_all()
+        self.assertTrue(kept.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class ThreadLocalPoolTest(unittest.TestCase):
+
+    def test_one_connection_per_thread(self):
+        pool = sqlite_backend.ThreadLocalPool(Creator())
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(pool.acquire()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+        self.assertEqual(pool.stats()['created'], 2)
+
+    def test_discard_opens_a_new_connection(self):
+        pool = sqlite_backend.ThreadLocalPool(Creator())
+        conn = pool.acquire()
+        pool.release(conn, discard=True)
+        self.assertTrue(conn.closed)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['recycled'], 1)
+
+
+class SQLiteBackendTest(unittest.TestCase):
+
+    def test_translates_placeholders_and_for_update(self):
+        conn = Creator()()
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY, v TEXT)")
+        cur.execute("INSERT INTO t (v) VALUES (%s)", ('50%',))
+        cur.execute("SELECT v FROM t WHERE v LIKE '50%%' AND id = %s FOR UPDATE", (cur.lastrowid,))
+        self.assertEqual(cur.fetchone(), ('50%',))
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# tests/test_replicas.py
+"""Pruebas del enrutado de lecturas a réplicas (database/replicas.py) con
+ficheros SQLite como primario y réplicas.
+
+    python -m unittest discover -s tests
+"""
+import os
+import unittest
+from unittest import mock
+
+import support
+from database import sqlite_backend
+from database.circuit import CircuitBreaker
+from database.pool import ConnectionPool
+from database.replicas import ReplicaSet, Replica, RouteState
+
+
+def _replica(name, max_size=2, timeout=1):
+    path = os.path.join(support.TMP, f'{name}.db')
+    pool = ConnectionPool(lambda: sqlite_backend.connect(path), min_size=0, max_size=max_size, timeout=timeout)
+    return Replica(name, pool, CircuitBreaker(failure_threshold=1, reset_timeout=60))
+
+
+def _names(replica_set, count):
+    names = []
+    for _ in range(count):
+        replica, conn = replica_set.acquire()
+        names.append(replica.name if replica else None)
+        if replica:
+            replica.pool.release(conn)
+    return names
+
+
+class ReplicaSetTest(unittest.TestCase):
+
+    def test_round_robin(self):
+        replica_set = ReplicaSet(_replica(name) for name in ('r1', 'r2', 'r3'))
+        self.assertEqual(_names(replica_set, 6), ['r1', 'r2', 'r3', 'r1', 'r2', 'r3'])
+
+    def test_skips_replicas_with_open_breaker(self):
+        replicas = [_replica(name) for name in ('r1', 'r2', 'r3')]
+        replica_set = ReplicaSet(replicas)
+        replicas[1].breaker.record_failure()
+        self.assertEqual(replica_set.healthy(), 2)
+        names = _names(replica_set, 6)
+        self.assertNotIn('r2', names)
+        self.assertEqual(sorted(set(names)), ['r1', 'r3'])
+
+    def test_no_healthy_replica_falls_back(self):
+        replicas = [_replica(name) for name in ('r1', 'r2')]
+        for replica in replicas:
+            replica.breaker.record_failure()
+        self.assertEqual(ReplicaSet(replicas).acquire(), (None, None))
+
+    def test_busy_replica_is_skipped(self):
+        busy, free = _replica('r1', max_size=1, timeout=0.01), _replica('r2')
+        held = busy.pool.acquire()
+        replica_set = ReplicaSet([busy, free])
+        self.assertEqual(_names(replica_set, 2), ['r2', 'r2'])
+        busy.pool.release(held)
+
+    def test_request_keeps_its_replica(self):
+        replica_set = ReplicaSet(_replica(name) for name in ('r1', 'r2', 'r3'))
+        state = RouteState()
+        first, conn = replica_set.acquire(state=state)
+        first.pool.release(conn)
+        for _ in range(3):
+            replica, conn = replica_set.acquire(state=state)
+            replica.pool.release(conn)
+            self.assertIs(replica, first)
+
+
+class ReadRoutingTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.models = support.migrate()
+
+    def setUp(self):
+        self.replica = _replica('lectura')
+        patcher = mock.patch.object(self.models, 'replicas', ReplicaSet([self.replica]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def uses_replica(self, **kwargs):
+        with self.models.db_connection(**kwargs) as conn:
+            self.assertIsNotNone(conn)
+            return self.replica.pool.stats()['in_use'] == 1
+
+    def test_reads_go_to_replicas_and_writes_to_primary(self):
+        self.assertFalse(self.uses_replica())
+        self.assertTrue(self.uses_replica(read_only=True))
+
+    def test_read_your_writes_uses_primary(self):
+        token = self.models.begin_request_routing(primary=True)
+        try:
+            self.assertFalse(self.uses_replica(read_only=True))
+        finally:
+            self.models.end_request_routing(token)
+
+
+if __name__ == '__main__':
+    unittest.main()